@@ -0,0 +1 @@
+"""Offline micro-benchmarks. Run each module with `python -m benchmarks.<name>`."""
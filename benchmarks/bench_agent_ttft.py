@@ -0,0 +1,47 @@
+"""
+Time-to-first-token of the tool-call vs single-shot agent modes (live OpenAI + Supabase).
+
+Usage:
+    python -m benchmarks.bench_agent_ttft "What does the contract say about renewal?" --runs 3
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from src.core.agent.streaming import AGENT_MODES, StreamStats, run_agent_with_streaming
+
+
+async def _one(question: str, mode: str) -> StreamStats:
+    stats = StreamStats(mode=mode, started=time.perf_counter())
+    async for _ in run_agent_with_streaming(question, mode=mode, stats=stats):
+        pass
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("question")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default=",".join(AGENT_MODES))
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(","):
+        runs = [asyncio.run(_one(args.question, mode)) for _ in range(args.runs)]
+        ttfts = [s.ttft for s in runs if s.ttft is not None]
+        results.append(
+            {
+                "mode": mode,
+                "runs": len(runs),
+                "ttft_median_s": round(statistics.median(ttfts), 3) if ttfts else None,
+                "total_median_s": round(statistics.median(s.total for s in runs), 3),
+            }
+        )
+    print(json.dumps({"benchmark": "agent_ttft", "question": args.question, "results": results}))
+
+
+if __name__ == "__main__":
+    main()
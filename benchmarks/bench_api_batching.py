@@ -0,0 +1,112 @@
+"""
+Retrieval service QPS with and without micro-batching, under concurrent load.
+
+Runs the FastAPI app in-process (httpx ASGI transport) with the fake
+embedder (each embedding request sleeps --latency seconds, like an API
+round trip) and a resident index of synthetic vectors. The same
+--concurrency limit on in-flight searches applies to both runs; without
+batching every request is its own round trip.
+
+Usage:
+    python -m benchmarks.bench_api_batching --rows 50000 --clients 64 --requests 1000 --latency 0.02
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent callers")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated seconds per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Searches (batches) in flight")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    # Reason: must be set before the embedder is first created.
+    os.environ.update(
+        EMBED_BACKEND="fake",
+        EMBED_FAKE_DIM=str(args.dim),
+        EMBED_FAKE_LATENCY=str(args.latency),
+        EMBED_CACHE="false",
+    )
+    import httpx
+    import numpy as np
+
+    from benchmarks.synthetic import synthetic_vector_blocks
+    from src.api.app import create_app
+    from src.core.agent import kb
+    from src.core.ingestion import local_index_search, supabase_store
+    from src.core.ingestion.local_index import LocalVectorIndex
+
+    index = LocalVectorIndex()
+    for start, block in synthetic_vector_blocks(args.rows, args.dim):
+        index.add([{"id": start + i + 1, "content": ""} for i in range(len(block))], embeddings=block)
+    index.last_sync = time.time()
+    supabase_store.USE_LOCAL_INDEX = True
+    local_index_search.LOCAL_INDEX_SYNC_SECONDS = float("inf")
+    local_index_search._local_index = index
+    kb.CONTEXT_PACKING = False
+
+    async def load(window_ms: float, max_batch: int):
+        app = create_app(batch_window_ms=window_ms, max_batch=max_batch, max_concurrency=args.concurrency)
+        latencies = []
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(args.requests):
+            queue.put_nowait(i)
+
+        async def client_loop(client):
+            while not queue.empty():
+                i = queue.get_nowait()
+                t0 = time.perf_counter()
+                resp = await client.post("/search", json={"query": f"query {i}", "k": 10})
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(args.clients)))
+            elapsed = time.perf_counter() - t0
+        ms = np.asarray(latencies) * 1000
+        stats = app.state.batcher.stats
+        return {
+            "batching": max_batch > 1,
+            "window_ms": window_ms,
+            "max_batch": max_batch,
+            "seconds": round(elapsed, 3),
+            "qps": round(args.requests / elapsed, 1),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "mean_batch": round(stats.mean_batch, 2),
+        }
+
+    results = [
+        asyncio.run(load(0.0, 1)),
+        asyncio.run(load(args.window_ms, args.max_batch)),
+    ]
+    results[1]["speedup"] = round(results[1]["qps"] / results[0]["qps"], 2)
+    print(
+        json.dumps(
+            {
+                "benchmark": "api_batching",
+                "rows": args.rows,
+                "clients": args.clients,
+                "requests": args.requests,
+                "latency_s": args.latency,
+                "concurrency": args.concurrency,
+                "results": results,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
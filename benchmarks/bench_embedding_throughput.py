@@ -0,0 +1,45 @@
+"""
+Embedding throughput (chunks/sec) with the fake backend at several concurrency levels.
+
+Usage:
+    python -m benchmarks.bench_embedding_throughput --chunks 4000 --latency 0.05
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+
+from src.core.ingestion.embedding_backends import BatchingEmbedder, FakeEmbeddingBackend
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--chunk-chars", type=int, default=1200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per request")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    args = parser.parse_args()
+
+    texts = [f"{i:08d} " + "x" * args.chunk_chars for i in range(args.chunks)]
+    results = []
+    for conc in (int(c) for c in args.concurrency.split(",")):
+        backend = FakeEmbeddingBackend(dim=args.dim, latency=args.latency)
+        embedder = BatchingEmbedder(backend, max_items=args.batch_size, max_concurrency=conc)
+        t0 = time.perf_counter()
+        embedder.embed(texts)
+        elapsed = time.perf_counter() - t0
+        results.append(
+            {
+                "concurrency": conc,
+                "requests": backend.calls,
+                "seconds": round(elapsed, 3),
+                "chunks_per_s": round(args.chunks / elapsed, 1),
+            }
+        )
+    print(json.dumps({"benchmark": "embedding_throughput", "chunks": args.chunks, "results": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: local memory-mapped vector store (open time, upsert, search, compaction).
+
+Usage:
+    python -m benchmarks.bench_local_store --rows 100000 --dim 1536 --queries 50
+"""
+from __future__ import annotations
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_vector_blocks
+from src.core.ingestion import corpus
+from src.core.ingestion.local_store import LocalFileVectorStore
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    ms = np.asarray(latencies) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Reason: keep the benchmark's writes from invalidating this host's answer cache.
+        corpus.CORPUS_VERSION_PATH = f"{tmp}/corpus_version"
+        store = LocalFileVectorStore(f"{tmp}/store")
+        t0 = time.perf_counter()
+        for start, block in synthetic_vector_blocks(args.rows, args.dim, block=args.batch):
+            store.upsert(
+                [
+                    {"url": f"doc{(start + i) // 10}", "chunk_number": (start + i) % 10, "content": "", "embedding": v}
+                    for i, v in enumerate(block)
+                ]
+            )
+        upsert_s = time.perf_counter() - t0
+        store.close()
+
+        t0 = time.perf_counter()
+        store = LocalFileVectorStore(f"{tmp}/store")
+        open_ms = (time.perf_counter() - t0) * 1000
+
+        _, queries = next(synthetic_vector_blocks(args.queries, args.dim, offset=args.rows))
+        latencies = []
+        for q in queries:
+            t0 = time.perf_counter()
+            store.search(q, match_count=args.k)
+            latencies.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        store.search_batch(queries, match_count=args.k)
+        batch_s = time.perf_counter() - t0
+
+        # Retire every other document, then reclaim the slots.
+        for doc in range(0, args.rows // 10, 2):
+            store.delete(f"doc{doc}")
+        t0 = time.perf_counter()
+        reclaimed = store.compact()
+        compact_s = time.perf_counter() - t0
+        store.close()
+
+    print(
+        json.dumps(
+            {
+                "benchmark": "local_store",
+                "rows": args.rows,
+                "dim": args.dim,
+                "upsert_rows_per_s": round(args.rows / upsert_s, 1),
+                "open_ms": round(open_ms, 2),
+                **_percentiles(latencies),
+                "batch_qps": round(args.queries / batch_s, 1),
+                "compact_s": round(compact_s, 3),
+                "reclaimed": reclaimed,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+PDF extraction pages/sec: serial vs. process pool at several worker counts.
+
+Usage:
+    python -m benchmarks.bench_pdf_extract --pages 800 --workers 1,2,4,8
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import write_text_pdf
+from src.core.ingestion import pdf_text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=800)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count() or 1}")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        write_text_pdf(path, args.pages, args.lines)
+        results = []
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            if workers > 1:
+                # Warm the pool so process startup is not billed to the run.
+                list(pdf_text.iter_pdf_pages(path, workers=workers, pages_per_task=args.pages))
+            t0 = time.perf_counter()
+            pages = list(pdf_text.iter_pdf_pages(path, workers=workers))
+            elapsed = time.perf_counter() - t0
+            assert [p.number for p in pages] == list(range(1, args.pages + 1))
+            results.append(
+                {"workers": workers, "seconds": round(elapsed, 3), "pages_per_s": round(args.pages / elapsed, 1)}
+            )
+        pdf_text.shutdown_pdf_pool()
+
+    base = results[0]["seconds"]
+    for r in results:
+        r["speedup"] = round(base / r["seconds"], 2)
+    print(json.dumps({"benchmark": "pdf_extract", "pages": args.pages, "results": results}))
+
+
+if __name__ == "__main__":
+    main()
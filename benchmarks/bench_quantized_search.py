@@ -0,0 +1,111 @@
+"""
+Recall vs. latency vs. memory of the local index under each RAG_VECTOR_STORAGE layout.
+
+Recall@k is measured against exact float32 search over the same rows. With
+--first-pass-dims, also reports two-stage (Matryoshka prefix + full rerank)
+search.
+
+Usage:
+    python -m benchmarks.bench_quantized_search --rows 20000 --dim 1536 --queries 50 --first-pass-dims 256
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.core.ingestion.local_index import LocalVectorIndex
+from src.core.ingestion.quantize import STORAGE_MODES
+
+
+def make_corpus(n: int, dim: int, queries: int, latent: int = 64, seed: int = 0):
+    """
+    Low-rank vectors plus noise: like real embeddings, most variance lives in a
+    few directions (isotropic noise would make every neighbour a near-tie).
+    """
+    rng = np.random.default_rng(seed)
+    proj = rng.normal(size=(latent, dim)).astype(np.float32)
+    z = rng.normal(size=(n, latent)).astype(np.float32)
+    # Reason: Matryoshka-trained models front-load information; decaying
+    # column scales give the synthetic vectors the same shape.
+    proj *= np.exp(-np.arange(dim, dtype=np.float32) / (dim / 4))
+    data = z @ proj + 0.02 * rng.normal(size=(n, dim)).astype(np.float32)
+    picks = rng.integers(0, n, queries)
+    q = (z[picks] + 0.5 * rng.normal(size=(queries, latent)).astype(np.float32)) @ proj
+    return data, q
+
+
+def run(
+    storage: str,
+    data: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    rerank_factor: int,
+    truth=None,
+    first_pass_dims: int = 0,
+):
+    index = LocalVectorIndex(storage=storage, rerank_factor=rerank_factor, first_pass_dims=first_pass_dims)
+    rows = [{"id": i + 1} for i in range(len(data))]
+    t0 = time.perf_counter()
+    index.add(rows, embeddings=data)
+    build_s = time.perf_counter() - t0
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = index.search(q, k=k)
+        latencies.append(time.perf_counter() - t0)
+        found.append([r["id"] for r in res])
+    recall = None
+    if truth is not None:
+        recall = float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+    lat = np.asarray(latencies) * 1000
+    return found, {
+        "storage": storage + (f"+prefix{first_pass_dims}" if first_pass_dims else ""),
+        "bytes_per_vector": index._vectors.bytes_per_vector(),
+        "index_mb": round(index.nbytes / 2**20, 2),
+        # Memory-mapped float32 copy binary storage reranks against (paged in per query).
+        "rescore_file_mb": round(index._vectors.full_nbytes / 2**20, 2),
+        "build_s": round(build_s, 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        f"recall@{k}": None if recall is None else round(recall, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    parser.add_argument("--first-pass-dims", type=int, default=0, help="Also run two-stage search")
+    args = parser.parse_args()
+
+    data, queries = make_corpus(args.rows, args.dim, args.queries)
+    truth, base = run("float32", data, queries, args.k, args.rerank_factor)
+    base[f"recall@{args.k}"] = 1.0
+    results = [base]
+    for storage in STORAGE_MODES[1:]:
+        results.append(run(storage, data, queries, args.k, args.rerank_factor, truth)[1])
+    if args.first_pass_dims:
+        results.append(
+            run("float32", data, queries, args.k, args.rerank_factor, truth, args.first_pass_dims)[1]
+        )
+    print(
+        json.dumps(
+            {
+                "benchmark": "quantized_search",
+                "rows": args.rows,
+                "dim": args.dim,
+                "k": args.k,
+                "rerank_factor": args.rerank_factor,
+                "results": results,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
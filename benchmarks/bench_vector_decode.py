@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: bulk embedding decoder vs. the previous per-row parser.
+
+Usage:
+    python -m benchmarks.bench_vector_decode --rows 2000 --dim 1536
+"""
+from __future__ import annotations
+import argparse
+import json
+import struct
+import time
+
+import numpy as np
+
+from src.core.ingestion.vector_decode import decode_embeddings
+
+
+def legacy_parse(embedding: str) -> np.ndarray:
+    """Per-row parser previously inlined in `similarity_search_rag_pages`."""
+    if embedding.startswith("np.str_('") and embedding.endswith("')"):
+        embedding = embedding[9:-2]
+    elif embedding.startswith("[") and embedding.endswith("]"):
+        pass
+    else:
+        embedding = f"[{embedding}]"
+    try:
+        embedding_list = json.loads(embedding)
+    except json.JSONDecodeError:
+        embedding = embedding.replace("np.str_(", "").replace(")", "")
+        if not embedding.startswith("["):
+            embedding = f"[{embedding}]"
+        embedding_list = json.loads(embedding)
+    return np.array(embedding_list, dtype=float)
+
+
+def make_matrix(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def make_rows(n: int, dim: int, seed: int = 0) -> list[str]:
+    # pgvector's text output: '[v1,v2,...]'
+    return ["[" + ",".join(f"{x:.7g}" for x in row) + "]" for row in make_matrix(n, dim, seed)]
+
+
+def make_binary_rows(n: int, dim: int, seed: int = 0) -> list[bytes]:
+    # pgvector's binary output (`vector_send`): uint16 dim, uint16 unused, big-endian float32s
+    header = struct.pack(">HH", dim, 0)
+    return [header + row.astype(">f4").tobytes() for row in make_matrix(n, dim, seed)]
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.dim)
+    binary_rows = make_binary_rows(args.rows, args.dim)
+    legacy_s = _best_of(lambda: [legacy_parse(r) for r in rows], args.repeat)
+    text_s = _best_of(lambda: decode_embeddings(rows, dim=args.dim), args.repeat)
+    binary_s = _best_of(lambda: decode_embeddings(binary_rows), args.repeat)
+
+    print(
+        json.dumps(
+            {
+                "benchmark": "vector_decode",
+                "rows": args.rows,
+                "dim": args.dim,
+                "legacy_rows_per_s": round(args.rows / legacy_s, 1),
+                "bulk_text_rows_per_s": round(args.rows / text_s, 1),
+                "bulk_binary_rows_per_s": round(args.rows / binary_s, 1),
+                "text_speedup": round(legacy_s / text_s, 2),
+                "binary_speedup": round(legacy_s / binary_s, 2),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare two benchmark suite reports and flag regressions.
+
+Rows are matched by their non-metric fields (e.g. size + layout). Throughput
+and recall metrics regress when they drop, latency and time metrics when they
+rise, in both cases by more than --threshold (relative). Recall uses an
+absolute --recall-tolerance instead, since it is already a fraction.
+Exits with status 1 when any metric regressed.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.1
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+HIGHER_IS_BETTER = ("_per_s", "qps", "recall")
+LOWER_IS_BETTER = ("_ms", "seconds", "build_s")
+# Fields that describe a measurement rather than identify its row.
+_INFORMATIONAL = ("chunks", "pages", "files", "mb", "index_mb")
+
+
+def _direction(metric: str) -> int:
+    """+1 if larger is better, -1 if smaller is better, 0 if not compared."""
+    if any(tag in metric for tag in HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def _key(row: Dict[str, Any]) -> Tuple:
+    return tuple(
+        sorted(
+            (k, v)
+            for k, v in row.items()
+            if not _direction(k) and k not in _INFORMATIONAL
+        )
+    )
+
+
+def compare_reports(
+    base: Dict[str, Any],
+    new: Dict[str, Any],
+    threshold: float = 0.1,
+    recall_tolerance: float = 0.01,
+) -> List[Dict[str, Any]]:
+    """
+    Metric-by-metric comparison of two `run_suite` reports.
+
+    Args:
+        base: Baseline report.
+        new: Candidate report.
+        threshold: Relative change that counts as a regression for speed metrics.
+        recall_tolerance: Absolute drop that counts as a regression for recall.
+
+    Returns:
+        One dict per compared metric: section, row key, metric, base, new,
+        change (relative, or absolute for recall) and `regressed`.
+    """
+    out: List[Dict[str, Any]] = []
+    for section, rows in new.get("results", {}).items():
+        base_rows = {_key(r): r for r in base.get("results", {}).get(section, [])}
+        for row in rows:
+            key = _key(row)
+            old = base_rows.get(key)
+            if old is None:
+                continue
+            for metric, value in row.items():
+                direction = _direction(metric)
+                before = old.get(metric)
+                if not direction or not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                    continue
+                if "recall" in metric:
+                    change: Optional[float] = value - before
+                    regressed = -change > recall_tolerance
+                else:
+                    change = (value - before) / before if before else None
+                    regressed = change is not None and direction * change < -threshold
+                out.append(
+                    {
+                        "section": section,
+                        "row": dict(key),
+                        "metric": metric,
+                        "base": before,
+                        "new": value,
+                        "change": None if change is None else round(change, 4),
+                        "regressed": regressed,
+                    }
+                )
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--recall-tolerance", type=float, default=0.01)
+    parser.add_argument("--all", action="store_true", help="List every metric, not just regressions")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare_reports(base, new, args.threshold, args.recall_tolerance)
+    regressions = [r for r in rows if r["regressed"]]
+    print(
+        json.dumps(
+            {
+                "benchmark": "compare",
+                "base_commit": base.get("commit"),
+                "new_commit": new.get("commit"),
+                "compared": len(rows),
+                "regressions": regressions,
+                **({"metrics": rows} if args.all else {}),
+            },
+            indent=2,
+        )
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Offline benchmark suite: chunking, PDF extraction, ingestion and retrieval in one JSON report.
+
+Runs without network or database access: embeddings come from the fake
+backend, `ingest_paths` writes to an in-process `MemoryChunkStore`, and
+`similarity_search` is served by a resident `LocalVectorIndex` built from
+synthetic vectors. Retrieval reports p50/p95/p99 latency and recall@k
+against exact brute-force search for every corpus size and storage layout,
+so quantized and two-stage layouts are judged on quality as well as speed.
+Compare two reports with `python -m benchmarks.compare`.
+
+Usage:
+    python -m benchmarks.run_suite --sizes 10000,100000,1000000 --out bench.json
+    python -m benchmarks.run_suite --sections search --sizes 10000 --layouts float32,int8,prefix64
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+SECTIONS = ("chunking", "pdf", "ingest", "search")
+
+
+def _percentiles(seconds: List[float]) -> Dict[str, float]:
+    ms = np.asarray(seconds) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+
+@contextlib.contextmanager
+def _patched(module: Any, **attrs: Any) -> Iterator[None]:
+    """Temporarily rebind module attributes (restored even on error)."""
+    old = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(module, name, value)
+
+
+def bench_chunking(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from benchmarks.synthetic import synthetic_text
+    from src.core.ingestion.chunking import simple_chunk_text, structure_chunk_spans
+
+    # ~7 characters per synthetic word including the separator.
+    text = synthetic_text(int(args.text_mb * 2**20 / 7))
+    mb = len(text) / 2**20
+    results = []
+    for name, fn in (("structure", structure_chunk_spans), ("simple", simple_chunk_text)):
+        best, chunks = float("inf"), 0
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            chunks = len(fn(text, 1200, 150))
+            best = min(best, time.perf_counter() - t0)
+        results.append(
+            {
+                "chunker": name,
+                "mb": round(mb, 2),
+                "chunks": chunks,
+                "seconds": round(best, 4),
+                "mb_per_s": round(mb / best, 1),
+                "chunks_per_s": round(chunks / best, 1),
+            }
+        )
+    return results
+
+
+def bench_pdf(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from benchmarks.synthetic import write_text_pdf
+    from src.core.ingestion import pdf_text
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "suite.pdf")
+        write_text_pdf(path, args.pdf_pages)
+        for workers in sorted({1, os.cpu_count() or 1}):
+            if workers > 1:
+                # Warm the pool so process startup is not billed to the run.
+                list(pdf_text.iter_pdf_pages(path, workers=workers, pages_per_task=args.pdf_pages))
+            t0 = time.perf_counter()
+            pages = sum(1 for _ in pdf_text.iter_pdf_pages(path, workers=workers))
+            elapsed = time.perf_counter() - t0
+            results.append(
+                {
+                    "workers": workers,
+                    "pages": pages,
+                    "seconds": round(elapsed, 3),
+                    "pages_per_s": round(pages / elapsed, 1),
+                }
+            )
+        pdf_text.shutdown_pdf_pool()
+    return results
+
+
+def bench_ingest(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from benchmarks.synthetic import MemoryChunkStore, synthetic_text
+    from src.core.ingestion import ingest
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.ingest_files):
+            path = os.path.join(tmp, f"doc{i:04d}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(synthetic_text(args.ingest_words, seed=i))
+            paths.append(path)
+        store = MemoryChunkStore()
+        # The incremental rerun over unchanged files measures the skip path.
+        for run, incremental in (("full", False), ("incremental_rerun", True)):
+            t0 = time.perf_counter()
+            chunks = ingest.ingest_paths(paths, source="bench", incremental=incremental, store=store)
+            elapsed = time.perf_counter() - t0
+            results.append(
+                {
+                    "run": run,
+                    "files": len(paths),
+                    "chunks": chunks,
+                    "seconds": round(elapsed, 3),
+                    "files_per_s": round(len(paths) / elapsed, 1),
+                    "chunks_per_s": round(chunks / elapsed, 1),
+                }
+            )
+    return results
+
+
+def _layout(name: str) -> Dict[str, Any]:
+    """'int8' -> storage int8; 'prefix64' -> float32 with a 64-dim first pass."""
+    if name.startswith("prefix"):
+        return {"storage": "float32", "first_pass_dims": int(name[len("prefix"):])}
+    return {"storage": name, "first_pass_dims": 0}
+
+
+def _exact_top_k(size: int, dim: int, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force float32 top-k ids (1-based) over regenerated corpus blocks."""
+    from benchmarks.synthetic import synthetic_vector_blocks
+
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    best = np.zeros((len(queries), 0), dtype=np.float32)
+    for start, block in synthetic_vector_blocks(size, dim):
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        ids = np.arange(start + 1, start + 1 + len(block), dtype=np.int64)
+        best = np.hstack([best, queries @ block.T])
+        best_ids = np.hstack([best_ids, np.broadcast_to(ids, (len(queries), len(ids)))])
+        keep = np.argsort(-best, axis=1, kind="stable")[:, :k]
+        best = np.take_along_axis(best, keep, axis=1)
+        best_ids = np.take_along_axis(best_ids, keep, axis=1)
+    return best_ids
+
+
+def bench_search(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from benchmarks.synthetic import synthetic_vector_blocks
+    from src.core.ingestion import local_index_search, supabase_store
+    from src.core.ingestion.local_index import LocalVectorIndex
+
+    results = []
+    for size in args.sizes:
+        # Queries come from the corpus distribution but are not in it.
+        queries = next(synthetic_vector_blocks(args.queries, args.dim, offset=size))[1]
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        truth = _exact_top_k(size, args.dim, queries, args.k)
+        for name in args.layouts:
+            index = LocalVectorIndex(**_layout(name))
+            t0 = time.perf_counter()
+            for start, block in synthetic_vector_blocks(size, args.dim):
+                index.add([{"id": start + i + 1} for i in range(len(block))], embeddings=block)
+            build_s = time.perf_counter() - t0
+            index.last_sync = time.time()
+            latencies, hits = [], 0
+            with _patched(supabase_store, USE_LOCAL_INDEX=True), _patched(
+                local_index_search, _local_index=index, LOCAL_INDEX_SYNC_SECONDS=float("inf")
+            ):
+                for q, expected in zip(queries, truth):
+                    t0 = time.perf_counter()
+                    rows = supabase_store.similarity_search(q.tolist(), match_count=args.k)
+                    latencies.append(time.perf_counter() - t0)
+                    hits += len({r["id"] for r in rows} & set(expected.tolist()))
+            results.append(
+                {
+                    "size": size,
+                    "layout": name,
+                    "index_mb": round(index.nbytes / 2**20, 2),
+                    "build_s": round(build_s, 3),
+                    **_percentiles(latencies),
+                    "qps": round(len(latencies) / sum(latencies), 1),
+                    "recall_at_k": round(hits / (args.k * len(queries)), 4),
+                }
+            )
+            del index
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _csv(kind):
+    return lambda value: [kind(v) for v in value.split(",") if v]
+
+
+def main(argv: List[str] | None = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=_csv(str), default=list(SECTIONS))
+    parser.add_argument("--sizes", type=_csv(int), default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--layouts", type=_csv(str), default=["float32", "int8", "binary", "prefix64"])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--text-mb", type=float, default=4.0, help="Text size for the chunking section")
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--ingest-files", type=int, default=20)
+    parser.add_argument("--ingest-words", type=int, default=20_000, help="Words per ingested file")
+    parser.add_argument("--repeat", type=int, default=3, help="Chunking runs (best is reported)")
+    parser.add_argument("--out", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    unknown = set(args.sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {sorted(unknown)}")
+
+    # Reason: must be set before the embedder and cache are first created;
+    # load_dotenv never overrides variables that are already set.
+    os.environ["EMBED_BACKEND"] = "fake"
+    os.environ["EMBED_FAKE_DIM"] = str(args.dim)
+    os.environ["EMBED_FAKE_LATENCY"] = "0"
+    os.environ["EMBED_CACHE"] = "false"
+
+    runners = {"chunking": bench_chunking, "pdf": bench_pdf, "ingest": bench_ingest, "search": bench_search}
+    report: Dict[str, Any] = {
+        "benchmark": "suite",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {key: value for key, value in vars(args).items() if key != "out"},
+        "results": {},
+    }
+    for section in SECTIONS:
+        if section in args.sections:
+            print(f"running {section}...", file=sys.stderr, flush=True)
+            report["results"][section] = runners[section](args)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
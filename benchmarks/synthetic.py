@@ -0,0 +1,119 @@
+"""Deterministic synthetic inputs (text, PDFs, vectors) for offline tests and benchmarks."""
+from __future__ import annotations
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+_WORDS = (
+    "vector index query chunk embedding latency recall page document source "
+    "upsert filter cosine token batch cache pipeline stream worker error code"
+).split()
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    """Sentences and paragraphs of pseudo-words."""
+    rng = random.Random(seed)
+    out: List[str] = []
+    for i in range(n_words):
+        word = rng.choice(_WORDS)
+        out.append(word.capitalize() if i % 12 == 0 else word)
+        if i % 12 == 11:
+            out[-1] += "."
+        if i % 120 == 119:
+            out[-1] += "\n\n"
+    return " ".join(out)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: str, pages: int, lines_per_page: int = 40, seed: int = 0) -> None:
+    """
+    Write a minimal PDF whose pages contain plain Helvetica text lines.
+
+    Page i's first line is "Page <i>" so extraction order can be checked.
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+    # 1: catalog, 2: pages, 3: font; then (page, content) pairs.
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i in range(pages):
+        lines = [f"Page {i + 1}"] + [
+            " ".join(rng.choice(_WORDS) for _ in range(10)) for _ in range(lines_per_page - 1)
+        ]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        ops += [f"({_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{off:010d} 00000 n \n".encode() for off in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def synthetic_vector_blocks(
+    n: int, dim: int, block: int = 50_000, latent: int = 64, seed: int = 0, offset: int = 0
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (start, vectors) blocks of `n` embedding-like vectors.
+
+    Vectors are low-rank plus noise with variance front-loaded in the
+    leading dimensions (the shape Matryoshka-trained models produce). Each
+    block is seeded by its start offset, so any block can be regenerated
+    without holding the whole matrix; `offset` draws further samples from
+    the same distribution (e.g. queries that are not in the corpus).
+    """
+    proj = np.random.default_rng(seed).normal(size=(latent, dim)).astype(np.float32)
+    proj *= np.exp(-np.arange(dim, dtype=np.float32) / (dim / 4))
+    for start in range(offset, offset + n, block):
+        rng = np.random.default_rng((seed, start))
+        m = min(block, offset + n - start)
+        z = rng.normal(size=(m, latent)).astype(np.float32)
+        yield start, z @ proj + 0.02 * rng.normal(size=(m, dim)).astype(np.float32)
+
+
+class MemoryChunkStore:
+    """
+    In-process stand-in for the write side of a `VectorStore` (upsert /
+    fetch_chunk_hashes / delete), keyed by (url, chunk_number).
+    """
+
+    def __init__(self):
+        self.rows: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self.upserts = 0
+
+    def upsert(self, rows: List[Dict[str, Any]], *args: Any, **kwargs: Any) -> None:
+        self.upserts += 1
+        for row in rows:
+            self.rows[(row["url"], row["chunk_number"])] = row
+
+    def fetch_chunk_hashes(self, url: str, *args: Any, **kwargs: Any) -> Dict[int, Dict[str, Any]]:
+        return {
+            n: {"chunk_hash": r["metadata"].get("chunk_hash"), "file_hash": r["metadata"].get("file_hash")}
+            for (u, n), r in self.rows.items()
+            if u == url
+        }
+
+    def delete(self, url: str, first_stale: int = 0, *args: Any, **kwargs: Any) -> None:
+        for key in [k for k in self.rows if k[0] == url and k[1] >= first_stale]:
+            del self.rows[key]
@@ -1,5 +1,9 @@
 -- RAG Application Database Setup
 -- This script sets up the necessary database schema for the RAG application
+--
+-- Vector sizes are written for 1536-dim embeddings (text-embedding-3-small).
+-- With EMBED_DIMENSIONS set, render a matching copy with
+--   python -m src.core.ingestion.index_admin schema --dims 512 > setup_512.sql
 
 -- Enable the pgvector extension for vector similarity search
 CREATE EXTENSION IF NOT EXISTS vector;
@@ -12,16 +16,23 @@ CREATE TABLE IF NOT EXISTS rag_pages (
     chunk_number INTEGER NOT NULL,
     content TEXT NOT NULL,
     metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
-    embedding VECTOR(1536), -- OpenAI embeddings are 1536 dimensions
+    embedding VECTOR(1536), -- EMBED_DIMENSIONS (text-embedding-3-small native size: 1536)
     created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
     
     -- Unique constraint to prevent duplicate chunks for the same URL
     UNIQUE(url, chunk_number)
 );
 
--- Create an index for better vector similarity search performance
-CREATE INDEX IF NOT EXISTS rag_pages_embedding_idx 
-ON rag_pages USING ivfflat (embedding vector_cosine_ops);
+-- Create an index for better vector similarity search performance.
+-- HNSW needs no training data, so it is safe to create on an empty table
+-- (ivfflat centroids built here would be meaningless). To rebuild, switch
+-- to ivfflat with `lists` sized from the loaded rows, or inspect size and
+-- build time, use `python -m src.core.ingestion.index_admin`.
+-- IF NOT EXISTS keeps whatever index already has this name: on a database
+-- set up before HNSW was the default, the old ivfflat index stays. Convert it
+-- with `python -m src.core.ingestion.index_admin build --method hnsw`.
+CREATE INDEX IF NOT EXISTS rag_pages_embedding_idx
+ON rag_pages USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 -- Create an index on source for filtering
 CREATE INDEX IF NOT EXISTS rag_pages_source_idx ON rag_pages(source);
@@ -29,7 +40,53 @@ CREATE INDEX IF NOT EXISTS rag_pages_source_idx ON rag_pages(source);
 -- Create an index on created_at for time-based queries
 CREATE INDEX IF NOT EXISTS rag_pages_created_at_idx ON rag_pages(created_at);
 
+-- GIN index for metadata containment filters (metadata @> '{...}')
+CREATE INDEX IF NOT EXISTS rag_pages_metadata_idx
+ON rag_pages USING gin (metadata jsonb_path_ops);
+
+-- Prefix index for url_prefix filters (e.g. all chunks under file:///docs/)
+CREATE INDEX IF NOT EXISTS rag_pages_url_prefix_idx
+ON rag_pages (url text_pattern_ops);
+
+-- Full-text search column for hybrid (lexical + vector) retrieval
+ALTER TABLE rag_pages ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS rag_pages_content_tsv_idx
+ON rag_pages USING gin (content_tsv);
+
+-- Filter predicate shared by the search functions (inlined by the planner).
+-- `filter` keys:
+--   source          source column equals the string, or any string of an array
+--   url             exact document url
+--   url_prefix      url starts with the string
+--   created_after   created_at >= timestamp (inclusive)
+--   created_before  created_at <  timestamp (exclusive)
+--   metadata        object that metadata must contain (JSONB @>)
+--   anything else   shorthand for metadata containment of that key
+CREATE OR REPLACE FUNCTION rag_pages_filter_match(page rag_pages, filter JSONB)
+RETURNS BOOLEAN
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT (NOT filter ? 'source'
+            OR CASE jsonb_typeof(filter->'source')
+                   WHEN 'array' THEN filter->'source' ? page.source
+                   ELSE page.source = filter->>'source'
+               END)
+       AND (NOT filter ? 'url' OR page.url = filter->>'url')
+       AND (NOT filter ? 'url_prefix'
+            OR page.url LIKE replace(replace(replace(filter->>'url_prefix', '\', '\\'), '%', '\%'), '_', '\_') || '%')
+       AND (NOT filter ? 'created_after' OR page.created_at >= (filter->>'created_after')::timestamptz)
+       AND (NOT filter ? 'created_before' OR page.created_at < (filter->>'created_before')::timestamptz)
+       AND page.metadata @> (COALESCE(filter->'metadata', '{}'::jsonb)
+            || (filter - ARRAY['source', 'url', 'url_prefix', 'created_after', 'created_before', 'metadata']))
+$$;
+
 -- Create a function for similarity search
+-- Ranking and filtering run entirely in Postgres; embeddings are never returned.
+-- Filters (see rag_pages_filter_match) are applied before the LIMIT, so top-k
+-- stays exact under selective filters.
 CREATE OR REPLACE FUNCTION match_rag_pages(
     query_embedding VECTOR(1536),
     match_count INT DEFAULT 5,
@@ -47,6 +104,14 @@ RETURNS TABLE(
 LANGUAGE plpgsql
 AS $$
 BEGIN
+    -- With an HNSW index, selective filters can starve the index scan of
+    -- candidates; pgvector >= 0.8 keeps scanning until LIMIT rows match.
+    BEGIN
+        PERFORM set_config('hnsw.iterative_scan', 'strict_order', true);
+    EXCEPTION WHEN OTHERS THEN
+        NULL;  -- older pgvector: settings not available
+    END;
+
     RETURN QUERY
     SELECT
         rag_pages.id,
@@ -55,10 +120,261 @@ BEGIN
         rag_pages.chunk_number,
         rag_pages.content,
         rag_pages.metadata,
-        (rag_pages.embedding <=> query_embedding) AS similarity
+        1 - (rag_pages.embedding <=> query_embedding) AS similarity
     FROM rag_pages
-    WHERE (filter = '{}' OR rag_pages.source = COALESCE(filter->>'source', rag_pages.source))
+    WHERE rag_pages.embedding IS NOT NULL
+      AND rag_pages_filter_match(rag_pages, filter)
     ORDER BY rag_pages.embedding <=> query_embedding
     LIMIT match_count;
 END;
-$$;
\ No newline at end of file
+$$;
+
+-- Hybrid search: full-text and vector candidates fused with reciprocal rank
+-- fusion (score = sum of 1 / (rrf_k + rank)) in one round trip. Exact terms
+-- (error codes, part numbers, identifiers) surface through the lexical side.
+CREATE OR REPLACE FUNCTION hybrid_match_rag_pages(
+    query_text TEXT,
+    query_embedding VECTOR(1536),
+    match_count INT DEFAULT 5,
+    filter JSONB DEFAULT '{}',
+    candidate_count INT DEFAULT 40,
+    rrf_k INT DEFAULT 60
+)
+RETURNS TABLE(
+    id BIGINT,
+    url VARCHAR,
+    source VARCHAR,
+    chunk_number INTEGER,
+    content TEXT,
+    metadata JSONB,
+    similarity FLOAT,
+    score FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    BEGIN
+        PERFORM set_config('hnsw.iterative_scan', 'strict_order', true);
+    EXCEPTION WHEN OTHERS THEN
+        NULL;  -- older pgvector: settings not available
+    END;
+
+    RETURN QUERY
+    WITH vector_hits AS (
+        SELECT p.id, ROW_NUMBER() OVER (ORDER BY p.embedding <=> query_embedding) AS rank
+        FROM rag_pages p
+        WHERE p.embedding IS NOT NULL
+          AND rag_pages_filter_match(p, filter)
+        ORDER BY p.embedding <=> query_embedding
+        LIMIT candidate_count
+    ),
+    text_hits AS (
+        SELECT p.id,
+               ROW_NUMBER() OVER (ORDER BY ts_rank_cd(p.content_tsv, q) DESC) AS rank
+        FROM rag_pages p, websearch_to_tsquery('english', query_text) q
+        WHERE p.content_tsv @@ q
+          AND rag_pages_filter_match(p, filter)
+        ORDER BY ts_rank_cd(p.content_tsv, q) DESC
+        LIMIT candidate_count
+    ),
+    fused AS (
+        SELECT COALESCE(v.id, t.id) AS id,
+               COALESCE(1.0 / (rrf_k + v.rank), 0.0)
+             + COALESCE(1.0 / (rrf_k + t.rank), 0.0) AS score
+        FROM vector_hits v
+        FULL OUTER JOIN text_hits t ON v.id = t.id
+    )
+    SELECT
+        p.id,
+        p.url,
+        p.source,
+        p.chunk_number,
+        p.content,
+        p.metadata,
+        1 - (p.embedding <=> query_embedding) AS similarity,
+        f.score::FLOAT AS score
+    FROM fused f
+    JOIN rag_pages p ON p.id = f.id
+    ORDER BY f.score DESC, p.id
+    LIMIT match_count;
+END;
+$$;
+
+-- Quantized candidate search with exact rerank.
+-- Full-precision embeddings stay in the table for the rerank, but the ANN
+-- index is built over a compact expression: halfvec (2x smaller) or
+-- binary_quantize bits (32x smaller, Hamming distance). Build the index with
+--   python -m src.core.ingestion.index_admin build --storage halfvec|binary
+-- or directly:
+--   CREATE INDEX rag_pages_embedding_halfvec_idx ON rag_pages
+--       USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops);
+--   CREATE INDEX rag_pages_embedding_bit_idx ON rag_pages
+--       USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops);
+-- The ORDER BY expressions below must match the indexed expressions exactly.
+CREATE OR REPLACE FUNCTION quantized_match_rag_pages(
+    query_embedding VECTOR(1536),
+    match_count INT DEFAULT 5,
+    filter JSONB DEFAULT '{}',
+    storage TEXT DEFAULT 'binary',
+    rerank_factor INT DEFAULT 10
+)
+RETURNS TABLE(
+    id BIGINT,
+    url VARCHAR,
+    source VARCHAR,
+    chunk_number INTEGER,
+    content TEXT,
+    metadata JSONB,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    candidate_count INT := match_count * GREATEST(rerank_factor, 1);
+BEGIN
+    BEGIN
+        PERFORM set_config('hnsw.iterative_scan', 'strict_order', true);
+    EXCEPTION WHEN OTHERS THEN
+        NULL;  -- older pgvector: settings not available
+    END;
+
+    IF storage NOT IN ('halfvec', 'binary') THEN
+        RAISE EXCEPTION 'unknown storage %, expected halfvec or binary', storage;
+    END IF;
+
+    -- Only the CTE for the requested storage runs (the other is gated by a
+    -- one-time false filter); the rerank then reads the few candidate rows.
+    RETURN QUERY
+    WITH halfvec_candidates AS (
+        SELECT p.id
+        FROM rag_pages p
+        WHERE storage = 'halfvec'
+          AND p.embedding IS NOT NULL
+          AND rag_pages_filter_match(p, filter)
+        ORDER BY p.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)
+        LIMIT candidate_count
+    ),
+    bit_candidates AS (
+        SELECT p.id
+        FROM rag_pages p
+        WHERE storage = 'binary'
+          AND p.embedding IS NOT NULL
+          AND rag_pages_filter_match(p, filter)
+        ORDER BY binary_quantize(p.embedding)::bit(1536) <~> binary_quantize(query_embedding)
+        LIMIT candidate_count
+    )
+    SELECT
+        p.id,
+        p.url,
+        p.source,
+        p.chunk_number,
+        p.content,
+        p.metadata,
+        1 - (p.embedding <=> query_embedding) AS similarity
+    FROM rag_pages p
+    WHERE p.id IN (SELECT c.id FROM halfvec_candidates c UNION ALL SELECT b.id FROM bit_candidates b)
+    ORDER BY p.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- Two-stage (Matryoshka) search: rank by the first `first_pass_dims`
+-- dimensions (text-embedding-3 models are trained so a prefix is a usable
+-- embedding on its own), then rerank the shortlist with the full vectors.
+-- Index the prefix with
+--   python -m src.core.ingestion.index_admin build --storage prefix --prefix-dims 256
+-- or directly:
+--   CREATE INDEX rag_pages_embedding_prefix_idx ON rag_pages
+--       USING hnsw ((subvector(embedding, 1, 256)::vector(256)) vector_cosine_ops);
+-- The query is built dynamically so the ORDER BY matches the indexed
+-- expression for the requested prefix length.
+CREATE OR REPLACE FUNCTION adaptive_match_rag_pages(
+    query_embedding VECTOR(1536),
+    match_count INT DEFAULT 5,
+    filter JSONB DEFAULT '{}',
+    first_pass_dims INT DEFAULT 256,
+    rerank_factor INT DEFAULT 10
+)
+RETURNS TABLE(
+    id BIGINT,
+    url VARCHAR,
+    source VARCHAR,
+    chunk_number INTEGER,
+    content TEXT,
+    metadata JSONB,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    BEGIN
+        PERFORM set_config('hnsw.iterative_scan', 'strict_order', true);
+    EXCEPTION WHEN OTHERS THEN
+        NULL;  -- older pgvector: settings not available
+    END;
+
+    IF first_pass_dims < 1 OR first_pass_dims >= vector_dims(query_embedding) THEN
+        RETURN QUERY SELECT * FROM match_rag_pages(query_embedding, match_count, filter);
+        RETURN;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'WITH candidates AS (
+             SELECT p.id
+             FROM rag_pages p
+             WHERE p.embedding IS NOT NULL
+               AND rag_pages_filter_match(p, $3)
+             ORDER BY subvector(p.embedding, 1, %1$s)::vector(%1$s) <=> subvector($1, 1, %1$s)::vector(%1$s)
+             LIMIT $2 * GREATEST($4, 1)
+         )
+         SELECT p.id, p.url, p.source, p.chunk_number, p.content, p.metadata,
+                1 - (p.embedding <=> $1) AS similarity
+         FROM rag_pages p
+         JOIN candidates c ON c.id = p.id
+         ORDER BY p.embedding <=> $1
+         LIMIT $2',
+        first_pass_dims
+    )
+    USING query_embedding, match_count, filter, rerank_factor;
+END;
+$$;
+
+-- Batched search: one round trip for many query vectors (the API service
+-- collects concurrent requests into one call). Each query runs the same
+-- search a single call would (plain, quantized or two-stage, picked by the
+-- arguments); query_index is the 0-based position in query_embeddings.
+-- Gated branches are never executed, only the selected function runs.
+CREATE OR REPLACE FUNCTION batch_match_rag_pages(
+    query_embeddings VECTOR(1536)[],
+    match_count INT DEFAULT 5,
+    filter JSONB DEFAULT '{}',
+    storage TEXT DEFAULT NULL,
+    first_pass_dims INT DEFAULT 0,
+    rerank_factor INT DEFAULT 10
+)
+RETURNS TABLE(
+    query_index INT,
+    id BIGINT,
+    url VARCHAR,
+    source VARCHAR,
+    chunk_number INTEGER,
+    content TEXT,
+    metadata JSONB,
+    similarity FLOAT
+)
+LANGUAGE sql
+AS $$
+    SELECT (q.ord - 1)::INT, m.id, m.url, m.source, m.chunk_number, m.content, m.metadata, m.similarity
+    FROM unnest(query_embeddings) WITH ORDINALITY AS q(embedding, ord)
+    CROSS JOIN LATERAL (
+        SELECT * FROM quantized_match_rag_pages(q.embedding, match_count, filter, storage, rerank_factor)
+        WHERE storage IS NOT NULL
+        UNION ALL
+        SELECT * FROM adaptive_match_rag_pages(q.embedding, match_count, filter, first_pass_dims, rerank_factor)
+        WHERE storage IS NULL AND first_pass_dims > 0
+        UNION ALL
+        SELECT * FROM match_rag_pages(q.embedding, match_count, filter)
+        WHERE storage IS NULL AND first_pass_dims <= 0
+    ) m
+    ORDER BY q.ord, m.similarity DESC;
+$$;
@@ -0,0 +1 @@
+"""HTTP retrieval and chat service."""
@@ -0,0 +1,205 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from .. import env as _env  # Load environment variables  # noqa: F401
+from ..core.agent.answer_cache import get_answer_cache
+from ..core.agent.kb import kb_search_batch
+from ..core.agent.streaming import AGENT_MODES, StreamStats, run_agent_with_streaming
+from ..core.ingestion.filters import validate_filter
+from .batching import MicroBatcher, Overloaded
+
+
+__all__ = ["create_app", "app", "SearchRequest", "ChatRequest"]
+
+
+# Window in which concurrent /search requests are collected into one batch.
+API_BATCH_WINDOW_MS = float(os.getenv("API_BATCH_WINDOW_MS", "5"))
+API_MAX_BATCH = int(os.getenv("API_MAX_BATCH", "64"))
+# Backpressure: searches waiting beyond this are rejected with 503.
+API_MAX_PENDING = int(os.getenv("API_MAX_PENDING", "1024"))
+# Batched searches (embedding + scoring) running at the same time.
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "4"))
+# Concurrent /chat streams; each holds an LLM request open.
+API_MAX_STREAMS = int(os.getenv("API_MAX_STREAMS", "16"))
+
+SearchBatchFn = Callable[..., Awaitable[List[List[Dict[str, Any]]]]]
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(min_length=1)
+    k: int = Field(5, ge=1, le=100)
+    filter: Optional[Dict[str, Any]] = None
+    hybrid: Optional[bool] = None
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1)
+    mode: Optional[str] = None
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class _SlotResponse(StreamingResponse):
+    """Streaming response that releases its stream slot however it ends."""
+
+    def __init__(self, content: AsyncIterator[str], release: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        # Reason: a body generator that never started does not run its
+        # `finally` when closed, so a client gone before the first chunk (or a
+        # response that failed to start) would otherwise leak the slot.
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+def create_app(
+    search_batch: SearchBatchFn = kb_search_batch,
+    batch_window_ms: float = API_BATCH_WINDOW_MS,
+    max_batch: int = API_MAX_BATCH,
+    max_pending: int = API_MAX_PENDING,
+    max_concurrency: int = API_MAX_CONCURRENCY,
+    max_streams: int = API_MAX_STREAMS,
+    agent: Any = None,
+) -> FastAPI:
+    """
+    Build the retrieval service.
+
+    POST /search requests that arrive within `batch_window_ms` of each other
+    and share k / filter / hybrid are answered by one `search_batch` call
+    (one embedding request, one batched search). POST /chat streams agent
+    answers as server-sent events.
+
+    Args:
+        search_batch: `async fn(queries, k=, filter=, hybrid=)` returning one
+            result list per query (default `kb_search_batch`).
+        batch_window_ms: Collection window per batch.
+        max_batch: Largest batch.
+        max_pending: Searches allowed to wait before new ones get 503.
+        max_concurrency: Batches in flight.
+        max_streams: Concurrent chat streams before new ones get 503.
+        agent: Agent override for /chat (defaults to the agent for the mode).
+
+    Returns:
+        FastAPI application.
+    """
+
+    async def handle(key: Hashable, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        k, filter_json, hybrid = key
+        return await search_batch(queries, k=k, filter=json.loads(filter_json), hybrid=hybrid)
+
+    batcher: MicroBatcher[str, List[Dict[str, Any]]] = MicroBatcher(
+        handle,
+        max_batch=max_batch,
+        max_wait=batch_window_ms / 1000,
+        max_pending=max_pending,
+        max_concurrency=max_concurrency,
+    )
+    streams = {"active": 0, "rejected": 0}
+
+    app = FastAPI(title="RAG retrieval service")
+    app.state.batcher = batcher
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        cache = get_answer_cache()
+        return {
+            "search": batcher.stats.as_dict(),
+            "chat": dict(streams),
+            "answer_cache": cache.stats.as_dict() if cache is not None else None,
+        }
+
+    @app.post("/search")
+    async def search(req: SearchRequest) -> Dict[str, Any]:
+        try:
+            filter = validate_filter(req.filter)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        key = (req.k, json.dumps(filter, sort_keys=True, default=str), req.hybrid)
+        try:
+            results = await batcher.submit(key, req.query)
+        except Overloaded as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"search failed: {e}") from e
+        return {"query": req.query, "results": results}
+
+    @app.post("/chat")
+    async def chat(req: ChatRequest) -> StreamingResponse:
+        mode = req.mode
+        if mode is not None and mode not in AGENT_MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of {AGENT_MODES}")
+        if streams["active"] >= max_streams:
+            streams["rejected"] += 1
+            raise HTTPException(status_code=503, detail="too many chat streams", headers={"Retry-After": "1"})
+        # Reason: counted before the response starts so a burst of requests
+        # cannot all pass the check above; _SlotResponse gives it back.
+        streams["active"] += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                streams["active"] -= 1
+
+        try:
+            return _SlotResponse(_chat_events(req.message, mode), release, media_type="text/event-stream")
+        except BaseException:
+            release()
+            raise
+
+    async def _chat_events(message: str, mode: Optional[str]) -> AsyncIterator[str]:
+        sources: List[Dict[str, Any]] = []
+        stats = StreamStats(mode=mode or "", started=time.perf_counter())
+        try:
+            async for text in run_agent_with_streaming(message, sources, mode=mode, stats=stats, agent=agent):
+                if text:
+                    yield _sse("delta", {"text": text})
+            yield _sse(
+                "done",
+                {
+                    "sources": sources,
+                    "cached": stats.cached,
+                    "ttft_ms": None if stats.ttft is None else round(stats.ttft * 1000, 1),
+                    "total_ms": None if stats.total is None else round(stats.total * 1000, 1),
+                },
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the retrieval and chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from ..core.tracing import span
+
+
+__all__ = ["MicroBatcher", "BatcherStats", "Overloaded"]
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class Overloaded(RuntimeError):
+    """Raised by `MicroBatcher.submit` when too many items are already pending."""
+
+
+@dataclass
+class BatcherStats:
+    submitted: int = 0
+    completed: int = 0
+    rejected: int = 0
+    batches: int = 0
+    largest_batch: int = 0
+
+    @property
+    def pending(self) -> int:
+        return self.submitted - self.completed
+
+    @property
+    def mean_batch(self) -> float:
+        return self.completed / self.batches if self.batches else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "pending": self.pending,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "mean_batch": round(self.mean_batch, 2),
+        }
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Collect concurrent `submit` calls into batches for one handler call.
+
+    Items with the same key (e.g. the same k and filter) are grouped; a
+    group is flushed `max_wait` seconds after its first item arrives, or at
+    once when it reaches `max_batch`. At most `max_concurrency` handler
+    calls run at a time and at most `max_pending` items may be waiting,
+    beyond which `submit` raises `Overloaded` instead of queueing without
+    bound.
+
+    Args:
+        handler: `async handler(key, items) -> results`, one result per item
+            in order. An exception fails every item of that batch.
+        max_batch: Largest batch passed to the handler.
+        max_wait: Seconds to wait for more items before flushing (0 still
+            batches items submitted in the same event-loop iteration).
+        max_pending: Submitted but unfinished items allowed.
+        max_concurrency: Handler calls allowed in flight.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Hashable, List[T]], Awaitable[List[R]]],
+        max_batch: int = 64,
+        max_wait: float = 0.005,
+        max_pending: int = 1024,
+        max_concurrency: int = 4,
+    ):
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.max_pending = max(1, max_pending)
+        self.max_concurrency = max(1, max_concurrency)
+        self.stats = BatcherStats()
+        self._groups: Dict[Hashable, List[Tuple[T, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def submit(self, key: Hashable, item: T) -> R:
+        """
+        Queue `item` and wait for its result.
+
+        Raises:
+            Overloaded: If `max_pending` items are already waiting.
+            Exception: Whatever the handler raised for this item's batch.
+        """
+        if self.stats.pending >= self.max_pending:
+            self.stats.rejected += 1
+            raise Overloaded(f"{self.stats.pending} requests pending")
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        future: asyncio.Future = loop.create_future()
+        self.stats.submitted += 1
+        group = self._groups.setdefault(key, [])
+        group.append((item, future))
+        if len(group) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, [])
+        while group:
+            batch, group = group[: self.max_batch], group[self.max_batch :]
+            task = asyncio.get_running_loop().create_task(self._run(key, batch))
+            # Reason: keep a reference so the task is not garbage collected mid-flight.
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        # Callers that gave up (client disconnected) are not worth a slot.
+        live = [(item, fut) for item, fut in batch if not fut.done()]
+        self.stats.completed += len(batch) - len(live)
+        if not live:
+            return
+        try:
+            async with self._semaphore:
+                with span("api.batch", size=len(live)):
+                    results = await self.handler(key, [item for item, _ in live])
+            if len(results) != len(live):
+                raise RuntimeError(f"handler returned {len(results)} results for {len(live)} items")
+        except asyncio.CancelledError:
+            for _, fut in live:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in live:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for (_, fut), result in zip(live, results):
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            self.stats.completed += len(live)
+            self.stats.batches += 1
+            self.stats.largest_batch = max(self.stats.largest_batch, len(live))
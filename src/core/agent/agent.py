@@ -4,7 +4,7 @@ from pydantic_ai import Agent
 from pydantic_ai.models.openai import OpenAIModel
 from ... import env as _env  # Load environment variables  # noqa: F401
 from .kb import kb_search
-from .response_templates import RAG_SYSTEM_PROMPT
+from .response_templates import RAG_SYSTEM_PROMPT, SINGLE_SHOT_SYSTEM_PROMPT
 
 
 MODEL = os.getenv("MODEL", "gpt-4o-mini")
@@ -13,4 +13,8 @@ model = OpenAIModel(MODEL)
 
 agent = Agent(model, tools=[kb_search], system_prompt=RAG_SYSTEM_PROMPT)
 
-__all__ = ["agent", "kb_search"]
+# Answers from chunks retrieved before the model call (see streaming.py);
+# kb_search stays available for optional follow-up searches.
+single_shot_agent = Agent(model, tools=[kb_search], system_prompt=SINGLE_SHOT_SYSTEM_PROMPT)
+
+__all__ = ["agent", "single_shot_agent", "kb_search"]
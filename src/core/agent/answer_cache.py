@@ -0,0 +1,235 @@
+from __future__ import annotations
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ... import env as _env  # Load environment variables  # noqa: F401
+from ..ingestion.corpus import corpus_version
+
+
+__all__ = ["AnswerCache", "AnswerCacheStats", "CachedAnswer", "get_answer_cache"]
+
+
+# Off by default: a hit answers a *similar* question with a stored answer.
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "").lower() in ("1", "true", "yes")
+# Cosine similarity a new question needs to reuse a stored answer.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+
+@dataclass
+class CachedAnswer:
+    """
+    A stored answer, as returned by `AnswerCache.lookup`.
+
+    Attributes:
+        query: Question the answer was generated for.
+        answer: Final answer text.
+        sources: Retrieved rows the answer cites.
+        mode: Agent mode that produced it (answers never cross modes).
+        created: Unix time it was stored.
+        similarity: Cosine similarity to the looked-up question.
+        hits: Times it has been served.
+    """
+
+    query: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    mode: str
+    created: float
+    similarity: float = 0.0
+    hits: int = 0
+
+
+@dataclass
+class AnswerCacheStats:
+    """Counters for an `AnswerCache` since it was created."""
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Counters keyed by name, e.g. for a debug panel."""
+        return dict(self.__dict__)
+
+
+class AnswerCache:
+    """
+    Semantic cache of final answers, looked up by query-embedding similarity.
+
+    Query embeddings live as unit rows of one preallocated matrix, so a
+    lookup is a single matrix-vector product over at most `max_entries`
+    rows. Entries expire after `ttl` seconds, the least recently used entry
+    is evicted when full, and the whole cache is dropped when the corpus
+    version (bumped by every upsert / delete) moves on, so an answer is never
+    served from documents that have since changed.
+
+    Args:
+        threshold: Minimum cosine similarity for a hit.
+        ttl: Seconds an answer stays valid.
+        max_entries: Answers kept before LRU eviction.
+        version_fn: Returns the current corpus version (default
+            `corpus_version`).
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        version_fn: Callable[[], str] = corpus_version,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.version_fn = version_fn
+        self.stats = AnswerCacheStats()
+        self._lock = threading.Lock()
+        # Slot (row of the matrix) -> answer, least recently used first.
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._modes: List[Optional[str]] = [None] * self.max_entries
+        self._free: List[int] = list(range(self.max_entries - 1, -1, -1))
+        self._version: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, embedding: Sequence[float], mode: str) -> Optional[CachedAnswer]:
+        """
+        Return a copy of the closest stored answer for `mode`, or None.
+
+        Args:
+            embedding: Query embedding.
+            mode: Agent mode the answer must have been produced in.
+        """
+        q = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            if self._matrix is None or not self._entries or self._matrix.shape[1] != q.shape[0]:
+                self.stats.misses += 1
+                return None
+            scores = self._matrix @ q
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                score = float(scores[slot])
+                entry = self._entries.get(int(slot))
+                if entry is None or self._modes[slot] != mode:
+                    continue
+                if now - entry.created > self.ttl:
+                    self._drop(int(slot))
+                    self.stats.expired += 1
+                    continue
+                self._entries.move_to_end(int(slot))
+                entry.hits += 1
+                self.stats.hits += 1
+                hit = copy.deepcopy(entry)
+                hit.similarity = score
+                return hit
+            self.stats.misses += 1
+            return None
+
+    def store(
+        self,
+        query: str,
+        embedding: Sequence[float],
+        answer: str,
+        sources: Sequence[Dict[str, Any]],
+        mode: str,
+        version: Optional[str] = None,
+    ) -> bool:
+        """
+        Remember an answer.
+
+        Args:
+            version: Corpus version the answer was produced against; if the
+                corpus has changed since, the answer is not stored.
+
+        Returns:
+            True if the answer was stored.
+        """
+        if not answer:
+            return False
+        q = _unit(embedding)
+        with self._lock:
+            self._check_version()
+            if version is not None and version != self._version:
+                return False
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                # Reason: a new embedding size (EMBED_DIMENSIONS changed) makes old rows incomparable.
+                self._reset()
+                self._matrix = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats.evictions += 1
+            slot = self._free.pop()
+            self._matrix[slot] = q
+            self._modes[slot] = mode
+            self._entries[slot] = CachedAnswer(query, answer, copy.deepcopy(list(sources)), mode, time.time())
+            self.stats.stores += 1
+            return True
+
+    def version(self) -> str:
+        """Corpus version the cached answers belong to (checked on every call)."""
+        with self._lock:
+            self._check_version()
+            return self._version or ""
+
+    def clear(self) -> None:
+        """Drop every cached answer (the stats are kept)."""
+        with self._lock:
+            self._reset()
+
+    def _check_version(self) -> None:
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._reset()
+            self._version = version
+
+    def _drop(self, slot: int) -> None:
+        self._entries.pop(slot, None)
+        self._modes[slot] = None
+        if self._matrix is not None:
+            # Reason: a zero row scores 0 and can never pass the threshold.
+            self._matrix[slot] = 0.0
+        self._free.append(slot)
+
+    def _reset(self) -> None:
+        for slot in list(self._entries):
+            self._drop(slot)
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    q = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(q))
+    return q / norm if norm else q
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache, or None unless ANSWER_CACHE is set."""
+    global _cache
+    if not ANSWER_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+        return _cache
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import os
+import re
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+from ... import env as _env  # Load environment variables  # noqa: F401
+from ..ingestion.embedding_backends import estimate_tokens
+
+
+__all__ = [
+    "CONTEXT_PACKING",
+    "pack_context",
+    "merge_adjacent",
+    "merge_overlap",
+    "mmr_order",
+]
+
+
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() not in ("0", "false", "no")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# 1.0 ranks purely by similarity; lower values trade relevance for diversity.
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "1.0"))
+
+# Shortest suffix/prefix match treated as chunk overlap rather than coincidence.
+MIN_OVERLAP_CHARS = 16
+MAX_OVERLAP_CHARS = 2000
+
+_WORD = re.compile(r"\w+")
+
+
+def merge_overlap(left: str, right: str, max_overlap: int = MAX_OVERLAP_CHARS) -> str:
+    """
+    Join two consecutive chunks, dropping the text `right` repeats from `left`.
+
+    Args:
+        left: Earlier chunk.
+        right: Following chunk, which may start with a suffix of `left`.
+        max_overlap: Longest overlap to look for.
+
+    Returns:
+        Combined text; chunks without a detectable overlap are joined by a newline.
+    """
+    longest = min(max_overlap, len(left), len(right))
+    for k in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:k]):
+            return left + right[k:]
+    return f"{left}\n{right}"
+
+
+def _rank(row: Dict[str, Any]) -> float:
+    """Ranking key: the fused hybrid `score` when present, else `similarity`."""
+    score = row.get("score")
+    return score if score is not None else (row.get("similarity") or 0)
+
+
+def _as_block(row: Dict[str, Any]) -> Dict[str, Any]:
+    n = row.get("chunk_number")
+    return {
+        **row,
+        "content": row.get("content") or "",
+        "chunk_numbers": [n] if n is not None else [],
+        "ids": [row.get("id")] if row.get("id") is not None else [],
+    }
+
+
+def merge_adjacent(rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge rows with consecutive chunk_numbers from the same url into one block.
+
+    Each block keeps the fields of its best-ranked member (by hybrid `score`
+    when present, else `similarity`), the merged `content`, and the member
+    `chunk_numbers` / `ids`.
+    Exact duplicate rows (same url and chunk_number) collapse to one.
+
+    Args:
+        rows: Search results ({id, url, chunk_number, content, similarity, metadata}).
+
+    Returns:
+        Blocks in rank order, best first.
+    """
+    by_url: Dict[Any, Dict[int, Dict[str, Any]]] = {}
+    loose: List[Dict[str, Any]] = []
+    for row in rows:
+        n = row.get("chunk_number")
+        if row.get("url") is None or n is None:
+            loose.append(_as_block(row))
+            continue
+        per_url = by_url.setdefault(row["url"], {})
+        if n not in per_url or _rank(row) > _rank(per_url[n]):
+            per_url[n] = row
+
+    blocks = loose
+    for per_url in by_url.values():
+        current: Optional[Dict[str, Any]] = None
+        for n in sorted(per_url):
+            row = per_url[n]
+            if current is not None and current["chunk_numbers"][-1] == n - 1:
+                best = row if _rank(row) > _rank(current) else current
+                current = {
+                    **best,
+                    "content": merge_overlap(current["content"], row.get("content") or ""),
+                    "chunk_number": current["chunk_numbers"][0],
+                    "chunk_numbers": current["chunk_numbers"] + [n],
+                    "ids": current["ids"] + ([row["id"]] if row.get("id") is not None else []),
+                }
+                continue
+            if current is not None:
+                blocks.append(current)
+            current = _as_block(row)
+        if current is not None:
+            blocks.append(current)
+    blocks.sort(key=_rank, reverse=True)
+    return blocks
+
+
+def _word_set(text: str) -> FrozenSet[str]:
+    return frozenset(w.lower() for w in _WORD.findall(text))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_order(blocks: Sequence[Dict[str, Any]], lam: float) -> List[Dict[str, Any]]:
+    """
+    Order blocks by maximal marginal relevance with lexical (Jaccard) redundancy.
+
+    Args:
+        blocks: Candidate blocks with a `similarity` (or hybrid `score`).
+        lam: Weight of relevance vs. novelty in [0, 1]; 1.0 keeps similarity order.
+
+    Returns:
+        The same blocks, reordered.
+    """
+    remaining = list(blocks)
+    if lam >= 1.0 or len(remaining) < 3:
+        return remaining
+    words = {id(b): _word_set(b.get("content") or "") for b in remaining}
+    # Reason: fused RRF scores are ~1/60, far below the [0, 1] redundancy
+    # term; rescale them so lambda means the same thing as for cosine.
+    top = max(_rank(b) for b in remaining) if any(b.get("score") is not None for b in remaining) else 1.0
+    chosen: List[Dict[str, Any]] = []
+    while remaining:
+        def score(b: Dict[str, Any]) -> float:
+            redundancy = max((_jaccard(words[id(b)], words[id(c)]) for c in chosen), default=0.0)
+            return lam * _rank(b) / (top or 1.0) - (1 - lam) * redundancy
+
+        best = max(remaining, key=score)
+        remaining.remove(best)
+        chosen.append(best)
+    return chosen
+
+
+def pack_context(
+    rows: Sequence[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    mmr_lambda: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Assemble retrieved rows into the context actually sent to the model.
+
+    Adjacent chunks of a document are merged with their overlap removed,
+    blocks are ranked by similarity (optionally re-ranked with MMR), and
+    then added in rank order while they fit in the token budget. The top
+    block is always kept, even if it alone exceeds the budget.
+
+    Args:
+        rows: Search results.
+        token_budget: Max estimated tokens of content (default CONTEXT_TOKEN_BUDGET).
+        mmr_lambda: MMR weight (default CONTEXT_MMR_LAMBDA; 1.0 disables MMR).
+
+    Returns:
+        Blocks in rank order, each with `chunk_numbers`, `ids` and `tokens`.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    lam = CONTEXT_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    packed: List[Dict[str, Any]] = []
+    used = 0
+    for block in mmr_order(merge_adjacent(rows), lam):
+        tokens = estimate_tokens(block["content"])
+        if packed and used + tokens > budget:
+            # Reason: a smaller, lower-ranked block may still fit the remainder.
+            continue
+        block["tokens"] = tokens
+        packed.append(block)
+        used += tokens
+    return packed
@@ -1,13 +1,28 @@
 from __future__ import annotations
-from typing import List, Dict, Any
-from pydantic_ai import Tool
-from ..ingestion.embeddings import embed_texts
-from ..ingestion.supabase_store import similarity_search
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List
+
+from pydantic_ai import ModelRetry, Tool
+from pydantic_ai.messages import ModelMessage, ModelRequest, ToolReturnPart
+
+from ..ingestion import lexical
+from ..ingestion.embeddings import embed_texts_async
+from ..ingestion.filters import validate_filter
+from ..ingestion.vector_store import get_vector_store
+from ..tracing import span
+from .context import CONTEXT_PACKING, pack_context
+
+
+logger = logging.getLogger(__name__)
 
 
 @Tool
-def kb_search(
-    query: str, k: int = 5, filter: Dict[str, Any] | None = None
+async def kb_search(
+    query: str,
+    k: int = 5,
+    filter: Dict[str, Any] | None = None,
+    hybrid: bool | None = None,
 ) -> List[Dict[str, Any]]:
     """
     Search the knowledge base with vector similarity.
@@ -15,48 +30,87 @@ def kb_search(
     Args:
         query: Natural language query.
         k: Number of results.
-        filter: Optional metadata filter.
+        filter: Optional filter applied before ranking. Keys: source (string
+            or list), url, url_prefix, created_after / created_before
+            (ISO-8601), metadata (object the metadata must contain).
+        hybrid: Also rank by keyword match and fuse both rankings. Use for
+            exact terms such as error codes, part numbers or identifiers.
+            Defaults to RAG_HYBRID_SEARCH.
 
     Returns:
-        List of {content, url, similarity, metadata} dicts.
+        List of {content, url, similarity, metadata} dicts (hybrid results
+        also carry the fused `score` they are ordered by). With
+        CONTEXT_PACKING on, adjacent chunks are merged into one entry
+        (see `pack_context`) and the list fits CONTEXT_TOKEN_BUDGET.
     """
     try:
-        emb = embed_texts([query])[0]
-        
-        # First try without filter since the RPC filter isn't working properly
-        rows = similarity_search(emb, match_count=k * 2)  # Get more results to filter locally
+        filter = validate_filter(filter)
+    except ValueError as e:
+        # Let the model correct its own filter instead of silently searching unfiltered.
+        raise ModelRetry(str(e)) from e
+    # Reason: async so several kb_search calls in one model turn (and
+    # concurrent chat sessions) overlap their embedding and search I/O.
+    try:
+        with span("kb_search", k=k) as s:
+            emb = (await embed_texts_async([query]))[0]
+            rows = await get_vector_store().search_async(
+                emb, match_count=k, filter=filter, hybrid=hybrid, query_text=query
+            )
+            s.add("rows", len(rows))
     except Exception as e:
-        print(f"Error in kb_search: {e}")
+        logger.warning("kb_search failed: %s", e)
         return []
-    
-    # Filter locally for uploaded documents if needed
-    filtered_rows = []
-    for r in rows:
-        # Check if this is an uploaded document
-        url = r.get("url", "")
-        source = r.get("source", "")
-        metadata = r.get("metadata", {})
-        
-        # Prefer uploaded documents (file:// URLs or source='upload')
-        is_uploaded = (
-            url.startswith("file://") or 
-            source == "upload" or 
-            metadata.get("source") == "upload"
-        )
-        
-        if is_uploaded:
-            filtered_rows.append(r)
-    
-    # If no uploaded docs found, use all results
-    if not filtered_rows:
-        filtered_rows = rows
-    
-    # Limit to requested number
-    filtered_rows = filtered_rows[:k]
-    
+
+    return _format_results(rows)
+
+
+async def kb_search_batch(
+    queries: List[str],
+    k: int = 5,
+    filter: Dict[str, Any] | None = None,
+    hybrid: bool | None = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    `kb_search` for many queries sharing `k`, `filter` and `hybrid`.
+
+    All queries are embedded with one `embed_texts_async` call and scored
+    with one batched search (`VectorStore.search_batch_async`). Hybrid
+    searches need each query's text, so they run concurrently one per query.
+
+    Args:
+        queries: Natural language queries.
+        k: Number of results per query.
+        filter: Optional filter (see `kb_search`).
+        hybrid: Fuse keyword and vector rankings. Defaults to RAG_HYBRID_SEARCH.
+
+    Returns:
+        One `kb_search`-shaped result list per query, in input order.
+
+    Raises:
+        ValueError: If `filter` is malformed.
+    """
+    filter = validate_filter(filter)
+    if not queries:
+        return []
+    store = get_vector_store()
+    with span("kb_search_batch", k=k, queries=len(queries)):
+        embeddings = await embed_texts_async(list(queries))
+        if lexical.HYBRID_SEARCH if hybrid is None else hybrid:
+            batches = await asyncio.gather(
+                *(
+                    store.search_async(emb, match_count=k, filter=filter, hybrid=True, query_text=q)
+                    for emb, q in zip(embeddings, queries)
+                )
+            )
+        else:
+            batches = await store.search_batch_async(embeddings, match_count=k, filter=filter)
+    return [_format_results(rows) for rows in batches]
+
+
+def _format_results(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     # Normalize fields
     out: List[Dict[str, Any]] = []
-    for r in filtered_rows:
+    for r in rows:
         out.append(
             {
                 "id": r.get("id"),
@@ -68,4 +122,42 @@ def kb_search(
                 "source": r.get("source", ""),
             }
         )
+        if r.get("score") is not None:
+            out[-1]["score"] = r["score"]
+    if CONTEXT_PACKING:
+        out = pack_context(out)
+    return out
+
+
+def kb_results_from_messages(messages: Iterable[ModelMessage]) -> List[Dict[str, Any]]:
+    """
+    Collect the chunks that kb_search returned during an agent run.
+
+    Walks the tool-return parts of the run's messages, so the caller sees
+    exactly what the model was given without searching again.
+
+    Args:
+        messages: Messages from the run, e.g. `run.result.new_messages()`.
+
+    Returns:
+        Chunks in first-returned order, deduplicated by id (or url + chunk_number).
+    """
+    out: List[Dict[str, Any]] = []
+    seen = set()
+    for message in messages:
+        if not isinstance(message, ModelRequest):
+            continue
+        for part in message.parts:
+            if not isinstance(part, ToolReturnPart) or part.tool_name != kb_search.name:
+                continue
+            if not isinstance(part.content, list):
+                continue
+            for row in part.content:
+                if not isinstance(row, dict):
+                    continue
+                key = row.get("id") or (row.get("url"), row.get("chunk_number"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.append(row)
     return out
@@ -17,3 +17,40 @@ WORKFLOW:
 5. You cite your sources
 
 Remember: You have access to a knowledge base through kb_search. Use it for every response."""
+
+
+SINGLE_SHOT_SYSTEM_PROMPT = """You are a helpful RAG (Retrieval-Augmented Generation) assistant. Your primary job is to answer questions using information from the user's uploaded documents.
+
+The most relevant document excerpts have already been retrieved and are included with the question under "CONTEXT".
+
+INSTRUCTIONS:
+1. Answer directly from the CONTEXT excerpts; do not call kb_search when they already cover the question
+2. NEVER answer from your own knowledge - ONLY use information from the documents
+3. Only if the CONTEXT is empty or clearly insufficient, call kb_search with a rephrased query
+4. Always cite your sources at the end, including similarity scores
+5. If you truly can't find relevant information, state this clearly"""
+
+
+def build_single_shot_prompt(question: str, chunks: list) -> str:
+    """
+    Combine the question with pre-retrieved chunks for single-shot answering.
+
+    Args:
+        question: The user's question.
+        chunks: kb_search results ({content, url, similarity, metadata} dicts).
+
+    Returns:
+        Prompt text with a numbered CONTEXT section followed by the question.
+    """
+    if not chunks:
+        return f"CONTEXT:\n(no matching excerpts found)\n\nQUESTION:\n{question}"
+    blocks = []
+    for i, c in enumerate(chunks, 1):
+        meta = c.get("metadata") or {}
+        label = meta.get("source") or c.get("url") or "unknown"
+        score = c.get("similarity")
+        score_txt = f", score {score:.3f}" if isinstance(score, (int, float)) else ""
+        numbers = c.get("chunk_numbers") or [c.get("chunk_number")]
+        where = f"chunk {numbers[0]}" if len(numbers) == 1 else f"chunks {numbers[0]}-{numbers[-1]}"
+        blocks.append(f"[{i}] {label} ({where}{score_txt})\n{c.get('content') or ''}")
+    return "CONTEXT:\n" + "\n\n".join(blocks) + f"\n\nQUESTION:\n{question}"
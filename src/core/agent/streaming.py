@@ -0,0 +1,159 @@
+from __future__ import annotations
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+from pydantic_ai import Agent
+from pydantic_ai.messages import PartDeltaEvent, PartStartEvent, TextPartDelta
+from ... import env as _env  # Load environment variables  # noqa: F401
+from ..ingestion.embeddings import embed_texts_async
+from .answer_cache import AnswerCache, get_answer_cache
+from .kb import kb_results_from_messages, kb_search
+from .response_templates import build_single_shot_prompt
+from ..tracing import span
+
+
+__all__ = ["AGENT_MODES", "StreamStats", "run_agent_with_streaming"]
+
+
+# "tool": the model decides to call kb_search (two LLM calls per answer).
+# "single_shot": retrieve first, answer in one LLM call.
+AGENT_MODES = ("tool", "single_shot")
+AGENT_MODE = os.getenv("AGENT_MODE", "tool")
+PRE_RETRIEVAL_K = int(os.getenv("PRE_RETRIEVAL_K", "5"))
+
+
+@dataclass
+class StreamStats:
+    """Timings for one streamed answer (perf_counter seconds)."""
+
+    mode: str
+    started: float
+    retrieved: Optional[float] = None
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    cached: bool = False
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from the request to the first answer token."""
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def total(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
+
+
+def _default_agent(mode: str) -> Agent:
+    # Reason: imported lazily because building the OpenAI model at import time
+    # requires OPENAI_API_KEY, which tests and tooling may not set.
+    from .agent import agent, single_shot_agent
+
+    return single_shot_agent if mode == "single_shot" else agent
+
+
+def _add_sources(sources: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> None:
+    seen = {r.get("id") or (r.get("url"), r.get("chunk_number")) for r in sources}
+    for row in rows:
+        key = row.get("id") or (row.get("url"), row.get("chunk_number"))
+        if key not in seen:
+            seen.add(key)
+            sources.append(row)
+
+
+async def run_agent_with_streaming(
+    user_input: str,
+    sources: Optional[List[Dict[str, Any]]] = None,
+    mode: Optional[str] = None,
+    stats: Optional[StreamStats] = None,
+    agent: Optional[Agent] = None,
+    cache: Optional[AnswerCache] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream the agent's answer text.
+
+    Args:
+        user_input: The user's question.
+        sources: Optional list extended with every chunk kb_search returned
+            (pre-retrieved and follow-up), once the run finishes.
+        mode: "tool" or "single_shot" (default AGENT_MODE).
+        stats: Optional StreamStats filled with retrieval, first-token and
+            completion times so modes can be compared.
+        agent: Agent override (defaults to the agent for `mode`).
+        cache: Answer cache (defaults to the process-wide one, which exists
+            only when ANSWER_CACHE is set). A question similar enough to one
+            answered in the same mode against the current corpus version is
+            answered from the cache without retrieval or model calls;
+            otherwise the finished answer and its sources are stored.
+
+    Returns:
+        Async iterator of text deltas; the last item is always "".
+    """
+    mode = mode or AGENT_MODE
+    if mode not in AGENT_MODES:
+        raise ValueError(f"Unknown agent mode: {mode!r} (expected one of {AGENT_MODES})")
+    stats = stats or StreamStats(mode=mode, started=time.perf_counter())
+    if cache is None:
+        cache = get_answer_cache()
+    if sources is None:
+        sources = []
+    first_source = len(sources)
+
+    with span("agent.run", mode=mode) as trace:
+        query_embedding = version = None
+        if cache is not None:
+            # Reason: read the version first so an answer racing a corpus
+            # update is stored against the old version and never served.
+            version = cache.version()
+            query_embedding = (await embed_texts_async([user_input]))[0]
+            hit = cache.lookup(query_embedding, mode)
+            if hit is not None:
+                trace.add("answer_cache_hits")
+                stats.cached = True
+                stats.first_token = time.perf_counter()
+                trace.mark("first_token")
+                _add_sources(sources, hit.sources)
+                yield hit.answer
+                stats.finished = time.perf_counter()
+                yield ""
+                return
+
+        agent = agent or _default_agent(mode)
+        answer: List[str] = []
+        prompt = user_input
+        if mode == "single_shot":
+            chunks = await kb_search.function(user_input, k=PRE_RETRIEVAL_K)
+            stats.retrieved = time.perf_counter()
+            trace.mark("retrieved")
+            _add_sources(sources, chunks)
+            prompt = build_single_shot_prompt(user_input, chunks)
+
+        async with agent.iter(prompt) as run:
+            async for node in run:
+                if Agent.is_model_request_node(node):
+                    trace.add("model_requests")
+                    with span("agent.model_request"):
+                        async with node.stream(run.ctx) as request_stream:
+                            async for event in request_stream:
+                                text = ""
+                                if (
+                                    isinstance(event, PartStartEvent)
+                                    and event.part.part_kind == "text"
+                                ):
+                                    text = event.part.content or ""
+                                elif isinstance(event, PartDeltaEvent) and isinstance(
+                                    event.delta, TextPartDelta
+                                ):
+                                    text = event.delta.content_delta or ""
+                                if text:
+                                    if stats.first_token is None:
+                                        stats.first_token = time.perf_counter()
+                                        trace.mark("first_token")
+                                    answer.append(text)
+                                    yield text
+            if run.result is not None:
+                _add_sources(sources, kb_results_from_messages(run.result.new_messages()))
+        if cache is not None:
+            cache.store(user_input, query_embedding, "".join(answer), sources[first_source:], mode, version)
+    stats.finished = time.perf_counter()
+    yield ""
@@ -0,0 +1,341 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+from .. import env as _env  # Load environment variables  # noqa: F401
+from .tracing import count, enabled as tracing_enabled
+
+
+__all__ = [
+    "get_http_client",
+    "get_openai_client",
+    "get_async_openai_client",
+    "get_supabase_client",
+    "get_database_url",
+    "get_pg_pool",
+    "get_async_pg_pool",
+    "close_pg_pool",
+    "close_clients",
+    "aclose_clients",
+    "refresh_clients",
+]
+
+
+# Keep-alive pool limits for every sync HTTP client (OpenAI + Supabase REST).
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+
+# Reason: one re-entrant lock guards every slot so getters can build on each
+# other without deadlocking.
+_lock = threading.RLock()
+_http_client = None
+_openai_clients: Dict[Optional[str], Any] = {}
+# (url, key) -> (Supabase client, the httpx.Client it owns).
+_supabase_clients: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+_pg_pool = None
+# AsyncOpenAI clients hold connections bound to one event loop, so they are
+# cached per loop and forgotten when the loop is garbage collected.
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Optional[str], Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+# Same for async psycopg pools; the value is the task that opens the pool.
+_async_pg_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _count_request(request) -> None:
+    if tracing_enabled():
+        try:
+            count("bytes_sent", len(request.content))
+        except Exception:  # streaming body, not read yet
+            pass
+
+
+def _count_response(response) -> None:
+    if tracing_enabled():
+        size = response.headers.get("content-length")
+        if size and size.isdigit():
+            count("bytes_received", int(size))
+
+
+async def _acount_request(request) -> None:
+    _count_request(request)
+
+
+async def _acount_response(response) -> None:
+    _count_response(response)
+
+
+# Reason: hooks add the HTTP payload sizes to the active trace span; they
+# return immediately while tracing is off.
+_EVENT_HOOKS = {"request": [_count_request], "response": [_count_response]}
+_ASYNC_EVENT_HOOKS = {"request": [_acount_request], "response": [_acount_response]}
+
+
+def get_http_client():
+    """
+    Return the process-wide pooled `httpx.Client`.
+
+    Connections are kept alive between requests, so repeated calls to the
+    same host skip DNS, TCP and TLS setup.
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            import httpx
+
+            _http_client = httpx.Client(limits=_limits(), timeout=HTTP_TIMEOUT, event_hooks=_EVENT_HOOKS)
+        return _http_client
+
+
+def _openai_api_key(api_key: Optional[str]) -> str:
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    return api_key
+
+
+def get_openai_client(api_key: Optional[str] = None):
+    """
+    Return a shared sync OpenAI client.
+
+    SDK retries are disabled; callers (see `OpenAIEmbeddingBackend`) own
+    retry and backoff so it can be coordinated across worker threads.
+
+    Args:
+        api_key: Optional key; defaults to OPENAI_API_KEY.
+    """
+    with _lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            from openai import DefaultHttpxClient, OpenAI
+
+            client = OpenAI(
+                api_key=_openai_api_key(api_key),
+                max_retries=0,
+                http_client=DefaultHttpxClient(
+                    limits=_limits(), timeout=HTTP_TIMEOUT, event_hooks=_EVENT_HOOKS
+                ),
+            )
+            _openai_clients[api_key] = client
+        return client
+
+
+def get_async_openai_client(api_key: Optional[str] = None):
+    """
+    Return the AsyncOpenAI client for the running event loop.
+
+    Each loop gets its own client (and connection pool), since async
+    connections cannot be shared across loops.
+
+    Args:
+        api_key: Optional key; defaults to OPENAI_API_KEY.
+
+    Raises:
+        RuntimeError: If called outside a running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_openai_clients.setdefault(loop, {})
+        client = per_loop.get(api_key)
+        if client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            client = AsyncOpenAI(
+                api_key=_openai_api_key(api_key),
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=_limits(), timeout=HTTP_TIMEOUT, event_hooks=_ASYNC_EVENT_HOOKS
+                ),
+            )
+            per_loop[api_key] = client
+        return client
+
+
+def get_supabase_client(url: str, key: str):
+    """
+    Return a shared Supabase client for (url, key).
+
+    REST calls go through a keep-alive `httpx.Client` owned by this client.
+    It is not shared with other clients, because postgrest sets the
+    client's base URL and apikey / Authorization headers on it.
+    """
+    with _lock:
+        entry = _supabase_clients.get((url, key))
+        if entry is None:
+            import httpx
+            from supabase import ClientOptions, create_client
+
+            http_client = httpx.Client(limits=_limits(), timeout=HTTP_TIMEOUT, event_hooks=_EVENT_HOOKS)
+            client = create_client(url, key, options=ClientOptions(httpx_client=http_client))
+            entry = _supabase_clients[(url, key)] = (client, http_client)
+        return entry[0]
+
+
+def get_database_url() -> Optional[str]:
+    """Return the direct Postgres connection string, if configured."""
+    return os.getenv("SUPABASE_DB_URL") or os.getenv("DATABASE_URL")
+
+
+def _configure_connection(conn) -> None:
+    # Reason: registering the pgvector adapter lets us send the query vector in
+    # binary form instead of formatting 1536 floats into a SQL literal.
+    from pgvector.psycopg import register_vector
+
+    register_vector(conn)
+
+
+async def _configure_async_connection(conn) -> None:
+    from pgvector.psycopg import register_vector_async
+
+    await register_vector_async(conn)
+
+
+def _require_database_url() -> str:
+    conninfo = get_database_url()
+    if not conninfo:
+        raise RuntimeError(
+            "Missing database URL. Set SUPABASE_DB_URL (or DATABASE_URL) to use direct pgvector search."
+        )
+    return conninfo
+
+
+def get_pg_pool():
+    """
+    Return the process-wide psycopg connection pool, creating it on first use.
+
+    Returns:
+        psycopg_pool.ConnectionPool connected to SUPABASE_DB_URL / DATABASE_URL.
+    """
+    global _pg_pool
+    if _pg_pool is not None:
+        return _pg_pool
+    with _lock:
+        if _pg_pool is None:
+            from psycopg_pool import ConnectionPool
+
+            _pg_pool = ConnectionPool(
+                _require_database_url(),
+                min_size=PG_POOL_MIN_SIZE,
+                max_size=PG_POOL_MAX_SIZE,
+                kwargs={"autocommit": True},
+                configure=_configure_connection,
+                open=True,
+            )
+    return _pg_pool
+
+
+async def get_async_pg_pool():
+    """
+    Return the psycopg `AsyncConnectionPool` for the running event loop.
+
+    Returns:
+        psycopg_pool.AsyncConnectionPool connected to SUPABASE_DB_URL / DATABASE_URL.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        opening = _async_pg_pools.get(loop)
+        if opening is None:
+            conninfo = _require_database_url()
+
+            async def _open():
+                from psycopg_pool import AsyncConnectionPool
+
+                pool = AsyncConnectionPool(
+                    conninfo,
+                    min_size=PG_POOL_MIN_SIZE,
+                    max_size=PG_POOL_MAX_SIZE,
+                    kwargs={"autocommit": True},
+                    configure=_configure_async_connection,
+                    open=False,
+                )
+                await pool.open()
+                return pool
+
+            # Reason: coroutines racing on first use all await the same task,
+            # so only one pool is opened per loop.
+            opening = loop.create_task(_open())
+            _async_pg_pools[loop] = opening
+    try:
+        return await opening
+    except Exception:
+        with _lock:
+            if _async_pg_pools.get(loop) is opening:
+                del _async_pg_pools[loop]
+        raise
+
+
+def close_pg_pool() -> None:
+    """Close the psycopg pool if it was opened."""
+    global _pg_pool
+    with _lock:
+        if _pg_pool is not None:
+            _pg_pool.close()
+            _pg_pool = None
+
+
+def close_clients() -> None:
+    """
+    Close every shared client and pool; the next getter call rebuilds them.
+
+    Async clients are dropped without awaiting their close (their loops may
+    already be gone); use `aclose_clients()` from inside a loop to close them
+    cleanly.
+    """
+    global _http_client
+    with _lock:
+        for client in _openai_clients.values():
+            client.close()
+        _openai_clients.clear()
+        for _, http_client in _supabase_clients.values():
+            http_client.close()
+        _supabase_clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        _async_openai_clients.clear()
+        _async_pg_pools.clear()
+        close_pg_pool()
+
+
+async def aclose_clients() -> None:
+    """Close the running loop's async clients, then every sync client."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_openai_clients.pop(loop, {})
+        opening = _async_pg_pools.pop(loop, None)
+    for client in per_loop.values():
+        await client.close()
+    if opening is not None:
+        try:
+            pool = await opening
+        except Exception:
+            pool = None
+        if pool is not None:
+            await pool.close()
+    close_clients()
+
+
+def refresh_clients() -> None:
+    """
+    Drop and rebuild clients lazily, e.g. after rotating keys in the environment.
+    """
+    close_clients()
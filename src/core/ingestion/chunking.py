@@ -1,12 +1,16 @@
 from __future__ import annotations
-from typing import List
+import re
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 
-def simple_chunk_text(
+def simple_chunk_bounds(
     text: str, max_chars: int = 1200, overlap: int = 150
-) -> List[str]:
+) -> List[Tuple[int, int]]:
     """
-    Simple character-based chunking with overlap.
+    Character offsets of the chunks produced by `simple_chunk_text`.
 
     Args:
         text: Raw text to split.
@@ -14,7 +18,8 @@ def simple_chunk_text(
         overlap: Overlap between chunks to preserve context.
 
     Returns:
-        List of chunk strings.
+        List of (start, end) offsets such that `text[start:end]` is each chunk
+        (already stripped of surrounding whitespace).
     """
     if not text:
         return []
@@ -22,15 +27,288 @@ def simple_chunk_text(
     max_chars = max(200, int(max_chars))
     overlap = max(0, min(int(overlap), max_chars // 2))
 
-    chunks: List[str] = []
+    bounds: List[Tuple[int, int]] = []
     start = 0
     n = len(text)
     while start < n:
         end = min(start + max_chars, n)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+        lo, hi = start, end
+        # Reason: same result as text[start:end].strip(), without copying.
+        while lo < hi and text[lo].isspace():
+            lo += 1
+        while hi > lo and text[hi - 1].isspace():
+            hi -= 1
+        if hi > lo:
+            bounds.append((lo, hi))
         if end >= n:
             break
         start = end - overlap
-    return chunks
+    return bounds
+
+
+def simple_chunk_text(
+    text: str, max_chars: int = 1200, overlap: int = 150
+) -> List[str]:
+    """
+    Simple character-based chunking with overlap.
+
+    Args:
+        text: Raw text to split.
+        max_chars: Max characters per chunk.
+        overlap: Overlap between chunks to preserve context.
+
+    Returns:
+        List of chunk strings.
+    """
+    return [text[s:e] for s, e in simple_chunk_bounds(text, max_chars, overlap)]
+
+
+# ---------------------------------------------------------------------------
+# Structure-aware chunking with offset spans
+# ---------------------------------------------------------------------------
+
+# Sentence end: terminal punctuation, optional closing quotes/brackets, whitespace.
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+_WHITESPACE = re.compile(r"\s")
+
+
+class ChunkSpan:
+    """
+    A chunk as offsets into its source text.
+
+    Attributes:
+        start: Offset of the first character (inclusive).
+        end: Offset after the last character (exclusive).
+        page: 1-based page the chunk starts on, or None.
+        chunk_number: Position of the chunk within its document.
+    """
+
+    __slots__ = ("start", "end", "page", "chunk_number")
+
+    def __init__(self, start: int, end: int, page: Optional[int], chunk_number: int):
+        self.start = start
+        self.end = end
+        self.page = page
+        self.chunk_number = chunk_number
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return (
+            f"ChunkSpan(start={self.start}, end={self.end}, "
+            f"page={self.page}, chunk_number={self.chunk_number})"
+        )
+
+    def text(self, source: str) -> str:
+        """Materialize the chunk from the full source text."""
+        return source[self.start : self.end]
+
+
+class ChunkSpans:
+    """
+    Array-backed list of chunk spans over one source text.
+
+    Offsets live in three `array('q')` columns (page -1 = unknown), so a
+    document's chunk list costs 24 bytes per chunk instead of a string copy.
+    """
+
+    def __init__(self, text: str):
+        self.source = text
+        self._starts = array("q")
+        self._ends = array("q")
+        self._pages = array("q")
+
+    def _append(self, start: int, end: int, page: Optional[int]) -> None:
+        self._starts.append(start)
+        self._ends.append(end)
+        self._pages.append(-1 if page is None else page)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, i: int) -> ChunkSpan:
+        if i < 0:
+            i += len(self)
+        page = self._pages[i]
+        return ChunkSpan(self._starts[i], self._ends[i], None if page < 0 else page, i)
+
+    def __iter__(self) -> Iterator[ChunkSpan]:
+        return (self[i] for i in range(len(self)))
+
+    def text(self, i: int) -> str:
+        """Materialize chunk `i`."""
+        return self.source[self._starts[i] : self._ends[i]]
+
+    def texts(self) -> Iterator[str]:
+        """Materialize every chunk lazily, in order."""
+        return (self.text(i) for i in range(len(self)))
+
+
+def _skip_space(text: str, i: int, n: int) -> int:
+    while i < n and text[i].isspace():
+        i += 1
+    return i
+
+
+def _pick_end(text: str, start: int, limit: int, min_end: int) -> int:
+    """Best break in [min_end, limit]: paragraph, sentence, line, word, else hard cut."""
+    i = text.rfind("\n\n", min_end, limit)
+    if i != -1:
+        return i
+    last = None
+    for last in _SENTENCE_END.finditer(text, min_end, limit + 1):
+        pass
+    if last is not None:
+        return last.end() - 1
+    i = text.rfind("\n", min_end, limit)
+    if i != -1:
+        return i
+    i = max(text.rfind(" ", min_end, limit), text.rfind("\t", min_end, limit))
+    if i != -1:
+        return i
+    return limit
+
+
+def _span_at(
+    text: str, start: int, max_chars: int, overlap: int, final: bool
+) -> Optional[Tuple[int, int, int]]:
+    """
+    Locate the chunk at or after `start`.
+
+    Returns:
+        (chunk_start, chunk_end, next_start), or None when nothing is left
+        (final) or more text is needed to decide (streaming).
+    """
+    n = len(text)
+    s = _skip_space(text, start, n)
+    if s >= n:
+        return None
+    limit = s + max_chars
+    if limit >= n:
+        if not final:
+            return None
+        end = n
+    else:
+        end = _pick_end(text, s, limit, s + max_chars // 2)
+    e = end
+    while e > s and text[e - 1].isspace():
+        e -= 1
+    if end >= n:
+        return s, e, n
+    ov = min(overlap, (e - s) // 2)
+    nxt = e - ov
+    if ov:
+        # Reason: start the overlap at a word boundary rather than mid-word.
+        m = _WHITESPACE.search(text, nxt, e)
+        if m is not None:
+            nxt = m.start()
+    nxt = _skip_space(text, max(nxt, s + 1), n)
+    return s, e, nxt
+
+
+def _normalize_sizes(max_chars: int, overlap: int) -> Tuple[int, int]:
+    max_chars = max(200, int(max_chars))
+    overlap = max(0, min(int(overlap), max_chars // 2))
+    return max_chars, overlap
+
+
+def structure_chunk_spans(
+    text: str,
+    max_chars: int = 1200,
+    overlap: int = 150,
+    page_starts: Optional[Sequence[int]] = None,
+) -> ChunkSpans:
+    """
+    Chunk text at paragraph, then sentence, then word boundaries.
+
+    Each chunk is at most `max_chars` long and at least half of that unless
+    the text ends; consecutive chunks share at most `overlap` characters,
+    starting on a word boundary. Only offsets are stored.
+
+    Args:
+        text: Raw text to split.
+        max_chars: Max characters per chunk.
+        overlap: Max overlap between consecutive chunks.
+        page_starts: Optional offsets where each page begins (page i + 1 at index i).
+
+    Returns:
+        ChunkSpans over `text`.
+    """
+    spans = ChunkSpans(text)
+    if not text:
+        return spans
+    max_chars, overlap = _normalize_sizes(max_chars, overlap)
+    start = 0
+    while True:
+        found = _span_at(text, start, max_chars, overlap, final=True)
+        if found is None:
+            break
+        s, e, start = found
+        page = bisect_right(page_starts, s) if page_starts else None
+        spans._append(s, e, page)
+        if start >= len(text):
+            break
+    return spans
+
+
+Segment = Union[str, Tuple[Optional[int], str]]
+
+
+def stream_chunk_spans(
+    segments: Iterable[Segment],
+    max_chars: int = 1200,
+    overlap: int = 150,
+) -> Iterator[Tuple[ChunkSpan, str]]:
+    """
+    Structure-aware chunking over a stream of text segments.
+
+    Produces the same chunks as `structure_chunk_spans` on the concatenated
+    text, while holding only about one chunk plus one segment in memory, so
+    arbitrarily large inputs can be chunked from an iterator.
+
+    Args:
+        segments: Text pieces in order, either plain strings or
+            (page_number, text) tuples to tag chunks with pages.
+        max_chars: Max characters per chunk.
+        overlap: Max overlap between consecutive chunks.
+
+    Returns:
+        Iterator of (span, chunk_text); span offsets are global positions in
+        the concatenated stream.
+    """
+    max_chars, overlap = _normalize_sizes(max_chars, overlap)
+    it = iter(segments)
+    buf = ""
+    base = 0  # global offset of buf[0]
+    local = 0  # current position within buf
+    pages: Deque[Tuple[int, int]] = deque()  # (global offset, page number)
+    exhausted = False
+    chunk_number = 0
+
+    while True:
+        found = _span_at(buf, local, max_chars, overlap, final=exhausted)
+        if found is None:
+            if exhausted:
+                return
+            seg = next(it, None)
+            if seg is None:
+                exhausted = True
+                continue
+            page, piece = seg if isinstance(seg, tuple) else (None, seg)
+            # Reason: drop consumed text only when refilling, so each chunk
+            # does not copy the whole buffer.
+            buf = buf[local:] + piece
+            base += local
+            local = 0
+            if page is not None:
+                pages.append((base + len(buf) - len(piece), page))
+            continue
+
+        s, e, local = found
+        gs = base + s
+        while len(pages) > 1 and pages[1][0] <= gs:
+            pages.popleft()
+        page = pages[0][1] if pages and pages[0][0] <= gs else None
+        yield ChunkSpan(gs, base + e, page, chunk_number), buf[s:e]
+        chunk_number += 1
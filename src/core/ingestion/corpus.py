@@ -0,0 +1,146 @@
+from __future__ import annotations
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Iterable, Optional, Set, Tuple
+
+from ...env import cache_path
+
+
+__all__ = ["corpus_version", "bump_corpus_version", "corpus_changes", "CORPUS_VERSION_PATH"]
+
+
+# Shared by every process on this host (app, API, job workers), so a write
+# in one invalidates answers cached by the others; hence the per-user cache
+# dir rather than a path relative to the working directory.
+CORPUS_VERSION_PATH = os.getenv("CORPUS_VERSION_PATH") or cache_path("corpus_version")
+# The change log (`<CORPUS_VERSION_PATH>.log`) is trimmed to about half once
+# it passes this size; readers that lose their place fall back to a reload.
+CORPUS_LOG_MAX_BYTES = 1024 * 1024
+
+# Any url ("*"): the write was not attributed to specific documents.
+_ALL = "*"
+
+# (path, inode, mtime_ns, version) from the last read of the version file.
+_cached: Optional[Tuple[str, int, int, str]] = None
+_cached_lock = threading.Lock()
+
+
+def _log_path() -> str:
+    return f"{CORPUS_VERSION_PATH}.log"
+
+
+def corpus_version() -> str:
+    """
+    Current corpus version token ("0" before the first recorded write).
+
+    Cached against the file's inode and mtime, so callers on the hot path
+    (every local-index search) pay one `stat` rather than a read.
+    """
+    global _cached
+    path = CORPUS_VERSION_PATH
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "0"
+    cached = _cached
+    if cached is not None and cached[:3] == (path, st.st_ino, st.st_mtime_ns):
+        return cached[3]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            version = f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+    with _cached_lock:
+        _cached = (path, st.st_ino, st.st_mtime_ns, version)
+    return version
+
+
+def bump_corpus_version(urls: Optional[Iterable[str]] = None) -> str:
+    """
+    Record that the stored chunks changed and return the new version.
+
+    The version is a random token rather than a counter, so concurrent bumps
+    from several processes never need a read-modify-write.
+
+    Args:
+        urls: Documents whose chunks changed; None when unknown (readers of
+            `corpus_changes` then treat every document as changed).
+
+    Returns:
+        str: The new version token.
+    """
+    version = uuid.uuid4().hex
+    Path(CORPUS_VERSION_PATH).parent.mkdir(parents=True, exist_ok=True)
+    # Reason: log first, so a reader that sees the new version finds its urls.
+    entries = sorted(set(urls)) if urls is not None else [_ALL]
+    _append_log(version, entries)
+    # Reason: write-then-rename so readers never see a torn token.
+    tmp = f"{CORPUS_VERSION_PATH}.{version}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, CORPUS_VERSION_PATH)
+    return version
+
+
+def _append_log(version: str, urls: Iterable[str]) -> None:
+    path = _log_path()
+    data = "".join(f"{version}\t{url}\n" for url in urls).encode("utf-8")
+    # Reason: one O_APPEND write per bump, so entries from concurrent
+    # processes never interleave mid-line.
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    if size > CORPUS_LOG_MAX_BYTES:
+        with open(path, "rb") as f:
+            f.seek(size // 2)
+            f.readline()
+            tail = f.read()
+        tmp = f"{path}.{version}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(tail)
+        # Reason: an append racing the rename is lost, so its version is missing
+        # from the log and `corpus_changes` reports "unknown" for it.
+        os.replace(tmp, path)
+
+
+def corpus_changes(since: str, until: str) -> Optional[Set[str]]:
+    """
+    Urls written between two corpus versions.
+
+    Args:
+        since: Version the caller last synced to.
+        until: Version the caller is syncing to (read before calling).
+
+    Returns:
+        Optional[Set[str]]: Urls changed after `since` (up to `until` and
+        possibly a little beyond), or None when the log cannot tell: either
+        version is missing from it, or a write was not attributed to urls.
+    """
+    if since == until:
+        return set()
+    try:
+        with open(_log_path(), "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+    start = None
+    for i in range(len(lines) - 1, -1, -1):
+        if lines[i].partition("\t")[0] == since:
+            start = i + 1
+            break
+    if start is None:
+        return None
+    changed: Set[str] = set()
+    seen_until = False
+    for line in lines[start:]:
+        version, _, url = line.partition("\t")
+        if url == _ALL:
+            return None
+        changed.add(url)
+        seen_until = seen_until or version == until
+    return changed if seen_until else None
@@ -0,0 +1,320 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Protocol, Sequence
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a chars/4 estimate
+    tiktoken = None
+
+
+__all__ = [
+    "EmbeddingBackend",
+    "OpenAIEmbeddingBackend",
+    "FakeEmbeddingBackend",
+    "BatchingEmbedder",
+    "estimate_tokens",
+    "plan_batches",
+    "backend_from_env",
+]
+
+
+# OpenAI limits: 2048 inputs and ~300k tokens per request, 8191 tokens per input.
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 250_000
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # Reason: tiktoken downloads its BPE file on first use; offline
+                # runs fall back to the character estimate.
+                _encoding = None
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count for `text` (tiktoken when available, else ~4 chars per token).
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def plan_batches(
+    texts: Sequence[str],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_items: int = MAX_BATCH_ITEMS,
+) -> List[List[int]]:
+    """
+    Pack texts, in order, into batches bounded by token and item counts.
+
+    Args:
+        texts: Input texts.
+        max_tokens: Token budget per batch.
+        max_items: Max inputs per batch.
+
+    Returns:
+        Lists of input indices; concatenated they are `range(len(texts))`.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (used + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingBackend(Protocol):
+    """
+    Anything that embeds one request's worth of texts.
+
+    Backends may also define `async aembed(texts)`; `BatchingEmbedder.aembed`
+    falls back to running `embed` in a worker thread when they do not.
+    """
+
+    model: str
+    # Requested (shortened) output size, or None for the model's native size.
+    dimensions: Optional[int]
+
+    def embed(self, texts: List[str]) -> List[List[float]]: ...
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status == 429 or (isinstance(status, int) and status >= 500):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(exc, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError))
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAIEmbeddingBackend:
+    """
+    OpenAI embeddings with retry/backoff on 429s and transient errors.
+
+    `dimensions` asks text-embedding-3 models for a shortened (Matryoshka)
+    embedding; the API returns it already L2-normalized.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        api_key: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        self.model = model
+        self.api_key = api_key
+        self.dimensions = dimensions
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _client(self):
+        from ..clients import get_openai_client
+
+        # Shared keep-alive client with SDK retries off; backoff is handled here.
+        return get_openai_client(self.api_key)
+
+    def _async_client(self):
+        from ..clients import get_async_openai_client
+
+        return get_async_openai_client(self.api_key)
+
+    def _backoff(self, exc: Exception, attempt: int) -> float:
+        if attempt >= self.max_retries or not _is_retryable(exc):
+            raise exc
+        # Reason: full jitter keeps concurrent workers from retrying in lockstep.
+        return _retry_after(exc) or random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2**attempt)
+        )
+
+    def _params(self, texts: List[str]) -> dict:
+        params = {"model": self.model, "input": texts}
+        if self.dimensions:
+            params["dimensions"] = self.dimensions
+        return params
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        client = self._client()
+        attempt = 0
+        while True:
+            try:
+                resp = client.embeddings.create(**self._params(texts))
+                # Ensure ordering preserved
+                return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+            except Exception as e:
+                time.sleep(self._backoff(e, attempt))
+                attempt += 1
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        client = self._async_client()
+        attempt = 0
+        while True:
+            try:
+                resp = await client.embeddings.create(**self._params(texts))
+                return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+            except Exception as e:
+                await asyncio.sleep(self._backoff(e, attempt))
+                attempt += 1
+
+
+class FakeEmbeddingBackend:
+    """
+    Deterministic offline embeddings for tests and benchmarks.
+
+    Each text maps to a unit vector seeded by its sha256, so equal texts get
+    equal vectors. `latency` simulates one API round trip per request.
+    `dimensions` truncates and renormalizes, like the OpenAI parameter.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        latency: float = 0.0,
+        model: str = "fake-embedding",
+        dimensions: Optional[int] = None,
+    ):
+        self.dim = dim
+        self.latency = latency
+        self.model = model
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        if self.dimensions:
+            vec = vec[: self.dimensions]
+        return vec / np.linalg.norm(vec)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self.vector(t).tolist() for t in texts]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.vector(t).tolist() for t in texts]
+
+
+class BatchingEmbedder:
+    """
+    Split texts into token-bounded batches and embed them concurrently.
+
+    Output order always matches input order, regardless of which batch
+    finishes first.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        max_tokens: int = MAX_BATCH_TOKENS,
+        max_items: int = MAX_BATCH_ITEMS,
+        max_concurrency: int = 4,
+    ):
+        self.backend = backend
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.max_concurrency = max(1, max_concurrency)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = plan_batches(texts, self.max_tokens, self.max_items)
+        payloads = [[texts[i] for i in batch] for batch in batches]
+        if len(payloads) == 1 or self.max_concurrency == 1:
+            results = [self.backend.embed(p) for p in payloads]
+        else:
+            workers = min(self.max_concurrency, len(payloads))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # map() yields in submission order, which keeps output deterministic.
+                results = list(pool.map(self.backend.embed, payloads))
+        return self._merge(len(texts), batches, results)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async `embed`: batches run as concurrent requests on the event loop."""
+        if not texts:
+            return []
+        batches = plan_batches(texts, self.max_tokens, self.max_items)
+        payloads = [[texts[i] for i in batch] for batch in batches]
+        aembed = getattr(self.backend, "aembed", None)
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(payload: List[str]) -> List[List[float]]:
+            async with limit:
+                if aembed is not None:
+                    return await aembed(payload)
+                return await asyncio.to_thread(self.backend.embed, payload)
+
+        results = await asyncio.gather(*(one(p) for p in payloads))
+        return self._merge(len(texts), batches, results)
+
+    @staticmethod
+    def _merge(
+        n: int, batches: List[List[int]], results: Sequence[List[List[float]]]
+    ) -> List[List[float]]:
+        out: List[List[float]] = [None] * n  # type: ignore[list-item]
+        for batch, vectors in zip(batches, results):
+            if len(vectors) != len(batch):
+                raise RuntimeError(
+                    f"Embedding backend returned {len(vectors)} vectors for {len(batch)} inputs"
+                )
+            for i, vec in zip(batch, vectors):
+                out[i] = vec
+        return out
+
+
+def backend_from_env(model: str, dimensions: Optional[int] = None) -> EmbeddingBackend:
+    """Build the backend selected by EMBED_BACKEND (openai | fake)."""
+    kind = os.getenv("EMBED_BACKEND", "openai").lower()
+    if kind == "fake":
+        return FakeEmbeddingBackend(
+            dim=int(os.getenv("EMBED_FAKE_DIM", "1536")),
+            latency=float(os.getenv("EMBED_FAKE_LATENCY", "0")),
+            dimensions=dimensions,
+        )
+    if kind != "openai":
+        raise RuntimeError(f"Unknown EMBED_BACKEND: {kind!r} (expected 'openai' or 'fake')")
+    return OpenAIEmbeddingBackend(model, dimensions=dimensions)
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ...env import cache_path
+
+
+__all__ = ["EmbeddingCache", "cache_from_env", "text_key"]
+
+
+def text_key(text: str) -> str:
+    """Content address for a text: hex sha256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_access_idx ON embeddings(last_access);
+"""
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, sha256(text)).
+
+    Tier 1 is an in-memory LRU of float32 vectors; tier 2 is an optional
+    SQLite file holding the same vectors as raw float32 blobs. The disk tier
+    is evicted least-recently-used first once it exceeds `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_items: int = 10_000,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _remember(self, key: Tuple[str, str], vec: np.ndarray) -> None:
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings for `texts`.
+
+        Args:
+            model: Embedding model name.
+            texts: Input texts.
+
+        Returns:
+            One float32 vector per text, or None for a miss.
+        """
+        keys = [(model, text_key(t)) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        disk_lookup: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    out[i] = vec
+                    self.stats["memory_hits"] += 1
+                else:
+                    disk_lookup.setdefault(key[1], []).append(i)
+
+            if disk_lookup and self._db is not None:
+                hashes = list(disk_lookup)
+                now = time.time()
+                # Reason: SQLite caps bound parameters, so look up in slices.
+                for start in range(0, len(hashes), 500):
+                    part = hashes[start : start + 500]
+                    marks = ",".join("?" * len(part))
+                    rows = self._db.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({marks})",
+                        [model, *part],
+                    ).fetchall()
+                    for text_hash, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        self._remember((model, text_hash), vec)
+                        for i in disk_lookup.pop(text_hash):
+                            out[i] = vec
+                            self.stats["disk_hits"] += 1
+                    self._db.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h, _ in rows],
+                    )
+                self._db.commit()
+
+            self.stats["misses"] += sum(len(v) for v in disk_lookup.values())
+        return out
+
+    def put_many(
+        self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]
+    ) -> None:
+        """
+        Store embeddings for `texts` in both tiers.
+
+        Args:
+            model: Embedding model name.
+            texts: Input texts.
+            vectors: Embeddings aligned with `texts`.
+        """
+        now = time.time()
+        records = []
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                arr = np.asarray(vec, dtype=np.float32)
+                key = (model, text_key(text))
+                self._remember(key, arr)
+                records.append((model, key[1], arr.tobytes(), arr.nbytes, now))
+            if self._db is not None and records:
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings(model, text_hash, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    records,
+                )
+                if self._db.total_changes > before:
+                    # INSERT OR IGNORE skips duplicates; vectors for one model share a size.
+                    self._disk_bytes += (self._db.total_changes - before) * records[0][3]
+                self._evict_disk()
+                self._db.commit()
+
+    def _evict_disk(self) -> None:
+        if self._db is None or self._disk_bytes <= self.max_disk_bytes:
+            return
+        # Reason: evict down to 90% so we don't run this on every insert.
+        target = int(self.max_disk_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT model, text_hash, size FROM embeddings ORDER BY last_access"
+        )
+        victims = []
+        freed = 0
+        for model, text_hash, size in rows:
+            if self._disk_bytes - freed <= target:
+                break
+            victims.append((model, text_hash))
+            freed += size
+        self._db.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims
+        )
+        self._disk_bytes -= freed
+        self.stats["evictions"] += len(victims)
+
+    def clear(self) -> None:
+        """Drop every cached embedding from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def cache_from_env() -> Optional[EmbeddingCache]:
+    """
+    Build the cache configured by EMBED_CACHE* environment variables.
+
+    The disk tier lives at EMBED_CACHE_PATH, defaulting to
+    `$XDG_CACHE_HOME/rag-vs/embeddings.sqlite` (`~/.cache/...` when unset);
+    an empty EMBED_CACHE_PATH keeps the cache in memory only.
+    """
+    if os.getenv("EMBED_CACHE", "true").lower() in ("0", "false", "no"):
+        return None
+    path = os.getenv("EMBED_CACHE_PATH", cache_path("embeddings.sqlite")) or None
+    return EmbeddingCache(
+        path=path,
+        max_memory_items=int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "10000")),
+        max_disk_bytes=int(float(os.getenv("EMBED_CACHE_MAX_MB", "512")) * 1024 * 1024),
+    )
@@ -1,22 +1,84 @@
 from __future__ import annotations
-from typing import List
+from typing import Dict, List, Optional
+import asyncio
 import os
-from openai import OpenAI
+import threading
+import numpy as np
 from ... import env as _env  # Load environment variables  # noqa: F401
+from ..tracing import enabled as tracing_enabled, span
+from .embedding_backends import BatchingEmbedder, backend_from_env
+from .embedding_cache import EmbeddingCache, cache_from_env
 
 
-__all__ = ["embed_texts", "EMBED_MODEL"]
+__all__ = ["embed_texts", "embed_texts_async", "get_embedder", "get_embedding_cache", "EMBED_MODEL", "EMBED_DIMENSIONS"]
 
 
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+# Shortened (Matryoshka) output size for text-embedding-3 models; unset keeps
+# the native size. Must match the VECTOR(n) columns in the schema.
+EMBED_DIMENSIONS: Optional[int] = int(os.getenv("EMBED_DIMENSIONS") or 0) or None
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "2048"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
 
+_cache: Optional[EmbeddingCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+_embedders: Dict[Optional[int], BatchingEmbedder] = {}
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, or None when EMBED_CACHE=false."""
+    global _cache, _cache_loaded
+    with _cache_lock:
+        if not _cache_loaded:
+            _cache = cache_from_env()
+            _cache_loaded = True
+        return _cache
+
+
+def get_embedder(dimensions: Optional[int] = None) -> BatchingEmbedder:
+    """
+    Return the process-wide batching embedder (backend chosen by EMBED_BACKEND)
+    for an output size (default EMBED_DIMENSIONS).
+    """
+    dimensions = dimensions or EMBED_DIMENSIONS
+    with _cache_lock:
+        embedder = _embedders.get(dimensions)
+        if embedder is None:
+            embedder = _embedders[dimensions] = BatchingEmbedder(
+                backend_from_env(EMBED_MODEL, dimensions),
+                max_tokens=EMBED_BATCH_TOKENS,
+                max_items=EMBED_BATCH_SIZE,
+                max_concurrency=EMBED_CONCURRENCY,
+            )
+        return embedder
+
+
+def _cache_model(dimensions: Optional[int]) -> str:
+    """Cache namespace: vectors of different sizes must never be mixed."""
+    backend = get_embedder(dimensions).backend
+    dims = getattr(backend, "dimensions", None)
+    return f"{backend.model}@{dims}" if dims else backend.model
+
+
+def _embed_uncached(texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+    return get_embedder(dimensions).embed(texts)
+
+
+def embed_texts(texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
     """
     Generate embeddings for a list of texts using OpenAI embeddings API.
 
+    Texts already in the embedding cache (keyed by model + sha256 of the text)
+    are served locally; only the misses are sent to the API, deduplicated,
+    and merged back in input order. Misses are packed into token-bounded
+    batches that run concurrently (EMBED_BATCH_TOKENS, EMBED_CONCURRENCY).
+
     Args:
         texts: List of input texts.
+        dimensions: Shortened output size (default EMBED_DIMENSIONS); part of
+            the cache key.
 
     Returns:
         List of embeddings (each a list[float]).
@@ -24,11 +86,80 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
     if not texts:
         return []
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
+    with span("embed", texts=len(texts)) as s:
+        cache = get_embedding_cache()
+        if cache is None:
+            s.add("embedded", len(texts))
+            return _embed_uncached(texts, dimensions)
+
+        model = _cache_model(dimensions)
+        vectors = cache.get_many(model, texts)
+        misses = _misses(texts, vectors)
+        _count_cache(s, texts, vectors, misses)
+        if misses:
+            fresh = np.asarray(_embed_uncached(misses, dimensions), dtype=np.float32)
+            cache.put_many(model, misses, fresh)
+            vectors = _fill(texts, vectors, misses, fresh)
+        return [v.tolist() for v in vectors]
+
+
+async def _aembed_uncached(texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+    return await get_embedder(dimensions).aembed(texts)
+
+
+async def embed_texts_async(texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+    """
+    Async `embed_texts`: same cache and batching, without blocking the event loop.
+
+    Cache lookups and writes (which may touch SQLite) run in a worker
+    thread; misses are embedded with the async OpenAI client.
+
+    Args:
+        texts: List of input texts.
+        dimensions: Shortened output size (default EMBED_DIMENSIONS).
+
+    Returns:
+        List of embeddings (each a list[float]).
+    """
+    if not texts:
+        return []
+
+    with span("embed", texts=len(texts)) as s:
+        cache = get_embedding_cache()
+        if cache is None:
+            s.add("embedded", len(texts))
+            return await _aembed_uncached(texts, dimensions)
+
+        model = _cache_model(dimensions)
+        vectors = await asyncio.to_thread(cache.get_many, model, texts)
+        misses = _misses(texts, vectors)
+        _count_cache(s, texts, vectors, misses)
+        if misses:
+            fresh = np.asarray(await _aembed_uncached(misses, dimensions), dtype=np.float32)
+            await asyncio.to_thread(cache.put_many, model, misses, fresh)
+            vectors = _fill(texts, vectors, misses, fresh)
+        return [v.tolist() for v in vectors]
+
+
+def _count_cache(s, texts: List[str], vectors: List[Optional[np.ndarray]], misses: List[str]) -> None:
+    if not tracing_enabled():
+        return
+    hits = sum(v is not None for v in vectors)
+    s.add("cache_hits", hits)
+    s.add("cache_misses", len(texts) - hits)
+    s.add("embedded", len(misses))
+
+
+def _misses(texts: List[str], vectors: List[Optional[np.ndarray]]) -> List[str]:
+    """Distinct texts without a cached vector, in first-seen order."""
+    return list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+
 
-    client = OpenAI(api_key=api_key)
-    resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
-    # Ensure ordering preserved
-    return [d.embedding for d in resp.data]
+def _fill(
+    texts: List[str],
+    vectors: List[Optional[np.ndarray]],
+    misses: List[str],
+    fresh: np.ndarray,
+) -> List[np.ndarray]:
+    by_text = dict(zip(misses, fresh))
+    return [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
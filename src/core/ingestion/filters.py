@@ -0,0 +1,111 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+
+__all__ = ["FILTER_KEYS", "validate_filter", "matches_filter"]
+
+
+# Keys with special meaning in `match_rag_pages`; any other key is matched
+# against metadata by JSONB containment.
+FILTER_KEYS = ("source", "url", "url_prefix", "created_after", "created_before", "metadata")
+
+
+@lru_cache(maxsize=65536)
+def _parse_time(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    # Reason: Postgres reads zone-less timestamps in the session zone, which
+    # is UTC on Supabase.
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def validate_filter(filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Check a search filter and return it in the form `match_rag_pages` expects.
+
+    Keys:
+        source: Source label, or a list of labels (any match).
+        url: Exact document URL.
+        url_prefix: Documents whose URL starts with this string.
+        created_after / created_before: ISO-8601 timestamps (inclusive / exclusive).
+        metadata: Object that metadata must contain (JSONB @>).
+        anything else: Shorthand for a metadata containment key.
+
+    Raises:
+        ValueError: If a reserved key has the wrong type or a date does not parse.
+    """
+    if not filter:
+        return {}
+    if not isinstance(filter, dict):
+        raise ValueError("filter must be an object")
+    out = dict(filter)
+    source = out.get("source")
+    if source is not None and not isinstance(source, (str, list)):
+        raise ValueError("filter.source must be a string or a list of strings")
+    for key in ("url", "url_prefix"):
+        if key in out and not isinstance(out[key], str):
+            raise ValueError(f"filter.{key} must be a string")
+    for key in ("created_after", "created_before"):
+        if key in out:
+            value = out[key]
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            try:
+                _parse_time(str(value))
+            except ValueError as e:
+                raise ValueError(f"filter.{key} is not an ISO-8601 timestamp: {value!r}") from e
+            out[key] = str(value)
+    if "metadata" in out and not isinstance(out["metadata"], dict):
+        raise ValueError("filter.metadata must be an object")
+    return out
+
+
+def _contains(doc: Any, sub: Any) -> bool:
+    """JSONB `@>` semantics for decoded JSON values."""
+    if isinstance(sub, dict):
+        return isinstance(doc, dict) and all(
+            k in doc and _contains(doc[k], v) for k, v in sub.items()
+        )
+    if isinstance(sub, list):
+        if not isinstance(doc, list):
+            return False
+        return all(any(_contains(d, s) for d in doc) for s in sub)
+    return doc == sub
+
+
+def matches_filter(row: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Python mirror of the `match_rag_pages` filter semantics (see `validate_filter`).
+    """
+    if not filter:
+        return True
+    meta = row.get("metadata") or {}
+    extra: Dict[str, Any] = {}
+    for key, value in filter.items():
+        if key == "source":
+            sources = value if isinstance(value, list) else [value]
+            if row.get("source") not in sources:
+                return False
+        elif key == "url":
+            if row.get("url") != value:
+                return False
+        elif key == "url_prefix":
+            if not (row.get("url") or "").startswith(value):
+                return False
+        elif key in ("created_after", "created_before"):
+            created = row.get("created_at")
+            if not created:
+                return False
+            created_ts = created if isinstance(created, datetime) else _parse_time(str(created))
+            bound = _parse_time(str(value))
+            if key == "created_after" and created_ts < bound:
+                return False
+            if key == "created_before" and created_ts >= bound:
+                return False
+        elif key == "metadata":
+            if not _contains(meta, value):
+                return False
+        else:
+            extra[key] = value
+    return _contains(meta, extra)
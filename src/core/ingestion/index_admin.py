@@ -0,0 +1,421 @@
+"""
+Vector index management for rag_pages.
+
+Builds or rebuilds the embedding index (HNSW, or ivfflat with `lists` sized
+from the row count), reports its size and build time, and maps recall/latency
+profiles to the per-query `hnsw.ef_search` / `ivfflat.probes` settings.
+
+Usage:
+    python -m src.core.ingestion.index_admin status
+    python -m src.core.ingestion.index_admin build --method hnsw --m 16 --ef-construction 64
+    python -m src.core.ingestion.index_admin build --method ivfflat
+    python -m src.core.ingestion.index_admin build --storage binary
+    python -m src.core.ingestion.index_admin build --storage prefix --prefix-dims 256
+    python -m src.core.ingestion.index_admin schema --dims 512 > setup_512.sql
+    python -m src.core.ingestion.index_admin profile balanced
+"""
+from __future__ import annotations
+import math
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from ... import env as _env  # Load environment variables  # noqa: F401
+from ..clients import get_database_url
+from .embeddings import EMBED_DIMENSIONS
+from .quantize import FIRST_PASS_DIMS, sql_storage
+
+
+__all__ = [
+    "INDEX_METHODS",
+    "SEARCH_PROFILES",
+    "SearchProfile",
+    "IndexReport",
+    "index_name",
+    "ivfflat_lists",
+    "profile_query",
+    "index_status",
+    "build_index",
+    "render_schema",
+]
+
+
+INDEX_METHODS = ("hnsw", "ivfflat")
+TABLE = "rag_pages"
+INDEX_NAME = "rag_pages_embedding_idx"
+EMBED_DIM = EMBED_DIMENSIONS or 1536
+SCHEMA_PATH = Path(__file__).resolve().parents[3] / "sql" / "setup_database.sql"
+# Indexed expression and operator class per storage layout. The quantized and
+# prefix expressions must match the ORDER BY in `quantized_match_rag_pages` /
+# `adaptive_match_rag_pages`.
+_INDEX_TARGETS = {
+    "float32": (INDEX_NAME, "embedding", "vector_cosine_ops"),
+    "halfvec": ("rag_pages_embedding_halfvec_idx", f"(embedding::halfvec({EMBED_DIM}))", "halfvec_cosine_ops"),
+    "binary": ("rag_pages_embedding_bit_idx", f"(binary_quantize(embedding)::bit({EMBED_DIM}))", "bit_hamming_ops"),
+    "prefix": ("rag_pages_embedding_prefix_idx", "(subvector(embedding, 1, {dims})::vector({dims}))", "vector_cosine_ops"),
+}
+INDEX_STORAGES = tuple(_INDEX_TARGETS)
+# pgvector's default when `lists` is not given.
+DEFAULT_LISTS = 100
+
+
+@dataclass(frozen=True)
+class SearchProfile:
+    """
+    Per-query search settings.
+
+    Attributes:
+        ef_search: HNSW candidate list size (pgvector default 40).
+        probe_fraction: Share of ivfflat lists probed per query.
+    """
+
+    ef_search: int
+    probe_fraction: float
+
+
+SEARCH_PROFILES: Dict[str, SearchProfile] = {
+    "fast": SearchProfile(ef_search=20, probe_fraction=0.02),
+    "balanced": SearchProfile(ef_search=40, probe_fraction=0.05),
+    "accurate": SearchProfile(ef_search=100, probe_fraction=0.15),
+}
+
+# Empty keeps the server's defaults (ef_search=40, probes=1).
+SEARCH_PROFILE = os.getenv("RAG_SEARCH_PROFILE", "").lower()
+
+# Transaction-local: the search runs in the same explicit transaction (pool
+# connections are autocommit), so the settings end with it. The probe count
+# follows the live index's `lists` option and survives rebuilds.
+_PROFILE_SQL = (
+    "SELECT set_config('hnsw.ef_search', %s, true), "
+    "set_config('ivfflat.probes', ("
+    "SELECT GREATEST(1, CEIL(%s * COALESCE(("
+    "SELECT substring(opt FROM '^lists=(\\d+)$')::int "
+    "FROM pg_class c, unnest(c.reloptions) AS opt "
+    "WHERE c.relname = %s AND opt LIKE 'lists=%%'"
+    "), %s)))::int::text), true)"
+)
+
+
+@dataclass
+class IndexReport:
+    """Embedding index state after `build_index` / `index_status`."""
+
+    name: str
+    method: Optional[str]
+    definition: Optional[str]
+    size_bytes: int
+    rows: int
+    options: Dict[str, str] = field(default_factory=dict)
+    valid: bool = True
+    build_seconds: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def ivfflat_lists(rows: int) -> int:
+    """
+    pgvector's sizing guidance for ivfflat: rows / 1000 up to 1M rows, sqrt(rows) above.
+    """
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def index_name(storage: Optional[str] = None) -> str:
+    """
+    Name of the ANN index searched under `storage` (default RAG_VECTOR_STORAGE,
+    or the prefix index when RAG_FIRST_PASS_DIMS is set).
+    """
+    layout = sql_storage(storage)
+    if layout is None and storage is None and FIRST_PASS_DIMS:
+        layout = "prefix"
+    return _INDEX_TARGETS[layout or "float32"][0]
+
+
+def render_schema(dims: int, path: Path = SCHEMA_PATH) -> str:
+    """
+    `setup_database.sql` with every vector type modifier set to `dims`.
+
+    Use when EMBED_DIMENSIONS shortens the stored embeddings.
+    """
+    if dims < 1:
+        raise ValueError("dims must be positive")
+    sql = path.read_text(encoding="utf-8")
+    return re.sub(r"\b(VECTOR|vector|halfvec|bit)\(1536\)", lambda m: f"{m.group(1)}({dims})", sql)
+
+
+def profile_query(
+    profile: Optional[str] = None, match_count: int = 0
+) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+    """
+    SQL that applies a search profile for the current transaction.
+
+    Args:
+        profile: Name in SEARCH_PROFILES; defaults to RAG_SEARCH_PROFILE.
+        match_count: Rows the query needs; ef_search is raised to at least this.
+
+    Returns:
+        (sql, params), or None when no profile is configured.
+
+    Raises:
+        ValueError: If the profile name is unknown.
+    """
+    name = SEARCH_PROFILE if profile is None else profile.lower()
+    if not name:
+        return None
+    if name not in SEARCH_PROFILES:
+        raise ValueError(f"Unknown search profile {name!r}; expected one of {sorted(SEARCH_PROFILES)}")
+    p = SEARCH_PROFILES[name]
+    ef = max(p.ef_search, int(match_count))
+    return _PROFILE_SQL, (str(ef), p.probe_fraction, index_name(), DEFAULT_LISTS)
+
+
+def _connect():
+    import psycopg
+
+    url = get_database_url()
+    if not url:
+        raise RuntimeError("Index management needs a direct Postgres connection. Set SUPABASE_DB_URL.")
+    # Reason: CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction,
+    # and a long build should not hold a search pool slot.
+    return psycopg.connect(url, autocommit=True)
+
+
+def _parse_options(reloptions) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for opt in reloptions or []:
+        key, _, value = opt.partition("=")
+        out[key] = value
+    return out
+
+
+def index_status(conn=None, name: Optional[str] = None) -> IndexReport:
+    """
+    Describe an embedding index: access method, options, size, validity and row estimate.
+
+    Defaults to the index searched under RAG_VECTOR_STORAGE.
+    """
+    name = name or index_name()
+    own = conn is None
+    conn = conn or _connect()
+    try:
+        row = conn.execute(
+            "SELECT am.amname, pg_get_indexdef(c.oid), pg_relation_size(c.oid), "
+            "c.reloptions, i.indisvalid "
+            "FROM pg_class c "
+            "JOIN pg_index i ON i.indexrelid = c.oid "
+            "JOIN pg_am am ON am.oid = c.relam "
+            "WHERE c.relname = %s",
+            (name,),
+        ).fetchone()
+        rows = _row_count(conn)
+    finally:
+        if own:
+            conn.close()
+    if row is None:
+        return IndexReport(name=name, method=None, definition=None, size_bytes=0, rows=rows, valid=False)
+    method, definition, size, reloptions, valid = row
+    return IndexReport(
+        name=name,
+        method=method,
+        definition=definition,
+        size_bytes=int(size),
+        rows=rows,
+        options=_parse_options(reloptions),
+        valid=bool(valid),
+    )
+
+
+def _row_count(conn) -> int:
+    # Reason: the planner estimate is free; fall back to count(*) before the
+    # first ANALYZE (reltuples is -1 or 0 then).
+    est = conn.execute(
+        "SELECT reltuples::bigint FROM pg_class WHERE relname = %s", (TABLE,)
+    ).fetchone()
+    if est and est[0] and est[0] > 0:
+        return int(est[0])
+    return int(conn.execute(f"SELECT count(*) FROM {TABLE} WHERE embedding IS NOT NULL").fetchone()[0])
+
+
+def _index_sql(
+    name: str,
+    method: str,
+    options: Dict[str, int],
+    concurrently: bool,
+    storage: str = "float32",
+    prefix_dims: int = 256,
+) -> str:
+    _, expr, opclass = _INDEX_TARGETS[storage]
+    expr = expr.format(dims=int(prefix_dims))
+    with_clause = ", ".join(f"{k} = {int(v)}" for k, v in options.items())
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} "
+        f"ON {TABLE} USING {method} ({expr} {opclass})"
+        + (f" WITH ({with_clause})" if with_clause else "")
+    )
+
+
+def build_index(
+    method: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+    concurrently: bool = True,
+    maintenance_work_mem: Optional[str] = None,
+    storage: str = "float32",
+    prefix_dims: Optional[int] = None,
+    conn=None,
+) -> IndexReport:
+    """
+    Create or rebuild the embedding index, then swap it in under the canonical name.
+
+    The new index is built as `<name>_new` (CONCURRENTLY by default, so
+    searches keep using the old index). One transaction then renames the
+    old index to `<name>_old` and the new one to `<name>`, so the table is
+    never without an index under the canonical name, and `<name>_old` is
+    dropped afterwards. Run after bulk loads: ivfflat centroids are trained
+    on the rows present at build time.
+
+    Args:
+        method: "hnsw" or "ivfflat".
+        m: HNSW max connections per layer.
+        ef_construction: HNSW build-time candidate list size.
+        lists: ivfflat list count; defaults to `ivfflat_lists(row count)`.
+        concurrently: Build and drop without blocking writes or searches.
+        maintenance_work_mem: Optional session setting for the build (e.g. "2GB").
+        storage: "float32" (full vectors), "halfvec" or "binary" (quantized
+            expression index used by `quantized_match_rag_pages`), or
+            "prefix" (Matryoshka prefix used by `adaptive_match_rag_pages`).
+        prefix_dims: Prefix length for "prefix" (default RAG_FIRST_PASS_DIMS or 256).
+        conn: Optional autocommit psycopg connection.
+
+    Returns:
+        IndexReport of the new index, with `build_seconds` set.
+
+    Raises:
+        ValueError: If `method` or `storage` is unknown.
+    """
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unknown index method {method!r}; expected one of {INDEX_METHODS}")
+    if storage not in _INDEX_TARGETS:
+        raise ValueError(f"Unknown index storage {storage!r}; expected one of {INDEX_STORAGES}")
+    name = _INDEX_TARGETS[storage][0]
+    own = conn is None
+    conn = conn or _connect()
+    tmp, old = f"{name}_new", f"{name}_old"
+    drop = f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS"
+    try:
+        if method == "hnsw":
+            options = {"m": m, "ef_construction": ef_construction}
+        else:
+            options = {"lists": lists or ivfflat_lists(_row_count(conn))}
+        if maintenance_work_mem:
+            conn.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+        # A failed concurrent build leaves an INVALID index behind, and a failed
+        # final drop leaves the previous index; clear both first.
+        conn.execute(f"{drop} {tmp}")
+        conn.execute(f"{drop} {old}")
+        started = time.perf_counter()
+        dims = prefix_dims or FIRST_PASS_DIMS or 256
+        conn.execute(_index_sql(tmp, method, options, concurrently, storage, dims))
+        elapsed = time.perf_counter() - started
+        # Reason: both renames commit together, so concurrent searches always
+        # find a vector index, and a failure leaves the old one in place.
+        with conn.transaction():
+            conn.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {old}")
+            conn.execute(f"ALTER INDEX {tmp} RENAME TO {name}")
+        conn.execute(f"{drop} {old}")
+        conn.execute(f"ANALYZE {TABLE}")
+        report = index_status(conn, name)
+    finally:
+        if own:
+            conn.close()
+    report.build_seconds = round(elapsed, 3)
+    return report
+
+
+def _format_size(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _print_report(report: IndexReport) -> None:
+    if report.method is None:
+        print(f"{report.name}: missing ({report.rows} rows)")
+        return
+    opts = ", ".join(f"{k}={v}" for k, v in report.options.items()) or "defaults"
+    line = (
+        f"{report.name}: {report.method} ({opts}), {_format_size(report.size_bytes)}, "
+        f"{report.rows} rows{'' if report.valid else ', INVALID'}"
+    )
+    if report.build_seconds is not None:
+        line += f", built in {report.build_seconds:.1f}s"
+    print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Manage the rag_pages vector index")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+    status_cmd = sub.add_parser("status", help="Show the index method, options, size and row count")
+    status_cmd.add_argument("--storage", choices=INDEX_STORAGES, default=None)
+    build = sub.add_parser("build", help="Create or rebuild the index and swap it in")
+    build.add_argument("--method", choices=INDEX_METHODS, default="hnsw")
+    build.add_argument("--m", type=int, default=16)
+    build.add_argument("--ef-construction", type=int, default=64)
+    build.add_argument("--lists", type=int, default=None, help="ivfflat lists (default: sized from row count)")
+    build.add_argument("--maintenance-work-mem", default=None, help="e.g. 2GB")
+    build.add_argument(
+        "--storage",
+        choices=INDEX_STORAGES,
+        default="float32",
+        help="Index full vectors, a halfvec / binary-quantized expression, or a Matryoshka prefix",
+    )
+    build.add_argument("--prefix-dims", type=int, default=None, help="Prefix length for --storage prefix")
+    build.add_argument(
+        "--blocking",
+        action="store_true",
+        help="Build without CONCURRENTLY (faster, but blocks writes during the build)",
+    )
+    prof = sub.add_parser("profile", help="Show the per-query settings of a search profile")
+    prof.add_argument("name", choices=sorted(SEARCH_PROFILES))
+    schema = sub.add_parser("schema", help="Print setup_database.sql for another embedding size")
+    schema.add_argument("--dims", type=int, default=EMBED_DIM)
+    args = parser.parse_args()
+
+    if args.command == "schema":
+        print(render_schema(args.dims), end="")
+    elif args.command == "profile":
+        p = SEARCH_PROFILES[args.name]
+        status = index_status()
+        lists = int(status.options.get("lists", DEFAULT_LISTS))
+        probes = max(1, math.ceil(p.probe_fraction * lists))
+        info = {"profile": args.name, "hnsw.ef_search": p.ef_search, "ivfflat.probes": probes, "index": status.method}
+        print(json.dumps(info) if args.json else ", ".join(f"{k}={v}" for k, v in info.items()))
+    else:
+        if args.command == "build":
+            report = build_index(
+                method=args.method,
+                m=args.m,
+                ef_construction=args.ef_construction,
+                lists=args.lists,
+                concurrently=not args.blocking,
+                maintenance_work_mem=args.maintenance_work_mem,
+                storage=args.storage,
+                prefix_dims=args.prefix_dims,
+            )
+        else:
+            report = index_status(name=_INDEX_TARGETS[args.storage][0] if args.storage else None)
+        if args.json:
+            print(json.dumps(report.as_dict()))
+        else:
+            _print_report(report)
@@ -1,18 +1,19 @@
 from __future__ import annotations
-from pathlib import Path
-from typing import Dict, Any, List
+import threading
+from typing import Callable, List, Optional
 from ... import env as _env  # ensure .env is loaded via side effect  # noqa: F401
-from .pdf_text import extract_text_from_pdf
-from .chunking import simple_chunk_text
 from .embeddings import embed_texts
-from .supabase_store import upsert_chunks
-
-
-def load_text_from_file(path: Path) -> str:
-    """Return extracted text for TXT or PDF."""
-    if path.suffix.lower() == ".pdf":
-        return extract_text_from_pdf(str(path))
-    return path.read_text(encoding="utf-8", errors="ignore")
+from .pipeline import (  # noqa: F401  (re-exported for existing callers)
+    CHUNKERS,
+    IngestCancelled,
+    IngestPipeline,
+    IngestProgress,
+    chunk_hash,
+    content_hash,
+    file_fingerprint,
+    load_text_from_file,
+)
+from .vector_store import VectorStore, get_vector_store
 
 
 def ingest_paths(
@@ -20,62 +21,106 @@ def ingest_paths(
     source: str | None = None,
     max_chars: int = 1200,
     overlap: int = 150,
+    chunker: str = "structure",
+    incremental: bool = False,
+    checkpoint_path: Optional[str] = None,
+    on_progress: Optional[Callable[[IngestProgress], None]] = None,
+    max_batch_rows: int = 500,
+    cancel_event: Optional[threading.Event] = None,
+    store: Optional[VectorStore] = None,
 ) -> int:
     """
-    Ingest a list of file paths into Supabase.
+    Ingest a list of file paths into the vector store (Supabase by default).
+
+    Files stream through an extract -> chunk -> embed -> upsert pipeline
+    (see `IngestPipeline`) and rows are upserted in bounded batches as they
+    are ready. Every row stores `chunk_hash` (text, source label and page)
+    and `file_hash` in its metadata
+    (chunk 0 always carries the current file hash), and chunks beyond a
+    file's new chunk count are deleted once its rows are committed.
 
     Args:
         paths: List of file paths (txt/pdf).
         source: Optional source label to store in metadata.
         max_chars: Chunk size.
         overlap: Chunk overlap.
+        chunker: "structure" (break at paragraphs/sentences) or "simple"
+            (fixed character windows).
+        incremental: Skip files whose fingerprint is unchanged and only embed
+            and upsert chunks whose text, source label or page changed.
+        checkpoint_path: Optional JSON file of committed files; a rerun with
+            the same path resumes after the last committed file.
+        on_progress: Optional callback receiving `IngestProgress` after each
+            committed batch.
+        max_batch_rows: Max rows per upsert request.
+        cancel_event: Optional event; setting it stops the run with
+            `IngestCancelled` after the files committed so far.
+        store: Destination store (default `get_vector_store()`, chosen by
+            RAG_VECTOR_STORE).
 
     Returns:
-        Number of chunks inserted.
+        Number of chunks inserted or updated.
     """
-    rows: List[Dict[str, Any]] = []
-    total = 0
-
-    for p in paths:
-        path = Path(p)
-        if not path.exists() or not path.is_file():
-            continue
-        text = load_text_from_file(path)
-        chunks = simple_chunk_text(text, max_chars=max_chars, overlap=overlap)
-        embs = embed_texts(chunks)
-        # Use file:// URL format for uniqueness per file
-        url = f"file://{path.resolve()}"
-        for i, (chunk, emb) in enumerate(zip(chunks, embs)):
-            rows.append(
-                {
-                    "url": url,
-                    "source": source or path.name,
-                    "chunk_number": i,
-                    "content": chunk,
-                    "metadata": {"source": source or path.name},
-                    "embedding": emb,
-                }
-            )
-        total += len(chunks)
-
-    if rows:
-        upsert_chunks(rows)
-    return total
+    if store is None:
+        store = get_vector_store()
+    pipeline = IngestPipeline(
+        embed_fn=embed_texts,
+        upsert_fn=store.upsert,
+        fetch_hashes_fn=store.fetch_chunk_hashes,
+        delete_tail_fn=store.delete,
+        source=source,
+        max_chars=max_chars,
+        overlap=overlap,
+        chunker=chunker,
+        incremental=incremental,
+        max_batch_rows=max_batch_rows,
+        checkpoint_path=checkpoint_path,
+        on_progress=on_progress,
+        cancel_event=cancel_event,
+    )
+    return pipeline.run(paths)
 
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(
-        description="Ingest local TXT/PDF files into Supabase"
+        description="Ingest local TXT/PDF files into the vector store (RAG_VECTOR_STORE)"
     )
     parser.add_argument("paths", nargs="+", help="Files to ingest")
     parser.add_argument("--source", default=None)
     parser.add_argument("--max-chars", type=int, default=1200)
     parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--chunker", choices=CHUNKERS, default="structure")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip unchanged files and only re-embed changed chunks",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="JSON file recording committed files; rerun with it to resume",
+    )
+    parser.add_argument("--batch-rows", type=int, default=500)
     args = parser.parse_args()
 
+    def _print_progress(p: IngestProgress) -> None:
+        print(
+            f"[{p.files_done}/{p.files_total} files] "
+            f"{p.rows_committed} rows committed in {p.batches_committed} batches",
+            flush=True,
+        )
+
     count = ingest_paths(
-        args.paths, source=args.source, max_chars=args.max_chars, overlap=args.overlap
+        args.paths,
+        source=args.source,
+        max_chars=args.max_chars,
+        overlap=args.overlap,
+        chunker=args.chunker,
+        incremental=args.incremental,
+        checkpoint_path=args.checkpoint,
+        on_progress=_print_progress,
+        max_batch_rows=args.batch_rows,
     )
     print(f"Inserted {count} chunks")
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from ..tracing import span
+
+
+__all__ = ["IngestCheckpoint", "UpsertBatcher"]
+
+
+class IngestCheckpoint:
+    """
+    Set of committed files persisted as JSON, used to resume an interrupted run.
+
+    Keys combine the file URL and fingerprint, so a file that changed since it
+    was committed is ingested again.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._done: Set[str] = set()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._done = set(json.load(f).get("committed", []))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._done
+
+    def mark(self, keys: Sequence[str]) -> None:
+        """
+        Record committed files and persist the set.
+
+        Args:
+            keys: Checkpoint keys of the files just committed.
+        """
+        if not keys:
+            return
+        self._done.update(keys)
+        if not self.path:
+            return
+        # Reason: write-then-rename so a crash never leaves a torn checkpoint.
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"committed": sorted(self._done)}, f)
+        os.replace(tmp, self.path)
+
+
+def _row_bytes(row: Dict[str, Any]) -> int:
+    # Reason: approximate the JSON payload without serializing 1536 floats per
+    # row; a float renders as ~20 characters.
+    return len(row.get("content") or "") + 20 * len(row.get("embedding") or ()) + 200
+
+
+class UpsertBatcher:
+    """
+    Accumulate rows and flush them when a row-count or payload-size bound is hit.
+    """
+
+    def __init__(
+        self,
+        upsert_fn: Callable[[List[Dict[str, Any]]], None],
+        max_rows: int = 500,
+        max_bytes: int = 8 * 1024 * 1024,
+    ):
+        self.upsert_fn = upsert_fn
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._rows: List[Dict[str, Any]] = []
+        self._bytes = 0
+        self.rows_committed = 0
+        self.batches_committed = 0
+
+    @property
+    def pending_rows(self) -> int:
+        """Rows buffered but not yet upserted."""
+        return len(self._rows)
+
+    def add(self, rows: Sequence[Dict[str, Any]]) -> bool:
+        """Add rows; returns True if a flush happened."""
+        flushed = False
+        for row in rows:
+            self._rows.append(row)
+            self._bytes += _row_bytes(row)
+            if len(self._rows) >= self.max_rows or self._bytes >= self.max_bytes:
+                self.flush()
+                flushed = True
+        return flushed
+
+    def flush(self) -> int:
+        """Upsert buffered rows; returns how many were sent."""
+        if not self._rows:
+            return 0
+        rows, nbytes = self._rows, self._bytes
+        self._rows, self._bytes = [], 0
+        with span("upsert", rows=len(rows)) as s:
+            s.add("bytes", nbytes)
+            self.upsert_fn(rows)
+        self.rows_committed += len(rows)
+        self.batches_committed += 1
+        return len(rows)
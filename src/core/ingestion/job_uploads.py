@@ -0,0 +1,101 @@
+from __future__ import annotations
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Sequence, Tuple
+
+from ... import env as _env  # Load environment variables  # noqa: F401
+
+
+__all__ = [
+    "stage_uploads",
+    "remove_uploads",
+    "remove_stale_uploads",
+    "INGEST_UPLOAD_RETENTION_SECONDS",
+]
+
+# Staged uploads of failed / cancelled jobs are kept this long for a retry,
+# then pruned (uploads of done jobs go as soon as they finish).
+INGEST_UPLOAD_RETENTION_SECONDS = float(os.getenv("INGEST_UPLOAD_RETENTION_SECONDS", str(7 * 86400)))
+
+
+def stage_uploads(uploads_dir: str, files: Sequence[Tuple[str, BinaryIO]]) -> List[str]:
+    """
+    Copy uploaded files into a new folder under `uploads_dir`.
+
+    Files are copied in 1 MiB blocks rather than materialized whole, and
+    live outside any session temp dir so a queued job survives app reruns
+    and restarts.
+
+    Args:
+        uploads_dir: Parent of the per-upload folders.
+        files: (file name, readable binary file) pairs.
+
+    Returns:
+        Absolute paths of the staged files, in order.
+    """
+    folder = Path(uploads_dir) / uuid.uuid4().hex
+    folder.mkdir(parents=True)
+    paths = []
+    for i, (name, f) in enumerate(files):
+        # Reason: client-supplied names may carry directory parts.
+        target = folder / (Path(name).name or f"upload_{i}")
+        if target.exists():
+            target = folder / f"{i}_{target.name}"
+        if hasattr(f, "seek"):
+            f.seek(0)
+        with target.open("wb") as out:
+            shutil.copyfileobj(f, out, 1 << 20)
+        paths.append(str(target.resolve()))
+    return paths
+
+
+def _upload_folders(uploads_dir: str, paths: Iterable[str]) -> List[Path]:
+    # Reason: only folders `stage_uploads` created; a job may also point at
+    # files elsewhere on disk, which are not ours to delete.
+    root = Path(uploads_dir).resolve()
+    return sorted({Path(p).parent for p in paths if Path(p).parent.parent == root})
+
+
+def remove_uploads(uploads_dir: str, paths: Iterable[str]) -> int:
+    """
+    Delete the staged folders that hold `paths`.
+
+    Args:
+        uploads_dir: Parent of the per-upload folders.
+        paths: File paths of one or more jobs.
+
+    Returns:
+        int: Number of folders removed.
+    """
+    removed = 0
+    for folder in _upload_folders(uploads_dir, paths):
+        if folder.exists():
+            shutil.rmtree(folder, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def remove_stale_uploads(uploads_dir: str, keep: Iterable[str], cutoff: float) -> int:
+    """
+    Delete staged folders last modified before `cutoff` that hold none of `keep`.
+
+    Args:
+        uploads_dir: Parent of the per-upload folders.
+        keep: File paths still referenced by live jobs.
+        cutoff: Unix time; newer folders may belong to a job being submitted.
+
+    Returns:
+        int: Number of folders removed.
+    """
+    root = Path(uploads_dir)
+    if not root.exists():
+        return 0
+    live = set(_upload_folders(uploads_dir, keep))
+    removed = 0
+    for folder in root.resolve().iterdir():
+        if folder.is_dir() and folder not in live and folder.stat().st_mtime < cutoff:
+            shutil.rmtree(folder, ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,245 @@
+from __future__ import annotations
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ... import env as _env  # Load environment variables  # noqa: F401
+from .jobs import INGEST_JOB_LEASE_SECONDS, Job, JobStore, get_job_store
+from .pipeline import IngestCancelled, IngestProgress
+
+
+__all__ = [
+    "JobWorkerPool",
+    "INGEST_WORKERS",
+    "get_worker_pool",
+]
+
+logger = logging.getLogger(__name__)
+
+# Jobs ingesting at once, however many are queued. Kept low so uploads share
+# embedding throughput and CPU with chat instead of taking all of it; 0 starts
+# no workers in the app (run `python -m src.core.ingestion.jobs work` instead).
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+# Seconds between sweeps of expired staged uploads (`JobStore.prune`).
+_PRUNE_INTERVAL = 3600.0
+
+
+class JobWorkerPool:
+    """
+    Worker threads that run queued ingestion jobs from a `JobStore`.
+
+    Each worker claims one job at a time and runs it through `ingest_fn`
+    (default `ingest_paths`) with the job's checkpoint, persisting progress
+    after every committed batch. The number of workers bounds ingestion
+    concurrency however many uploads are queued. A heartbeat thread renews
+    the leases of the pool's running jobs and re-queues jobs whose lease
+    expired elsewhere, so several pools (app servers, `jobs work`
+    processes) can share one queue; it also prunes expired staged uploads
+    at start and about hourly.
+
+    Args:
+        store: Job queue.
+        workers: Worker threads.
+        ingest_fn: `fn(paths, source=, checkpoint_path=, on_progress=,
+            cancel_event=, **options) -> rows`.
+        poll_interval: Seconds an idle worker waits before checking the
+            queue again (jobs submitted through this pool wake it at once).
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = INGEST_WORKERS,
+        ingest_fn: Optional[Callable[..., int]] = None,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self.workers = max(1, workers)
+        self.ingest_fn = ingest_fn
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._cancels: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = INGEST_JOB_LEASE_SECONDS
+        self._pruned = 0.0
+
+    def start(self) -> "JobWorkerPool":
+        """Start the workers (once), first re-queuing jobs whose lease has expired."""
+        with self._lock:
+            if self._threads:
+                return self
+            self._stop.clear()
+            self._recover()
+            self._prune()
+            threads = [threading.Thread(target=self._heartbeat, name="ingest-heartbeat", daemon=True)]
+            for i in range(self.workers):
+                threads.append(threading.Thread(target=self._work, name=f"ingest-worker-{i}", daemon=True))
+            for thread in threads:
+                thread.start()
+            self._threads = threads
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop running jobs and wait for the workers to exit. Interrupted jobs
+        go back to the queue and resume from their checkpoint.
+        """
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            for event in self._cancels.values():
+                event.set()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def submit(self, paths: Sequence[str], source: Optional[str] = None, **options: Any) -> str:
+        """
+        Queue a job and wake an idle worker for it.
+
+        Args:
+            paths: Files to ingest.
+            source: Source label stored in metadata.
+            **options: Extra `ingest_paths` keyword arguments.
+
+        Returns:
+            The job id.
+        """
+        job_id = self.store.submit(paths, source, **options)
+        self._wake.set()
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job; if one of this pool's workers is running it, stop it now
+        rather than at its next progress report.
+
+        Returns:
+            False if the job does not exist or has already finished.
+        """
+        ok = self.store.cancel(job_id)
+        with self._lock:
+            event = self._cancels.get(job_id)
+        if event is not None:
+            event.set()
+        return ok
+
+    def retry(self, job_id: str) -> bool:
+        """
+        Queue a failed or cancelled job again and wake an idle worker for it.
+
+        Returns:
+            False if the job does not exist or is not failed / cancelled.
+        """
+        ok = self.store.retry(job_id)
+        if ok:
+            self._wake.set()
+        return ok
+
+    def _recover(self) -> None:
+        recovered = self.store.requeue_running(self.lease)
+        if recovered:
+            logger.warning("Re-queued %d interrupted ingest job(s)", recovered)
+            self._wake.set()
+
+    def _heartbeat(self) -> None:
+        # Reason: renew well inside the lease, so a slow batch (a large PDF,
+        # a throttled embedding call) never looks like a dead worker.
+        while not self._stop.wait(self.lease / 3):
+            with self._lock:
+                job_ids = list(self._cancels)
+            try:
+                self.store.heartbeat(self.worker_id, job_ids)
+                self._recover()
+            except Exception as e:
+                logger.warning("Ingest job heartbeat failed: %s", e)
+            if time.monotonic() - self._pruned >= _PRUNE_INTERVAL:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._pruned = time.monotonic()
+        try:
+            removed = self.store.prune()
+        except Exception as e:
+            logger.warning("Pruning staged uploads failed: %s", e)
+            return
+        if removed:
+            logger.info("Removed %d expired staged upload folder(s)", removed)
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim(self.worker_id)
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        cancel = threading.Event()
+        if job.cancel_requested:
+            cancel.set()
+        with self._lock:
+            self._cancels[job.id] = cancel
+
+        def on_progress(progress: IngestProgress) -> None:
+            if self.store.report(job.id, progress, self.worker_id):
+                cancel.set()
+
+        ingest = self.ingest_fn or _ingest_paths()
+        try:
+            rows = ingest(
+                job.paths,
+                source=job.source,
+                checkpoint_path=self.store.checkpoint_path(job.id),
+                on_progress=on_progress,
+                cancel_event=cancel,
+                **job.options,
+            )
+        except IngestCancelled:
+            if self._stop.is_set():
+                # Reason: a shutdown is not a user cancel; the job resumes from
+                # its checkpoint in the next worker (cancelled if one was requested).
+                self.store.release(job.id, self.worker_id)
+            else:
+                self.store.finish(job.id, "cancelled", worker_id=self.worker_id)
+        except Exception as e:
+            logger.warning("Ingest job %s failed: %s", job.id, e)
+            self.store.finish(job.id, "failed", error=f"{type(e).__name__}: {e}", worker_id=self.worker_id)
+        else:
+            self.store.finish(job.id, "done", rows=rows, worker_id=self.worker_id)
+        finally:
+            with self._lock:
+                self._cancels.pop(job.id, None)
+
+
+def _ingest_paths() -> Callable[..., int]:
+    # Reason: imported lazily so the queue can be inspected without loading
+    # the Supabase client.
+    from .ingest import ingest_paths
+
+    return ingest_paths
+
+
+_pool: Optional[JobWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[JobWorkerPool]:
+    """
+    Return the process-wide worker pool, started on first use, or None when
+    INGEST_WORKERS=0 (jobs are then run by a separate `jobs work` process).
+    """
+    global _pool
+    store = get_job_store()
+    with _pool_lock:
+        if _pool is None and INGEST_WORKERS > 0:
+            _pool = JobWorkerPool(store, workers=INGEST_WORKERS).start()
+        return _pool
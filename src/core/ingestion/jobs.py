@@ -0,0 +1,492 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ...env import cache_path
+from .job_uploads import INGEST_UPLOAD_RETENTION_SECONDS, remove_stale_uploads, remove_uploads, stage_uploads
+from .pipeline import IngestProgress
+
+
+__all__ = [
+    "Job",
+    "JobStore",
+    "JOB_STATUSES",
+    "get_job_store",
+]
+
+logger = logging.getLogger(__name__)
+
+# Defaults in the per-user cache dir, so the app and `jobs work` processes
+# share one queue whatever directory they start in.
+INGEST_JOBS_DB = os.getenv("INGEST_JOBS_DB") or cache_path("ingest_jobs.sqlite")
+# Staged uploads and per-job checkpoints.
+INGEST_JOBS_DIR = os.getenv("INGEST_JOBS_DIR") or cache_path("ingest_jobs")
+# A running job whose worker has not sent a heartbeat for this long is taken
+# to be orphaned (its process died) and is queued again.
+INGEST_JOB_LEASE_SECONDS = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "60"))
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+_FINISHED = ("done", "failed", "cancelled")
+
+# Progress counters persisted per job (IngestProgress minus per-file status).
+_PROGRESS_FIELDS = (
+    "files_total",
+    "files_done",
+    "files_skipped",
+    "chunks_embedded",
+    "rows_committed",
+    "batches_committed",
+    "current_file",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT,
+    options TEXT NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    rows INTEGER NOT NULL DEFAULT 0,
+    progress TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    worker_id TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created_idx ON jobs(status, created);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+
+@dataclass
+class Job:
+    """Snapshot of one ingestion job and its files."""
+
+    id: str
+    status: str
+    source: Optional[str]
+    options: Dict[str, Any]
+    attempts: int
+    cancel_requested: bool
+    rows: int
+    progress: Dict[str, Any]
+    error: Optional[str]
+    created: float
+    started: Optional[float]
+    finished: Optional[float]
+    # Worker that holds a running job, and when it last checked in.
+    worker_id: Optional[str] = None
+    heartbeat: Optional[float] = None
+    # {"path", "name", "status"}; status is pending | running | done | skipped | missing.
+    files: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def paths(self) -> List[str]:
+        return [f["path"] for f in self.files]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in _FINISHED
+
+    @property
+    def fraction(self) -> float:
+        """Share of files that have settled (committed, skipped or missing)."""
+        if not self.files:
+            return 1.0 if self.is_finished else 0.0
+        settled = sum(f["status"] in ("done", "skipped", "missing") for f in self.files)
+        return settled / len(self.files)
+
+
+class JobStore:
+    """
+    Persistent ingestion job queue in SQLite.
+
+    Jobs move queued -> running -> done | failed | cancelled; failed and
+    cancelled jobs can be retried. `claim` takes the oldest queued job inside
+    an immediate transaction, so several worker threads or processes can
+    share one database. A claimed job is leased to its worker, which renews
+    the lease with every progress report and heartbeat; only jobs whose
+    lease has expired are re-queued. Uploads are staged under `jobs_dir`,
+    which also holds a checkpoint per job so a retry resumes after the files
+    already committed. Both are removed when the job is done; `prune` clears
+    those of failed / cancelled jobs once they are past retention, and any
+    staged folder no job refers to.
+    """
+
+    def __init__(self, path: str = INGEST_JOBS_DB, jobs_dir: str = INGEST_JOBS_DIR):
+        self.path = path
+        self.jobs_dir = jobs_dir
+        self.uploads_dir = os.path.join(jobs_dir, "uploads")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        (Path(jobs_dir) / "checkpoints").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Reason: autocommit mode so `claim` can open its own BEGIN IMMEDIATE.
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # Reason: queues created before leases existed lack these columns.
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for name, decl in (("worker_id", "TEXT"), ("heartbeat", "REAL")):
+            if name not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+
+    def checkpoint_path(self, job_id: str) -> str:
+        """
+        Checkpoint file of a job (committed files, for resuming).
+
+        Args:
+            job_id: Job id.
+
+        Returns:
+            str: Path under `jobs_dir`; the file may not exist yet.
+        """
+        return os.path.join(self.jobs_dir, "checkpoints", f"{job_id}.json")
+
+    def _job_paths(self, where: str, params: Sequence[Any]) -> Tuple[List[str], List[str]]:
+        """(job ids, file paths) of the jobs matching `where` (caller holds the lock)."""
+        ids = [r[0] for r in self._db.execute(f"SELECT id FROM jobs WHERE {where}", params)]
+        query = f"SELECT path FROM job_files WHERE job_id IN (SELECT id FROM jobs WHERE {where})"
+        return ids, [r[0] for r in self._db.execute(query, params)]
+
+    def _discard(self, job_ids: Sequence[str], paths: Sequence[str]) -> int:
+        """Delete the jobs' checkpoints and staged uploads; returns folders removed."""
+        for job_id in job_ids:
+            Path(self.checkpoint_path(job_id)).unlink(missing_ok=True)
+        return remove_uploads(self.uploads_dir, paths)
+
+    def stage_uploads(self, files: Sequence[Tuple[str, BinaryIO]]) -> List[str]:
+        """
+        Copy uploaded files into a new folder under `jobs_dir` (see
+        `job_uploads.stage_uploads`).
+
+        Args:
+            files: (file name, readable binary file) pairs.
+
+        Returns:
+            Absolute paths of the staged files, in order.
+        """
+        return stage_uploads(self.uploads_dir, files)
+
+    def submit(self, paths: Sequence[str], source: Optional[str] = None, **options: Any) -> str:
+        """
+        Queue an ingestion job.
+
+        Args:
+            paths: Files to ingest.
+            source: Source label stored in metadata.
+            **options: Extra `ingest_paths` keyword arguments (e.g. chunker,
+                max_chars, incremental).
+
+        Returns:
+            The job id.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock, self._transaction():
+            self._db.execute(
+                "INSERT INTO jobs(id, status, source, options, created) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, source, json.dumps(options), time.time()),
+            )
+            self._db.executemany(
+                "INSERT INTO job_files(job_id, position, path) VALUES (?, ?, ?)",
+                [(job_id, i, str(Path(p))) for i, p in enumerate(paths)],
+            )
+        return job_id
+
+    def claim(self, worker_id: Optional[str] = None) -> Optional[Job]:
+        """
+        Lease the oldest queued job to `worker_id`, mark it running and
+        return it, or None if the queue is empty.
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, "
+                "finished = NULL, error = NULL, worker_id = ?, heartbeat = ? WHERE id = ?",
+                (now, worker_id, now, row[0]),
+            )
+        return self.get(row[0])
+
+    def heartbeat(self, worker_id: Optional[str], job_ids: Sequence[str]) -> None:
+        """Renew the leases `worker_id` holds on running jobs."""
+        if not job_ids:
+            return
+        with self._lock, self._transaction():
+            self._db.executemany(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                [(time.time(), job_id, worker_id) for job_id in job_ids],
+            )
+
+    def report(self, job_id: str, progress: IngestProgress, worker_id: Optional[str] = None) -> bool:
+        """
+        Persist a progress update for a running job and renew its lease.
+
+        Returns:
+            True if the job should stop: cancellation was requested, or its
+            lease expired and it is no longer running for `worker_id`.
+        """
+        counters = {name: getattr(progress, name) for name in _PROGRESS_FIELDS}
+        # Reason: the extract stage may add entries while we read.
+        file_status = dict(progress.file_status)
+        with self._lock, self._transaction():
+            owned = self._db.execute(
+                "UPDATE jobs SET progress = ?, heartbeat = ? WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (json.dumps(counters), time.time(), job_id, worker_id),
+            ).rowcount
+            if not owned:
+                return True
+            self._db.execute(
+                "UPDATE job_files SET status = 'pending' WHERE job_id = ? AND status = 'running'", (job_id,)
+            )
+            self._db.executemany(
+                "UPDATE job_files SET status = ? WHERE job_id = ? AND path = ?",
+                [(status, job_id, path) for path, status in file_status.items()],
+            )
+            if progress.current_file and progress.current_file not in file_status:
+                self._db.execute(
+                    "UPDATE job_files SET status = 'running' WHERE job_id = ? AND path = ? AND status = 'pending'",
+                    (job_id, progress.current_file),
+                )
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        rows: int = 0,
+        error: Optional[str] = None,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        """
+        Record the outcome of a job running for `worker_id` (done, failed or
+        cancelled); a no-op if its lease has passed to another worker.
+        """
+        if status not in _FINISHED:
+            raise ValueError(f"Unknown final status: {status!r} (expected one of {_FINISHED})")
+        with self._lock, self._transaction():
+            cur = self._db.execute(
+                "UPDATE jobs SET status = ?, rows = ?, error = ?, finished = ?, worker_id = NULL, heartbeat = NULL "
+                "WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (status, rows, error, time.time(), job_id, worker_id),
+            )
+            if cur.rowcount:
+                self._db.execute(
+                    "UPDATE job_files SET status = 'pending' WHERE job_id = ? AND status = 'running'", (job_id,)
+                )
+            done = bool(cur.rowcount) and status == "done"
+            if done:
+                job_ids, paths = self._job_paths("id = ?", (job_id,))
+        if done:
+            # Reason: a done job cannot be retried, so its staged copies and
+            # checkpoint are dead weight.
+            self._discard(job_ids, paths)
+
+    def prune(self, retention: float = INGEST_UPLOAD_RETENTION_SECONDS) -> int:
+        """
+        Delete staged uploads that no job can use any more.
+
+        Removes the uploads and checkpoints of failed / cancelled jobs that
+        finished more than `retention` seconds ago (a later retry reports
+        their files as missing), and staged folders older than `retention`
+        that no queued, running or retryable job refers to (an upload that
+        was never submitted, or a job removed by hand).
+
+        Args:
+            retention: Seconds to keep the files of retryable jobs.
+
+        Returns:
+            int: Number of upload folders removed.
+        """
+        cutoff = time.time() - retention
+        with self._lock:
+            expired_ids, expired_paths = self._job_paths(
+                "status IN ('failed', 'cancelled') AND finished < ?", (cutoff,)
+            )
+            _, live_paths = self._job_paths(
+                "status IN ('queued', 'running') OR (status IN ('failed', 'cancelled') AND finished >= ?)",
+                (cutoff,),
+            )
+        removed = self._discard(expired_ids, expired_paths)
+        return removed + remove_stale_uploads(self.uploads_dir, live_paths, cutoff)
+
+    def release(self, job_id: str, worker_id: Optional[str] = None) -> bool:
+        """
+        Hand a job running for `worker_id` back to the queue (e.g. on
+        shutdown); it is cancelled instead if a cancel was requested.
+
+        Returns:
+            False if the job is not running for `worker_id`.
+        """
+        with self._lock, self._transaction():
+            return self._requeue("id = ? AND worker_id IS ?", (job_id, worker_id)) > 0
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job: a queued job is cancelled at once, a running one is
+        flagged and stops at its next progress report.
+
+        Returns:
+            False if the job does not exist or has already finished.
+        """
+        with self._lock, self._transaction():
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] in _FINISHED:
+                return False
+            if row[0] == "queued":
+                self._db.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?", (time.time(), job_id)
+                )
+            else:
+                self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return True
+
+    def retry(self, job_id: str) -> bool:
+        """
+        Queue a failed or cancelled job again; files it already committed are
+        skipped through its checkpoint.
+
+        Returns:
+            False if the job does not exist or is not failed / cancelled.
+        """
+        with self._lock, self._transaction():
+            cur = self._db.execute(
+                "UPDATE jobs SET status = 'queued', cancel_requested = 0, error = NULL, finished = NULL "
+                "WHERE id = ? AND status IN ('failed', 'cancelled')",
+                (job_id,),
+            )
+            return cur.rowcount > 0
+
+    def requeue_running(self, lease: float = INGEST_JOB_LEASE_SECONDS) -> int:
+        """
+        Put running jobs whose lease expired (no heartbeat for `lease`
+        seconds, so their process died) back in the queue; returns how many.
+        """
+        with self._lock, self._transaction():
+            return self._requeue("(heartbeat IS NULL OR heartbeat < ?)", (time.time() - lease,))
+
+    def _requeue(self, where: str, params: Sequence[Any]) -> int:
+        ids = [
+            row[0]
+            for row in self._db.execute(f"SELECT id FROM jobs WHERE status = 'running' AND {where}", params)
+        ]
+        now = time.time()
+        self._db.executemany(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END, "
+            "finished = CASE WHEN cancel_requested THEN ? END, worker_id = NULL, heartbeat = NULL WHERE id = ?",
+            [(now, job_id) for job_id in ids],
+        )
+        self._db.executemany(
+            "UPDATE job_files SET status = 'pending' WHERE job_id = ? AND status = 'running'",
+            [(job_id,) for job_id in ids],
+        )
+        return len(ids)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Snapshot of one job and its files.
+
+        Args:
+            job_id: Job id.
+
+        Returns:
+            Optional[Job]: The job, or None if it does not exist.
+        """
+        with self._lock:
+            row = self._db.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            files = self._db.execute(
+                "SELECT path, status FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+        return _job(row, files)
+
+    def list_jobs(self, limit: int = 20, job_ids: Optional[Sequence[str]] = None) -> List[Job]:
+        """Newest jobs first, optionally restricted to `job_ids`."""
+        if job_ids is not None:
+            jobs = [self.get(job_id) for job_id in job_ids]
+            return sorted((j for j in jobs if j is not None), key=lambda j: j.created, reverse=True)[:limit]
+        with self._lock:
+            ids = [
+                r[0]
+                for r in self._db.execute("SELECT id FROM jobs ORDER BY created DESC, rowid DESC LIMIT ?", (limit,))
+            ]
+        return [job for job in map(self.get, ids) if job is not None]
+
+    def close(self) -> None:
+        """Close the database connection; the store is unusable afterwards."""
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+
+# `jobs` columns in `Job` field order.
+_JOB_COLUMNS = (
+    "id, status, source, options, attempts, cancel_requested, rows, progress, error, created, started, finished, "
+    "worker_id, heartbeat"
+)
+_JOB_FIELDS = tuple(name.strip() for name in _JOB_COLUMNS.split(","))
+
+
+def _job(row: Sequence[Any], files: Sequence[Tuple[str, str]]) -> Job:
+    """Build a `Job` from a `_JOB_COLUMNS` row and its (path, status) file rows."""
+    values = dict(zip(_JOB_FIELDS, row))
+    values.update(
+        options=json.loads(values["options"]),
+        progress=json.loads(values["progress"]),
+        cancel_requested=bool(values["cancel_requested"]),
+    )
+    files_ = [{"path": path, "name": os.path.basename(path), "status": s} for path, s in files]
+    return Job(**values, files=files_)
+
+
+_store: Optional[JobStore] = None
+_singleton_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Return the process-wide job store (INGEST_JOBS_DB, INGEST_JOBS_DIR)."""
+    global _store
+    with _singleton_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
+
+
+if __name__ == "__main__":
+    # Reason: the CLI lives in its own module; this keeps the documented
+    # `python -m src.core.ingestion.jobs ...` entry point.
+    from .jobs_cli import main
+
+    main()
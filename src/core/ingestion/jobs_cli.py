@@ -0,0 +1,71 @@
+"""
+Command line for the ingestion job queue.
+
+Usage:
+    python -m src.core.ingestion.jobs submit docs/*.pdf --source my-upload
+    python -m src.core.ingestion.jobs work        # run queued jobs until interrupted
+    python -m src.core.ingestion.jobs status      # cancel <job_id> / retry <job_id>
+"""
+from __future__ import annotations
+import argparse
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .job_workers import INGEST_WORKERS, JobWorkerPool
+from .jobs import Job, get_job_store
+
+
+__all__ = ["main"]
+
+
+def _print_jobs(jobs: Sequence[Job]) -> None:
+    for job in jobs:
+        p = job.progress
+        print(
+            f"{job.id}  {job.status:<9}  {p.get('files_done', 0)}/{len(job.files)} files  "
+            f"{p.get('rows_committed', 0)} rows  attempts={job.attempts}"
+            + (f"  error={job.error}" if job.error else "")
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Run the job queue command line.
+
+    Args:
+        argv: Arguments (default `sys.argv[1:]`).
+    """
+    parser = argparse.ArgumentParser(description="Background ingestion job queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("work", help="Run queued jobs until interrupted")
+    work.add_argument("--workers", type=int, default=max(1, INGEST_WORKERS))
+    submit = sub.add_parser("submit", help="Queue files for ingestion")
+    submit.add_argument("paths", nargs="+")
+    submit.add_argument("--source", default=None)
+    submit.add_argument("--incremental", action="store_true")
+    sub.add_parser("status", help="List recent jobs")
+    for name in ("cancel", "retry"):
+        sub.add_parser(name).add_argument("job_id")
+    args = parser.parse_args(argv)
+
+    store = get_job_store()
+    if args.command == "work":
+        pool = JobWorkerPool(store, workers=args.workers).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pool.stop()
+    elif args.command == "submit":
+        paths = [str(Path(p).resolve()) for p in args.paths]
+        print(store.submit(paths, args.source, incremental=args.incremental))
+    elif args.command == "status":
+        _print_jobs(store.list_jobs())
+    else:
+        ok = getattr(store, args.command)(args.job_id)
+        print("ok" if ok else f"cannot {args.command} job {args.job_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ... import env as _env  # Load environment variables  # noqa: F401
+
+
+__all__ = ["BM25Index", "rrf_fuse", "tokenize", "RRF_K", "HYBRID_SEARCH"]
+
+
+# Fuse keyword and vector rankings by default (every vector store).
+HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "").lower() in ("1", "true", "yes")
+
+# Standard reciprocal rank fusion constant (Cormack et al.); also the SQL default.
+RRF_K = 60
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; identifiers like `get_client` or `E1234` stay whole."""
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory BM25 (Okapi) over documents addressed by integer position.
+
+    Postings map each term to {position: term frequency}; replacing a
+    position first removes its old terms, so the index tracks upserts.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def remove(self, pos: int) -> None:
+        for term in self._terms.pop(pos, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(pos, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(pos, 0)
+
+    def add(self, pos: int, text: str) -> None:
+        """Index (or re-index) the document at `pos`."""
+        self.remove(pos)
+        counts = Counter(tokenize(text or ""))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[pos] = tf
+        self._terms[pos] = tuple(counts)
+        length = sum(counts.values())
+        self._lengths[pos] = length
+        self._total_length += length
+
+    def scores(self, query: str, size: int) -> np.ndarray:
+        """
+        BM25 score of every position in [0, size) for `query` (0 where no term matches).
+        """
+        out = np.zeros(size, dtype=np.float32)
+        n = len(self._lengths)
+        if not n:
+            return out
+        avgdl = self._total_length / n or 1.0
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            pos = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            dl = np.fromiter((self._lengths[p] for p in postings), dtype=np.float32, count=len(postings))
+            keep = pos < size
+            norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl))
+            np.add.at(out, pos[keep], (idf * norm)[keep])
+        return out
+
+
+def rrf_fuse(
+    rankings: Sequence[Sequence[Hashable]],
+    k: int = RRF_K,
+    limit: Optional[int] = None,
+) -> List[Tuple[Hashable, float]]:
+    """
+    Reciprocal rank fusion: score(d) = sum over rankings of 1 / (k + rank(d)).
+
+    Args:
+        rankings: Ranked id lists, best first (ranks start at 1).
+        k: Damping constant; larger values flatten the rank contribution.
+        limit: Optional number of fused results to keep.
+
+    Returns:
+        (id, score) pairs, best first; ties keep first-seen order.
+    """
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return ordered[:limit] if limit is not None else ordered
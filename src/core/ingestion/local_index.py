@@ -0,0 +1,498 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .corpus import corpus_changes, corpus_version
+from .filters import matches_filter
+from .lexical import RRF_K, BM25Index, rrf_fuse
+from .quantize import FIRST_PASS_DIMS, RERANK_FACTOR, QuantizedMatrix
+from .vector_decode import decode_embeddings
+
+__all__ = ["LocalVectorIndex", "matches_filter"]
+
+
+# Columns pulled from rag_pages during sync (embedding is decoded, then dropped).
+SYNC_COLUMNS = "id,url,source,chunk_number,content,metadata,created_at,embedding"
+# Direct-SQL variant: `vector_send` returns pgvector's binary form as bytea, which
+# `decode_embeddings` turns into a matrix without parsing text.
+SYNC_SQL = (
+    "SELECT id, url, source, chunk_number, content, metadata, created_at::text, "
+    "vector_send(embedding) FROM {table} WHERE id > %s{where} ORDER BY id LIMIT %s"
+)
+ROW_KEYS = ("id", "url", "source", "chunk_number", "content", "metadata", "created_at")
+MAX_DECODE_ERRORS = 100
+# Urls per REST `in.(...)` filter, keeping request lines well under server limits.
+URL_BATCH = 100
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first (argpartition + small sort)."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class LocalVectorIndex:
+    """
+    Resident in-process vector index over rag_pages.
+
+    Embeddings live in one contiguous, L2-normalized matrix (float32, or a
+    quantized layout per RAG_VECTOR_STORAGE; see `QuantizedMatrix`) with a
+    parallel id array and row list, so a query is a single matrix-vector
+    product plus `argpartition`. Binary storage ranks by Hamming distance
+    and rescores the top `k * rerank_factor` candidates exactly against the
+    full vectors. With
+    `first_pass_dims`, a normalized prefix matrix (Matryoshka truncation)
+    ranks first and the full vectors rescore the shortlist the same way.
+
+    `sync()` pulls rows above the last seen `id` (BIGSERIAL, so
+    monotonically increasing). Rows updated in place keep their id and
+    deleted rows leave no trace, so when the corpus version (bumped by every
+    upsert / delete on this host) has moved, `sync()` also drops and
+    re-fetches the rows of every url the corpus change log names. Only when
+    the log cannot tell (trimmed, or an unattributed write), or removed rows
+    outnumber live ones, is the table reloaded; the new index is built
+    without holding the search lock and swapped in. `is_current()` tells
+    callers when a sync is due.
+    """
+
+    def __init__(
+        self,
+        table: str = "rag_pages",
+        page_size: int = 1000,
+        storage: Optional[str] = None,
+        rerank_factor: int = RERANK_FACTOR,
+        first_pass_dims: int = FIRST_PASS_DIMS,
+    ):
+        self.table = table
+        self.page_size = page_size
+        self.storage = QuantizedMatrix(storage).storage
+        self.rerank_factor = max(1, rerank_factor)
+        self.first_pass_dims = max(0, first_pass_dims)
+        self._lock = threading.RLock()
+        # Serializes syncs without blocking searches.
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vectors = QuantizedMatrix(self.storage)
+        # First-pass prefix vectors (float32), only when first_pass_dims is active.
+        self._prefix: Optional[QuantizedMatrix] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows: List[Dict[str, Any]] = []
+        self._pos: Dict[int, int] = {}
+        # Positions of each url's rows, for dropping a document on refresh.
+        self._url_pos: Dict[str, List[int]] = {}
+        # Positions whose row was removed; they score -inf until a reload compacts them.
+        self._dead = np.zeros(0, dtype=bool)
+        self._n_dead = 0
+        self._size = 0
+        self._bm25 = BM25Index()
+        self.high_water_id = 0
+        # Corpus version at the last sync; None until the first one.
+        self.version: Optional[str] = None
+        self.last_sync = 0.0
+        # (row id, reason) for recent rows whose embedding could not be decoded.
+        self.decode_errors: List[Tuple[Any, str]] = []
+
+    def __len__(self) -> int:
+        return self._size - self._n_dead
+
+    @property
+    def dim(self) -> int:
+        return self._vectors.dim
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        Normalized embedding matrix by position (removed rows included); a view
+        for float32 storage, else decoded.
+        """
+        return self._vectors.decode(self._size)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the embedding codes (allocated capacity)."""
+        return self._vectors.nbytes + (self._prefix.nbytes if self._prefix is not None else 0)
+
+    @property
+    def two_stage(self) -> bool:
+        return self._prefix is not None
+
+    def _reserve(self, extra: int, dim: int) -> None:
+        needed = self._size + extra
+        cap = self._vectors.capacity
+        if self.dim not in (0, dim) and self._size:
+            raise ValueError(f"Embedding dim {dim} does not match index dim {self.dim}")
+        if needed <= cap and self.dim == dim:
+            return
+        # Reason: grow geometrically so incremental syncs stay amortized O(n).
+        new_cap = max(needed, cap * 2, 1024)
+        ids = np.empty(new_cap, dtype=np.int64)
+        dead = np.zeros(new_cap, dtype=bool)
+        if self._size:
+            ids[: self._size] = self._ids[: self._size]
+            dead[: self._size] = self._dead[: self._size]
+        self._vectors.resize(new_cap, dim, self._size)
+        if 0 < self.first_pass_dims < dim:
+            if self._prefix is None:
+                self._prefix = QuantizedMatrix("float32")
+            self._prefix.resize(new_cap, self.first_pass_dims, self._size)
+        self._ids, self._dead = ids, dead
+
+    def _decode(self, rows: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
+        """Rows with a usable `embedding` and their matrix; bad rows land in decode_errors."""
+        decoded = decode_embeddings([row.get("embedding") for row in rows], dim=self.dim or None)
+        for pos, reason in decoded.bad_rows:
+            self.decode_errors.append((rows[pos].get("id"), reason))
+        del self.decode_errors[:-MAX_DECODE_ERRORS]
+        if not decoded.ok_rows.size:
+            return [], None
+        return [rows[i] for i in decoded.ok_rows], decoded.matrix
+
+    def add(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        embeddings: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Add (or replace, by id) rows in the index.
+
+        Args:
+            rows: Row dicts with at least `id`; `embedding` is read from each row
+                unless `embeddings` is given.
+            embeddings: Optional (len(rows) x dim) matrix aligned with `rows`.
+
+        Returns:
+            Number of rows added or replaced.
+        """
+        if embeddings is None:
+            rows, embeddings = self._decode(rows)
+            if not rows:
+                return 0
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(rows):
+            raise ValueError("embeddings must be a (len(rows) x dim) matrix")
+
+        with self._lock:
+            self._reserve(len(rows), embeddings.shape[1])
+            positions = np.empty(len(rows), dtype=np.int64)
+            for i, row in enumerate(rows):
+                rid = int(row["id"])
+                record = {key: row.get(key) for key in ROW_KEYS}
+                pos = self._pos.get(rid)
+                if pos is None:
+                    pos = self._size
+                    self._size += 1
+                    self._rows.append(record)
+                    self._pos[rid] = pos
+                    self._url_pos.setdefault(record["url"], []).append(pos)
+                else:
+                    self._rows[pos] = record
+                positions[i] = pos
+                self._ids[pos] = rid
+                self._bm25.add(pos, record.get("content") or "")
+            self._vectors.assign(positions, embeddings)
+            if self._prefix is not None:
+                self._prefix.assign(positions, _normalize(embeddings[:, : self.first_pass_dims]))
+        return len(rows)
+
+    def _remove_urls(self, urls: Set[str]) -> None:
+        """Retire every row of `urls` (caller holds the lock)."""
+        for url in urls:
+            for pos in self._url_pos.pop(url, ()):
+                self._dead[pos] = True
+                self._n_dead += 1
+                self._pos.pop(int(self._ids[pos]), None)
+                self._bm25.remove(pos)
+
+    def _mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Positions a search may return, or None when all of them may."""
+        live = ~self._dead[: self._size] if self._n_dead else None
+        if not filter:
+            return live
+        mask = np.fromiter(
+            (matches_filter(r, filter) for r in self._rows), dtype=bool, count=self._size
+        )
+        return mask if live is None else mask & live
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """First-pass scores: prefix cosine when two-stage, else the stored codes."""
+        if self._prefix is not None:
+            return self._prefix.scores(_normalize(queries[:, : self.first_pass_dims]), self._size)
+        return self._vectors.scores(queries, self._size)
+
+    def _ranked(self, query: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k positions and scores; approximate first passes rescore a wider candidate set."""
+        if not (self._vectors.needs_rescore or self.two_stage):
+            top = _top_k(scores, k)
+            top = top[np.isfinite(scores[top])]
+            return top, scores[top]
+        cand = _top_k(scores, k * self.rerank_factor)
+        cand = cand[np.isfinite(scores[cand])]
+        exact = self._vectors.rescore(query, cand)
+        order = _top_k(exact, k)
+        return cand[order], exact[order]
+
+    def _result(self, pos: int, score: float) -> Dict[str, Any]:
+        out = {key: self._rows[pos].get(key) for key in ROW_KEYS}
+        out["similarity"] = float(score)
+        return out
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Cosine top-k for one query.
+
+        Args:
+            query_embedding: Query vector.
+            k: Number of results.
+            filter: Optional filter (same semantics as `match_rag_pages`).
+
+        Returns:
+            List of row dicts with a `similarity` key, best first.
+        """
+        return self.search_batch([query_embedding], k=k, filter=filter)[0]
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Cosine top-k for a batch of queries with one matrix-matrix product.
+
+        Args:
+            query_embeddings: (m x dim) queries.
+            k: Number of results per query.
+            filter: Optional filter applied to every query.
+
+        Returns:
+            One result list per query.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        with self._lock:
+            if not self._size:
+                return [[] for _ in range(queries.shape[0])]
+            scores = self._scores(queries)
+            mask = self._mask(filter)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            out = []
+            for qi in range(scores.shape[0]):
+                top, top_scores = self._ranked(queries[qi], scores[qi], k)
+                out.append([self._result(p, s) for p, s in zip(top, top_scores)])
+        return out
+
+    def search_hybrid(
+        self,
+        query_text: str,
+        query_embedding: Sequence[float],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        candidates: Optional[int] = None,
+        rrf_k: int = RRF_K,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 + cosine candidates fused with reciprocal rank fusion.
+
+        Mirrors `hybrid_match_rag_pages`: the top `candidates` rows of each
+        ranking (default 4 * k) are fused; rows only found lexically still
+        report their cosine `similarity`.
+
+        Args:
+            query_text: Raw query for the lexical ranking.
+            query_embedding: Query vector.
+            k: Number of results.
+            filter: Optional filter (same semantics as `match_rag_pages`).
+            candidates: Candidates taken from each ranking.
+            rrf_k: RRF damping constant.
+
+        Returns:
+            Row dicts with `similarity` (cosine) and `score` (RRF), best first.
+        """
+        n_cand = candidates or max(4 * k, 20)
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+        with self._lock:
+            if not self._size:
+                return []
+            cosine = self._scores(query[None, :])[0]
+            lexical = self._bm25.scores(query_text, self._size)
+            mask = self._mask(filter)
+            if mask is not None:
+                cosine[~mask] = -np.inf
+                lexical[~mask] = 0.0
+            vector_top = [int(p) for p in self._ranked(query, cosine, n_cand)[0]]
+            lexical_top = [int(p) for p in _top_k(lexical, n_cand) if lexical[p] > 0]
+            fused = rrf_fuse([vector_top, lexical_top], k=rrf_k, limit=k)
+            positions = [pos for pos, _ in fused]
+            sims = (
+                self._vectors.rescore(query, positions)
+                if self._vectors.needs_rescore or self.two_stage
+                else cosine[positions]
+            )
+            out = []
+            for (pos, score), sim in zip(fused, sims):
+                row = self._result(pos, sim)
+                row["score"] = score
+                out.append(row)
+        return out
+
+    def _fetcher(self, client) -> Callable[[int, Optional[List[str]], Optional[int]], List[Dict[str, Any]]]:
+        """
+        Page fetcher `(after_id, urls, upto_id) -> rows`: the pooled psycopg connection
+        (binary embeddings) when SUPABASE_DB_URL is set and no client is
+        passed, otherwise Supabase REST.
+        """
+        from .pgvector_search import get_database_url, get_pool
+
+        if client is None and get_database_url():
+            keys = ROW_KEYS + ("embedding",)
+
+            def fetch_pg(after: int, urls: Optional[List[str]], upto: Optional[int]) -> List[Dict[str, Any]]:
+                where, params = "", [after]
+                if urls is not None:
+                    where += " AND url = ANY(%s) AND id <= %s"
+                    params += [urls, upto]
+                params.append(self.page_size)
+                with get_pool().connection() as conn:
+                    cur = conn.execute(SYNC_SQL.format(table=self.table, where=where), params)
+                    return [dict(zip(keys, row)) for row in cur.fetchall()]
+
+            return fetch_pg
+        if client is None:
+            from .supabase_store import get_client
+
+            client = get_client()
+
+        def fetch_rest(after: int, urls: Optional[List[str]], upto: Optional[int]) -> List[Dict[str, Any]]:
+            query = client.table(self.table).select(SYNC_COLUMNS).gt("id", after)
+            if urls is not None:
+                query = query.in_("url", urls).lte("id", upto)
+            return query.order("id").limit(self.page_size).execute().data or []
+
+        return fetch_rest
+
+    def _pages(
+        self, fetch, after: int, urls: Optional[List[str]] = None, upto: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Batches of rows above id `after` (of `urls` up to id `upto`, when given), in id order."""
+        while True:
+            batch = fetch(after, urls, upto)
+            if not batch:
+                return
+            yield batch
+            # Rows without a usable embedding still advance the cursor.
+            after = max(after, max(int(r["id"]) for r in batch))
+            if len(batch) < self.page_size:
+                return
+
+    def _pull_new(self, fetch) -> int:
+        """Add rows above the high-water mark; returns the number added."""
+        added = 0
+        for batch in self._pages(fetch, self.high_water_id):
+            added += self.add(batch)
+            with self._lock:
+                self.high_water_id = max(self.high_water_id, max(int(r["id"]) for r in batch))
+        return added
+
+    def _refresh(self, fetch, urls: Set[str]) -> int:
+        """
+        Replace the known rows of `urls` with their stored state; returns the
+        number added. Rows above the high-water mark are left to `_pull_new`,
+        so new chunks are transferred once.
+        """
+        ordered = sorted(urls)
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(ordered), URL_BATCH):
+            for batch in self._pages(fetch, 0, ordered[start : start + URL_BATCH], self.high_water_id):
+                rows.extend(batch)
+        rows, embeddings = self._decode(rows) if rows else ([], None)
+        # Reason: drop and re-add under one lock, so no search sees a document half gone.
+        with self._lock:
+            self._remove_urls(urls)
+            return self.add(rows, embeddings) if rows else 0
+
+    def _rebuild(self, fetch) -> int:
+        """Load the whole table into a fresh index, then swap it in."""
+        fresh = LocalVectorIndex(
+            self.table, self.page_size, self.storage, self.rerank_factor, self.first_pass_dims
+        )
+        added = fresh._pull_new(fetch)
+        with self._lock:
+            for name, value in vars(fresh).items():
+                if name not in ("_lock", "_sync_lock"):
+                    setattr(self, name, value)
+        return added
+
+    def is_current(self) -> bool:
+        """False once the corpus has been written to since the last sync."""
+        return self.version is None or self.version == corpus_version()
+
+    def sync(self, client=None, wait: bool = True) -> int:
+        """
+        Pull rows newer than the high-water mark and, if the corpus version
+        moved since the last sync, re-fetch the documents written since.
+
+        Searches keep running against the current rows while this fetches;
+        see the class docstring for when it falls back to a full reload.
+
+        Args:
+            client: Optional Supabase client (defaults to the pooled psycopg
+                connection when SUPABASE_DB_URL is set, else `get_client()`).
+            wait: When False and another thread is already syncing, return
+                at once instead of queueing behind it.
+
+        Returns:
+            Number of rows added or replaced.
+        """
+        fetch = self._fetcher(client)
+        if not self._sync_lock.acquire(blocking=wait):
+            return 0
+        try:
+            # Reason: read before pulling, so a write that lands mid-sync moves
+            # the version again and the next sync picks it up.
+            version = corpus_version()
+            added = 0
+            if self.version is not None and self.version != version:
+                changed = corpus_changes(self.version, version)
+                if changed is None:
+                    added = self._rebuild(fetch)
+                else:
+                    added = self._refresh(fetch, changed)
+                    if self._n_dead > len(self):
+                        added = self._rebuild(fetch)
+            added += self._pull_new(fetch)
+            with self._lock:
+                self.last_sync = time.time()
+                self.version = version
+        finally:
+            self._sync_lock.release()
+        return added
+
+    def reload(self, client=None) -> int:
+        """Re-sync the full table into a fresh index and swap it in."""
+        fetch = self._fetcher(client)
+        with self._sync_lock:
+            version = corpus_version()
+            added = self._rebuild(fetch)
+            with self._lock:
+                self.last_sync = time.time()
+                self.version = version
+        return added
@@ -0,0 +1,146 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ... import env as _env  # Load environment variables  # noqa: F401
+from ..tracing import span
+from .local_index import LocalVectorIndex
+
+
+__all__ = [
+    "get_local_index",
+    "similarity_search_rag_pages",
+    "local_search",
+    "local_search_batch",
+    "LOCAL_INDEX_SYNC_SECONDS",
+]
+
+
+LOCAL_INDEX_SYNC_SECONDS = float(os.getenv("RAG_LOCAL_INDEX_SYNC_SECONDS", "30"))
+
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Return the process-wide resident index over rag_pages."""
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None:
+            _local_index = LocalVectorIndex()
+        return _local_index
+
+
+def _ensure_synced(index: LocalVectorIndex, max_staleness: float) -> None:
+    """
+    Sync `index` if it is empty, behind the corpus version, or older than
+    `max_staleness` seconds. Only a first load blocks; otherwise a search
+    that finds another thread syncing goes ahead on the current rows.
+    """
+    if len(index) and index.is_current() and time.time() - index.last_sync < max_staleness:
+        return
+    with span("local_index.sync") as sync:
+        # Reason: no client, so the index uses the pooled psycopg connection
+        # when SUPABASE_DB_URL is set and the Supabase client otherwise.
+        sync.add("rows", index.sync(wait=not len(index)))
+
+
+def local_search(
+    query_embedding: List[float],
+    match_count: int,
+    filter: Optional[Dict[str, Any]] = None,
+    max_staleness: Optional[float] = None,
+    query_text: Optional[str] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Search the resident index, syncing it first when due.
+
+    Args:
+        query_embedding: Query vector.
+        match_count: Number of rows to return.
+        filter: Optional filter (same semantics as `match_rag_pages`).
+        max_staleness: Seconds between incremental syncs. Defaults to RAG_LOCAL_INDEX_SYNC_SECONDS.
+        query_text: When given, fuse BM25 and cosine rankings (`search_hybrid`).
+
+    Returns:
+        The rows, possibly empty when nothing matches, or None when the
+        index could not be loaded (empty table or sync failure), so the
+        caller should try another strategy.
+    """
+    if max_staleness is None:
+        max_staleness = LOCAL_INDEX_SYNC_SECONDS
+    index = get_local_index()
+    try:
+        with span("search.local_index", hybrid=bool(query_text)) as s:
+            _ensure_synced(index, max_staleness)
+            if not len(index):
+                return None
+            s.add("rows_scanned", len(index))
+            if query_text:
+                rows = index.search_hybrid(query_text, query_embedding, k=match_count, filter=filter)
+            else:
+                rows = index.search(query_embedding, k=match_count, filter=filter)
+            s.add("rows", len(rows))
+            return rows
+    except Exception as e:
+        logger.warning("rag_pages search failed: %s", e)
+        return None
+
+
+def similarity_search_rag_pages(
+    query_embedding: List[float],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    max_staleness: Optional[float] = None,
+    query_text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Search rag_pages in Python using the resident `LocalVectorIndex`.
+
+    The first call loads the table; later calls only pull rows above the
+    index's id high-water mark, at most once every `max_staleness` seconds,
+    and refresh the documents an upsert or delete on this host recorded in
+    the corpus change log as soon as it bumps the corpus version.
+
+    Args:
+        query_embedding: Query vector.
+        match_count: Number of rows to return.
+        filter: Optional filter (same semantics as `match_rag_pages`).
+        max_staleness: Seconds between incremental syncs. Defaults to RAG_LOCAL_INDEX_SYNC_SECONDS.
+        query_text: When given, fuse BM25 and cosine rankings (`search_hybrid`).
+
+    Returns:
+        List of {id, url, source, chunk_number, content, metadata, similarity} dicts
+        (plus `score` for hybrid searches); empty when the index is unavailable.
+    """
+    return local_search(query_embedding, match_count, filter, max_staleness, query_text) or []
+
+
+def local_search_batch(
+    query_embeddings: List[List[float]],
+    match_count: int,
+    filter: Optional[Dict[str, Any]] = None,
+) -> Optional[List[List[Dict[str, Any]]]]:
+    """
+    Batch search on the resident index, syncing it first when due.
+
+    Returns:
+        One result list per query, or None when the index is empty or
+        unavailable.
+    """
+    index = get_local_index()
+    try:
+        with span("search.local_index_batch", queries=len(query_embeddings)) as s:
+            _ensure_synced(index, LOCAL_INDEX_SYNC_SECONDS)
+            if not len(index):
+                return None
+            s.add("rows_scanned", len(index) * len(query_embeddings))
+            return index.search_batch(query_embeddings, k=match_count, filter=filter)
+    except Exception as e:
+        logger.warning("rag_pages batch search failed: %s", e)
+        return None
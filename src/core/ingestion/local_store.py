@@ -0,0 +1,485 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ...env import cache_path
+from ..tracing import span
+from .corpus import bump_corpus_version
+from .filters import validate_filter
+from . import lexical
+from .local_store_search import SearchMixin
+
+
+__all__ = ["LocalFileVectorStore", "RAG_LOCAL_STORE_PATH"]
+
+logger = logging.getLogger(__name__)
+
+RAG_LOCAL_STORE_PATH = os.getenv("RAG_LOCAL_STORE_PATH") or cache_path("vector_store")
+
+# Row fields returned by search (plus similarity), as the server-side search returns them.
+ROW_COLUMNS = ("id", "url", "chunk_number", "content", "metadata")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    slot INTEGER PRIMARY KEY,
+    id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    source TEXT,
+    chunk_number INTEGER NOT NULL,
+    content TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL,
+    live INTEGER NOT NULL DEFAULT 1
+);
+CREATE UNIQUE INDEX IF NOT EXISTS chunks_live_key ON chunks(url, chunk_number) WHERE live = 1;
+CREATE INDEX IF NOT EXISTS chunks_id_idx ON chunks(id);
+CREATE INDEX IF NOT EXISTS chunks_source_idx ON chunks(source) WHERE live = 1;
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+# Contentless: the text already lives in `chunks`; rowid is the chunk id.
+_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+    "content, content='', tokenize=\"unicode61 tokenchars '_'\")"
+)
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+class LocalFileVectorStore(SearchMixin):
+    """
+    File-backed vector store: embeddings in a memory-mapped float32 file,
+    rows and a full-text index in SQLite.
+
+    Writes are append-only. An upsert appends the new vectors and retires
+    the slots of the rows it replaces by clearing their byte in a parallel
+    live-flag file; `compact()` rewrites both files without the retired
+    slots. Opening a store maps the files without reading them, so startup
+    takes milliseconds at any size, and search scans the mapping in blocks
+    (`block_rows` vectors at a time) so memory stays flat.
+
+    SQLite is the source of truth. File names carry a generation number that
+    `compact()` switches in the same transaction that renumbers the rows,
+    and a write that dies between its commit and its flag update is
+    repaired on the next open. One process should write at a time; any
+    number may read, and readers pick up other processes' writes on their
+    next call.
+
+    Args:
+        path: Directory holding `meta.sqlite`, `vectors.<gen>.f32` and
+            `live.<gen>.u8`.
+        block_rows: Vectors scored per block during a scan.
+    """
+
+    def __init__(self, path: str = RAG_LOCAL_STORE_PATH, block_rows: int = 65536):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.block_rows = max(1, block_rows)
+        self._lock = threading.RLock()
+        # Reason: autocommit mode so each write opens its own BEGIN IMMEDIATE.
+        self._db = sqlite3.connect(
+            str(self.path / "meta.sqlite"), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        try:
+            self._db.execute(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning("SQLite FTS5 unavailable, hybrid search falls back to vector-only: %s", e)
+            self._fts = False
+        self._view: Tuple[int, int, int] = (-1, -1, -1)
+        self._vectors: Optional[np.ndarray] = None
+        self._live: Optional[np.ndarray] = None
+        with self._lock:
+            self._recover()
+
+    # -- files ---------------------------------------------------------
+
+    def _vector_file(self, generation: int) -> Path:
+        return self.path / f"vectors.{generation}.f32"
+
+    def _live_file(self, generation: int) -> Path:
+        return self.path / f"live.{generation}.u8"
+
+    def _meta(self) -> Dict[str, int]:
+        meta = {"generation": 0, "slots": 0, "dim": 0, "next_id": 1, "dirty": 0}
+        meta.update(self._db.execute("SELECT key, value FROM store_meta").fetchall())
+        return meta
+
+    def _set_meta(self, **values: int) -> None:
+        self._db.executemany(
+            "INSERT INTO store_meta(key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            list(values.items()),
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _recover(self) -> None:
+        """Drop what an interrupted write or compaction left behind."""
+        meta = self._meta()
+        gen, slots = meta["generation"], meta["slots"]
+        for f in list(self.path.glob("vectors.*.f32")) + list(self.path.glob("live.*.u8")):
+            # Reason: only older generations; a newer one may be a compaction
+            # another process is writing right now (it rewrites it anyway).
+            if int(f.name.split(".")[1]) < gen:
+                _remove(f)
+        for f in (self._vector_file(gen), self._live_file(gen)):
+            f.touch()
+        # Vectors past `slots` (an upsert that never committed) are ignored by
+        # the mapping and overwritten by the next upsert.
+        if meta["dirty"]:
+            live = np.zeros(slots, dtype=np.uint8)
+            live_slots = [s for (s,) in self._db.execute("SELECT slot FROM chunks WHERE live = 1")]
+            live[np.asarray(live_slots, dtype=np.int64)] = 1
+            with self._live_file(gen).open("r+b") as f:
+                f.write(live.tobytes())
+            self._set_meta(dirty=0)
+        self._remap()
+
+    def _remap(self) -> Tuple[int, int, int]:
+        """Map the current generation's files if another write changed them."""
+        meta = self._meta()
+        view = (meta["generation"], meta["slots"], meta["dim"])
+        if view != self._view:
+            gen, slots, dim = view
+            self._vectors = self._live = None
+            if slots:
+                self._vectors = np.memmap(self._vector_file(gen), dtype=np.float32, mode="r", shape=(slots, dim))
+                self._live = np.memmap(self._live_file(gen), dtype=np.uint8, mode="r+", shape=(slots,))
+            self._view = view
+        return view
+
+    def _set_live(self, slots: Sequence[int], value: int) -> None:
+        if len(slots) and self._live is not None:
+            self._live[np.asarray(slots, dtype=np.int64)] = value
+            self._live.flush()
+
+    # -- writes --------------------------------------------------------
+
+    def upsert(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert or replace rows keyed by (url, chunk_number).
+
+        Each row needs url, chunk_number, content and embedding; source and
+        metadata are optional. A replaced row keeps its id and created_at,
+        like the Postgres upsert.
+        """
+        if not rows:
+            return
+        # Reason: one key twice in a batch keeps the last row, as sequential upserts would.
+        rows = list({(r["url"], int(r["chunk_number"])): r for r in rows}.values())
+        emb = np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+        if emb.ndim != 2:
+            raise ValueError("every row needs an embedding of the same size")
+        emb = np.ascontiguousarray(_normalize(emb))
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock, span("local_store.upsert", rows=len(rows)):
+            gen, start, dim = self._remap()
+            if dim and emb.shape[1] != dim:
+                raise ValueError(f"embedding size {emb.shape[1]} does not match the store's {dim}")
+            dim = emb.shape[1]
+            with self._vector_file(gen).open("r+b") as f:
+                f.seek(start * dim * 4)
+                f.write(emb.tobytes())
+                f.truncate()
+            with self._live_file(gen).open("r+b") as f:
+                f.seek(start)
+                f.write(bytes(len(rows)))
+                f.truncate()
+            with self._transaction():
+                next_id = self._meta()["next_id"]
+                retired, records, fts_old, fts_new = [], [], [], []
+                for i, r in enumerate(rows):
+                    old = self._db.execute(
+                        "SELECT slot, id, content, created_at FROM chunks "
+                        "WHERE live = 1 AND url = ? AND chunk_number = ?",
+                        (r["url"], int(r["chunk_number"])),
+                    ).fetchone()
+                    if old is None:
+                        row_id, created = next_id, now
+                        next_id += 1
+                    else:
+                        retired.append(old[0])
+                        fts_old.append((old[1], old[2] or ""))
+                        row_id, created = old[1], old[3]
+                    records.append(
+                        (
+                            start + i,
+                            row_id,
+                            r["url"],
+                            r.get("source"),
+                            int(r["chunk_number"]),
+                            r.get("content"),
+                            json.dumps(r.get("metadata") or {}),
+                            created,
+                        )
+                    )
+                    fts_new.append((row_id, r.get("content") or ""))
+                self._db.executemany("UPDATE chunks SET live = 0 WHERE slot = ?", [(s,) for s in retired])
+                self._db.executemany(
+                    "INSERT INTO chunks(slot, id, url, source, chunk_number, content, metadata, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    records,
+                )
+                if self._fts:
+                    self._db.executemany(
+                        "INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', ?, ?)", fts_old
+                    )
+                    self._db.executemany("INSERT INTO chunks_fts(rowid, content) VALUES (?, ?)", fts_new)
+                self._set_meta(slots=start + len(rows), dim=dim, next_id=next_id, dirty=1)
+            self._remap()
+            self._set_live(retired, 0)
+            self._set_live(range(start, start + len(rows)), 1)
+            self._set_meta(dirty=0)
+        bump_corpus_version(r["url"] for r in rows)
+
+    def delete(self, url: str, first_stale: int = 0) -> None:
+        """Retire every chunk of `url` with chunk_number >= first_stale."""
+        with self._lock:
+            self._remap()
+            with self._transaction():
+                old = self._db.execute(
+                    "SELECT slot, id, content FROM chunks WHERE live = 1 AND url = ? AND chunk_number >= ?",
+                    (url, first_stale),
+                ).fetchall()
+                if not old:
+                    return
+                self._db.executemany("UPDATE chunks SET live = 0 WHERE slot = ?", [(s,) for s, _, _ in old])
+                if self._fts:
+                    self._db.executemany(
+                        "INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', ?, ?)",
+                        [(i, c or "") for _, i, c in old],
+                    )
+                self._set_meta(dirty=1)
+            self._set_live([s for s, _, _ in old], 0)
+            self._set_meta(dirty=0)
+        bump_corpus_version([url])
+
+    def compact(self) -> int:
+        """
+        Rewrite the vector and flag files without retired slots.
+
+        Returns:
+            Number of slots reclaimed.
+        """
+        with self._lock, span("local_store.compact") as s:
+            gen, slots, dim = self._remap()
+            keep = np.fromiter(
+                (slot for (slot,) in self._db.execute("SELECT slot FROM chunks WHERE live = 1 ORDER BY slot")),
+                dtype=np.int64,
+            )
+            if len(keep) == slots:
+                return 0
+            new_gen = gen + 1
+            with self._vector_file(new_gen).open("wb") as f:
+                for i in range(0, len(keep), self.block_rows):
+                    f.write(np.ascontiguousarray(self._vectors[keep[i : i + self.block_rows]]).tobytes())
+            self._live_file(new_gen).write_bytes(b"\x01" * len(keep))
+            with self._transaction():
+                self._db.execute("DELETE FROM chunks WHERE live = 0")
+                # Reason: ascending order, and every new slot is <= its old one,
+                # so no update collides with a row that has not moved yet.
+                self._db.executemany(
+                    "UPDATE chunks SET slot = ? WHERE slot = ?",
+                    [(new, int(old)) for new, old in enumerate(keep) if new != old],
+                )
+                self._set_meta(generation=new_gen, slots=len(keep), dim=dim, dirty=0)
+            self._remap()
+            for f in (self._vector_file(gen), self._live_file(gen)):
+                _remove(f)
+            s.add("reclaimed", slots - len(keep))
+            return slots - len(keep)
+
+    # -- reads ---------------------------------------------------------
+
+    def count(self) -> int:
+        """Live rows."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks WHERE live = 1").fetchone()[0]
+
+    @property
+    def slots(self) -> int:
+        """Rows on disk including retired ones (what `compact()` shrinks)."""
+        with self._lock:
+            return self._remap()[1]
+
+    def fetch_chunk_hashes(self, url: str) -> Dict[int, Dict[str, Any]]:
+        """{chunk_number: {"chunk_hash", "file_hash"}} for one document."""
+        out: Dict[int, Dict[str, Any]] = {}
+        with self._lock:
+            found = self._db.execute(
+                "SELECT chunk_number, metadata FROM chunks WHERE live = 1 AND url = ?", (url,)
+            ).fetchall()
+        for n, metadata in found:
+            meta = json.loads(metadata)
+            out[int(n)] = {"chunk_hash": meta.get("chunk_hash"), "file_hash": meta.get("file_hash")}
+        return out
+
+    def _scan(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (slots, scores) per query over the mapped vectors, best first."""
+        m, k = queries.shape[0], max(1, k)
+        best_scores = np.full((m, 0), -np.inf, dtype=np.float32)
+        best_slots = np.empty((m, 0), dtype=np.int64)
+        n = 0 if self._vectors is None else self._vectors.shape[0]
+        for start in range(0, n, self.block_rows):
+            end = min(n, start + self.block_rows)
+            scores = queries @ self._vectors[start:end].T
+            dead = self._live[start:end] == 0
+            if allowed is not None:
+                dead |= ~allowed[start:end]
+            scores[:, dead] = -np.inf
+            scores = np.hstack([best_scores, scores])
+            slots = np.hstack([best_slots, np.broadcast_to(np.arange(start, end), (m, end - start))])
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                slots = np.take_along_axis(slots, top, axis=1)
+            best_scores, best_slots = scores, slots
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_slots, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _rows(self, slots: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        out: Dict[int, Dict[str, Any]] = {}
+        slots = [int(s) for s in slots]
+        # Reason: SQLite caps bound parameters, so look up in slices.
+        for i in range(0, len(slots), 500):
+            part = slots[i : i + 500]
+            for slot, *values in self._db.execute(
+                f"SELECT slot, {', '.join(ROW_COLUMNS)} FROM chunks WHERE slot IN ({','.join('?' * len(part))})",
+                part,
+            ):
+                row = dict(zip(ROW_COLUMNS, values))
+                row["metadata"] = json.loads(row["metadata"])
+                out[slot] = row
+        return out
+
+    def _results(self, slots: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        keep = np.isfinite(scores)
+        slots, scores = slots[keep], scores[keep]
+        rows = self._rows(slots)
+        out = []
+        for slot, score in zip(slots, scores):
+            row = dict(rows[int(slot)])
+            row["similarity"] = float(score)
+            out.append(row)
+        return out
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Exact cosine top-k for many queries with one scan of the vectors.
+
+        Returns:
+            One list of {id, url, chunk_number, content, metadata, similarity}
+            dicts per query, best first.
+        """
+        filter = validate_filter(filter)
+        if not len(query_embeddings):
+            return []
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        with self._lock, span("search.local_store", queries=len(queries)) as s:
+            _, slots, dim = self._remap()
+            if not slots:
+                return [[] for _ in range(len(queries))]
+            if queries.shape[1] != dim:
+                raise ValueError(f"query size {queries.shape[1]} does not match the store's {dim}")
+            s.add("rows_scanned", slots * len(queries))
+            top, scores = self._scan(queries, match_count, self._allowed(filter, slots))
+            return [self._results(top[i], scores[i]) for i in range(len(queries))]
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Exact cosine top-k, or with `hybrid` an FTS5 BM25 ranking fused with
+        the vector ranking by reciprocal rank fusion (same as
+        `hybrid_match_rag_pages`: rows also carry the fused `score`, which
+        is the vector ranking's alone when SQLite lacks FTS5).
+
+        Raises:
+            ValueError: If `filter` is malformed, or hybrid search lacks `query_text`.
+        """
+        if hybrid is None:
+            hybrid = lexical.HYBRID_SEARCH and bool(query_text)
+        if not hybrid:
+            return self.search_batch([query_embedding], match_count, filter)[0]
+        if not query_text or not query_text.strip():
+            raise ValueError("hybrid search requires query_text")
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32)[None, :])
+        return self._search_hybrid(query, match_count, validate_filter(filter), query_text)
+
+    async def search_async(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """`search` in a worker thread."""
+        return await asyncio.to_thread(self.search, query_embedding, match_count, filter, hybrid, query_text)
+
+    async def search_batch_async(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """`search_batch` in a worker thread."""
+        return await asyncio.to_thread(self.search_batch, query_embeddings, match_count, filter)
+
+    def close(self) -> None:
+        """Unmap the files and close the database; the store is unusable afterwards."""
+        with self._lock:
+            self._vectors = self._live = None
+            self._view = (-1, -1, -1)
+            self._db.close()
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        # Reason: Windows refuses to delete a file another reader still maps;
+        # the next open removes it.
+        pass
+
+
+if __name__ == "__main__":
+    # Reason: the CLI lives in its own module; this keeps the documented
+    # `python -m src.core.ingestion.local_store compact` entry point.
+    from .local_store_cli import main
+
+    main()
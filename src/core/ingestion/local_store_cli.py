@@ -0,0 +1,38 @@
+"""
+Command line for the local vector store.
+
+Usage:
+    python -m src.core.ingestion.local_store stats
+    python -m src.core.ingestion.local_store compact --path ~/.cache/rag-vs/vector_store
+"""
+from __future__ import annotations
+import argparse
+import json
+from typing import Optional, Sequence
+
+from .local_store import RAG_LOCAL_STORE_PATH, LocalFileVectorStore
+
+
+__all__ = ["main"]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Print the store's size, compacting it first with `compact`.
+
+    Args:
+        argv: Arguments (default `sys.argv[1:]`).
+    """
+    parser = argparse.ArgumentParser(description="Inspect or compact the local vector store")
+    parser.add_argument("command", choices=("stats", "compact"))
+    parser.add_argument("--path", default=RAG_LOCAL_STORE_PATH)
+    args = parser.parse_args(argv)
+
+    store = LocalFileVectorStore(args.path)
+    if args.command == "compact":
+        print(f"Reclaimed {store.compact()} slots")
+    print(json.dumps({"path": str(store.path), "rows": store.count(), "slots": store.slots}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..tracing import span
+from .filters import matches_filter
+from .lexical import RRF_K, rrf_fuse, tokenize
+
+
+__all__ = ["SearchMixin"]
+
+
+class SearchMixin:
+    """
+    Metadata filtering and hybrid (FTS5 BM25 + vector) search for
+    `LocalFileVectorStore`, the parts of its search that run in SQLite.
+
+    Relies on the store's SQLite connection (`_db`, with `chunks` and, when
+    `_fts` is set, `chunks_fts`), its lock and mapped vectors, and its
+    `_remap`, `_scan` and `_rows` helpers.
+    """
+
+    _db: sqlite3.Connection
+    _fts: bool
+    _lock: threading.RLock
+    _vectors: Optional[np.ndarray]
+
+    def _allowed(self, filter: Dict[str, Any], slots: int) -> Optional[np.ndarray]:
+        """Slots passing `filter`; the indexed keys narrow the rows checked in Python."""
+        if not filter:
+            return None
+        where, params = ["live = 1"], []
+        source = filter.get("source")
+        if source is not None:
+            sources = source if isinstance(source, list) else [source]
+            where.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        if "url" in filter:
+            where.append("url = ?")
+            params.append(filter["url"])
+        if "url_prefix" in filter:
+            where.append("substr(url, 1, ?) = ?")
+            params.extend([len(filter["url_prefix"]), filter["url_prefix"]])
+        mask = np.zeros(slots, dtype=bool)
+        for slot, url, src, metadata, created_at in self._db.execute(
+            f"SELECT slot, url, source, metadata, created_at FROM chunks WHERE {' AND '.join(where)}", params
+        ):
+            row = {"url": url, "source": src, "metadata": json.loads(metadata), "created_at": created_at}
+            if slot < slots and matches_filter(row, filter):
+                mask[slot] = True
+        return mask
+
+    def _search_hybrid(
+        self,
+        query: np.ndarray,
+        match_count: int,
+        filter: Dict[str, Any],
+        query_text: str,
+        rrf_k: int = RRF_K,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse the vector and BM25 rankings by reciprocal rank fusion.
+
+        Args:
+            query: Unit-normalized query embedding, shape (1, dim).
+            match_count: Rows to return.
+            filter: Validated metadata filter.
+            query_text: Text for the keyword ranking.
+            rrf_k: Reciprocal rank fusion constant.
+
+        Returns:
+            Rows best first, each with its cosine `similarity` and fused
+            `score`. Without FTS5 the keyword ranking is empty, so the order
+            is the vector order and `score` is its RRF term alone.
+        """
+        n_cand = max(4 * match_count, 20)
+        with self._lock, span("search.local_store_hybrid"):
+            _, slots, _ = self._remap()
+            if not slots:
+                return []
+            allowed = self._allowed(filter, slots)
+            vec_slots, vec_scores = self._scan(query, n_cand, allowed)
+            vector_top = [int(s) for s, v in zip(vec_slots[0], vec_scores[0]) if np.isfinite(v)]
+            lexical_top = self._lexical(query_text, n_cand, allowed)
+            fused = rrf_fuse([vector_top, lexical_top], k=rrf_k, limit=match_count)
+            positions = np.asarray([slot for slot, _ in fused], dtype=np.int64)
+            sims = self._vectors[positions] @ query[0] if len(positions) else []
+            rows = self._rows(positions)
+            out = []
+            for (slot, score), sim in zip(fused, sims):
+                row = dict(rows[int(slot)])
+                row["similarity"] = float(sim)
+                row["score"] = score
+                out.append(row)
+            return out
+
+    def _lexical(self, query_text: str, limit: int, allowed: Optional[np.ndarray]) -> List[int]:
+        """Live slots ranked by BM25, best first (empty without FTS5)."""
+        terms = tokenize(query_text)
+        if not self._fts or not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        # Reason: over-fetch when filtering, since filtered-out rows are dropped after ranking.
+        fetch = limit if allowed is None else limit * 10
+        ids = [
+            i
+            for (i,) in self._db.execute(
+                "SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                (match, fetch),
+            )
+        ]
+        if not ids:
+            return []
+        slot_of = dict(
+            self._db.execute(
+                f"SELECT id, slot FROM chunks WHERE live = 1 AND id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        )
+        ranked = [slot_of[i] for i in ids if i in slot_of]
+        if allowed is not None:
+            ranked = [s for s in ranked if s < len(allowed) and allowed[s]]
+        return ranked[:limit]
+
@@ -1,13 +1,221 @@
 from __future__ import annotations
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from ..tracing import start_span
 try:
     from pypdf import PdfReader
 except ImportError:
     from PyPDF2 import PdfReader
 
 
+__all__ = [
+    "PdfPage",
+    "count_pdf_pages",
+    "extract_text_from_pdf",
+    "iter_pdf_pages",
+    "shutdown_pdf_pool",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# PDFs with fewer pages than this are extracted in-process; the pool's
+# startup and pickling overhead only pays off for longer documents.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "30"))
+
+
+class PdfPage(NamedTuple):
+    """One extracted page. `number` is 1-based; `error` is set if extraction failed."""
+
+    number: int
+    text: str
+    error: Optional[str] = None
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):  # pragma: no cover - signal handler
+    raise _PageTimeout()
+
+
+def _extract_page(page, timeout: float) -> str:
+    """
+    Extract one page, giving up after `timeout` seconds (0 disables).
+
+    On the main thread (pool workers, scripts) SIGALRM interrupts the
+    extraction. Elsewhere (the ingest pipeline's stage threads) signals are
+    unavailable, so the page is extracted on a helper thread and abandoned
+    at the deadline.
+
+    Limitation: Python cannot kill a thread, so an abandoned extraction keeps
+    running, using a CPU core and keeping its page and the parsed PDF in
+    memory until it returns (for a pathological page, possibly never). Only
+    the pool path, used for PDFs with at least PDF_PARALLEL_MIN_PAGES pages,
+    actually stops a runaway page.
+    """
+    if timeout <= 0:
+        return page.extract_text() or ""
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        return _extract_page_threaded(page, timeout)
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return page.extract_text() or ""
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract_page_threaded(page, timeout: float) -> str:
+    result: Dict[str, Any] = {}
+
+    def run() -> None:
+        try:
+            result["text"] = page.extract_text() or ""
+        except BaseException as e:
+            result["error"] = e
+
+    # Reason: daemon, so an abandoned extraction never blocks interpreter exit.
+    thread = threading.Thread(target=run, name="pdf-page", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        logger.warning("PDF page extraction overran %gs; abandoning it (it keeps running in the background)", timeout)
+        raise _PageTimeout()
+    if "error" in result:
+        raise result["error"]
+    return result["text"]
+
+
+def _extract_range(path: str, start: int, stop: int, timeout: float) -> List[PdfPage]:
+    """Worker task: extract pages [start, stop) of `path` (0-based indices)."""
+    reader = PdfReader(path)
+    out: List[PdfPage] = []
+    for i in range(start, min(stop, len(reader.pages))):
+        try:
+            out.append(PdfPage(i + 1, _extract_page(reader.pages[i], timeout)))
+        except _PageTimeout:
+            out.append(PdfPage(i + 1, "", f"timed out after {timeout:g}s"))
+        except Exception as e:
+            out.append(PdfPage(i + 1, "", f"{type(e).__name__}: {e}"))
+    return out
+
+
+# One pool per worker count. Reason: replacing a pool would cancel the
+# futures of callers still reading from it.
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # Reason: forking a process that runs ingestion threads can deadlock;
+            # forkserver/spawn start clean interpreters instead.
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        return pool
+
+
+def shutdown_pdf_pool() -> None:
+    """Stop the shared extraction process pools, if any were started."""
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def count_pdf_pages(path: str) -> int:
+    """Number of pages in a PDF."""
+    return len(PdfReader(path).pages)
+
+
+def iter_pdf_pages(
+    path: str,
+    workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    page_timeout: Optional[float] = None,
+) -> Iterator[PdfPage]:
+    """
+    Yield the pages of a PDF in order, extracting page ranges in parallel.
+
+    Page ranges are spread across a shared process pool; at most two tasks
+    per worker are in flight, so results stream out without holding the whole
+    document. A page that raises or exceeds `page_timeout` yields empty text
+    with `error` set instead of stalling or failing the file. Called off the
+    main thread, a short PDF (extracted in-process) can only abandon an
+    overrunning page, not stop it; see `_extract_page`.
+
+    Args:
+        path: Path to a PDF file.
+        workers: Process count (default PDF_WORKERS / CPU count); 1 extracts in-process.
+        pages_per_task: Pages per pool task (default spreads pages ~4 tasks per worker).
+        page_timeout: Seconds allowed per page (default PDF_PAGE_TIMEOUT; 0 disables).
+
+    Returns:
+        Iterator of PdfPage(number, text, error).
+    """
+    workers = workers or PDF_WORKERS
+    timeout = PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+    # Reason: not a context-managed span; it would become the consumer's
+    # current span between yields.
+    s = start_span("pdf.extract", workers=workers)
+    error: Optional[BaseException] = None
+    try:
+        for page in _iter_pages(path, workers, pages_per_task, timeout):
+            s.add("pages")
+            if page.error:
+                s.add("page_errors")
+            yield page
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        s.end(error)
+
+
+def _iter_pages(
+    path: str, workers: int, pages_per_task: Optional[int], timeout: float
+) -> Iterator[PdfPage]:
+    n_pages = count_pdf_pages(path)
+    if workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        yield from _extract_range(path, 0, n_pages, timeout)
+        return
+
+    step = pages_per_task or max(1, -(-n_pages // (workers * 4)))
+    ranges = deque((s, s + step) for s in range(0, n_pages, step))
+    pool = _get_pool(workers)
+    in_flight: Deque[Tuple[int, Future]] = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers * 2:
+                start, stop = ranges.popleft()
+                in_flight.append((start, pool.submit(_extract_range, path, start, stop, timeout)))
+            start, future = in_flight.popleft()
+            yield from future.result()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+
 def extract_text_from_pdf(path: str) -> str:
     """
-    Extract text from a PDF using PyPDF2.
+    Extract text from a PDF using pypdf.
 
     Args:
         path: Path to a PDF file.
@@ -15,9 +223,4 @@ def extract_text_from_pdf(path: str) -> str:
     Returns:
         Extracted text as a single string.
     """
-    reader = PdfReader(path)
-    texts = []
-    for page in reader.pages:
-        txt = page.extract_text() or ""
-        texts.append(txt)
-    return "\n".join(texts)
+    return "\n".join(page.text for page in iter_pdf_pages(path))
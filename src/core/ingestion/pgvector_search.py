@@ -0,0 +1,240 @@
+from __future__ import annotations
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from ... import env as _env  # Load environment variables  # noqa: F401
+from ..clients import (
+    close_pg_pool as close_pool,
+    get_async_pg_pool,
+    get_database_url,
+    get_pg_pool as get_pool,
+)
+from ..tracing import span
+from .index_admin import profile_query
+from .quantize import FIRST_PASS_DIMS, RERANK_FACTOR, sql_storage
+
+
+__all__ = [
+    "get_database_url",
+    "get_pool",
+    "close_pool",
+    "pg_similarity_search",
+    "pg_similarity_search_async",
+    "pg_similarity_search_batch",
+    "pg_similarity_search_batch_async",
+    "batch_search_args",
+    "RESULT_COLUMNS",
+    "HYBRID_COLUMNS",
+]
+
+
+# Columns returned by every server-side search path. Embeddings are never selected.
+RESULT_COLUMNS = ("id", "url", "chunk_number", "content", "metadata", "similarity")
+# Hybrid search adds the fused reciprocal-rank score it is ordered by.
+HYBRID_COLUMNS = RESULT_COLUMNS + ("score",)
+# `batch_match_rag_pages` prefixes each row with its query's position.
+BATCH_COLUMNS = ("query_index",) + RESULT_COLUMNS
+
+
+def pg_similarity_search(
+    query_embedding: List[float],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    query_text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run `match_rag_pages` over a pooled psycopg connection.
+
+    Ranking and filtering happen in Postgres; only the top-k rows come back and
+    the embedding column is never transferred. With RAG_SEARCH_PROFILE set,
+    the profile's ef_search / probes are applied to the same transaction.
+
+    Args:
+        query_embedding: Query vector.
+        match_count: Number of rows to return.
+        filter: Optional metadata filter, applied in SQL before the limit.
+        query_text: When given, run `hybrid_match_rag_pages` instead (full-text
+            + vector candidates fused with reciprocal rank fusion).
+
+    With RAG_VECTOR_STORAGE=halfvec/int8/binary, vector-only searches go
+    through `quantized_match_rag_pages` (quantized candidates, exact rerank);
+    with RAG_FIRST_PASS_DIMS, through `adaptive_match_rag_pages` (prefix
+    candidates, full-vector rerank).
+
+    Returns:
+        List of {id, url, chunk_number, content, metadata, similarity} dicts
+        (plus `score` for hybrid searches).
+    """
+    sql, params, columns = _match_query(query_embedding, match_count, filter, query_text)
+    profile = profile_query(match_count=match_count)
+    with span("search.pgvector", hybrid=bool(query_text)) as s:
+        with get_pool().connection() as conn, _profiled(conn, profile):
+            cur = conn.execute(sql, params)
+            rows = cur.fetchall()
+        s.add("rows", len(rows))
+    return [dict(zip(columns, row)) for row in rows]
+
+
+async def pg_similarity_search_async(
+    query_embedding: List[float],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    query_text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Async `pg_similarity_search` over the event loop's `AsyncConnectionPool`.
+    """
+    sql, params, columns = _match_query(query_embedding, match_count, filter, query_text)
+    profile = profile_query(match_count=match_count)
+    with span("search.pgvector", hybrid=bool(query_text)) as s:
+        pool = await get_async_pg_pool()
+        async with pool.connection() as conn, _aprofiled(conn, profile):
+            cur = await conn.execute(sql, params)
+            rows = await cur.fetchall()
+        s.add("rows", len(rows))
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def pg_similarity_search_batch(
+    query_embeddings: Sequence[List[float]],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search for many query vectors in one round trip (`batch_match_rag_pages`).
+
+    Every query gets the same search `pg_similarity_search` would run
+    (plain, quantized or two-stage), with one filter and `match_count`.
+
+    Args:
+        query_embeddings: Query vectors.
+        match_count: Rows per query.
+        filter: Optional filter shared by every query.
+
+    Returns:
+        One result list per query, in input order.
+    """
+    if not query_embeddings:
+        return []
+    sql, params = _batch_query(query_embeddings, match_count, filter)
+    profile = profile_query(match_count=match_count)
+    with span("search.pgvector_batch", queries=len(query_embeddings)) as s:
+        with get_pool().connection() as conn, _profiled(conn, profile):
+            rows = conn.execute(sql, params).fetchall()
+        s.add("rows", len(rows))
+    return _group(rows, len(query_embeddings))
+
+
+async def pg_similarity_search_batch_async(
+    query_embeddings: Sequence[List[float]],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Async `pg_similarity_search_batch` over the event loop's `AsyncConnectionPool`.
+    """
+    if not query_embeddings:
+        return []
+    sql, params = _batch_query(query_embeddings, match_count, filter)
+    profile = profile_query(match_count=match_count)
+    with span("search.pgvector_batch", queries=len(query_embeddings)) as s:
+        pool = await get_async_pg_pool()
+        async with pool.connection() as conn, _aprofiled(conn, profile):
+            cur = await conn.execute(sql, params)
+            rows = await cur.fetchall()
+        s.add("rows", len(rows))
+    return _group(rows, len(query_embeddings))
+
+
+@contextmanager
+def _profiled(conn, profile: Optional[Tuple[str, Tuple[Any, ...]]]) -> Iterator[None]:
+    """Apply the search profile in a transaction the search then runs in."""
+    if not profile:
+        yield
+        return
+    # Reason: pool connections are autocommit and set_config(..., true) is
+    # transaction-local, so without an explicit transaction the setting is
+    # gone before the search statement runs.
+    with conn.transaction():
+        conn.execute(*profile)
+        yield
+
+
+@asynccontextmanager
+async def _aprofiled(conn, profile: Optional[Tuple[str, Tuple[Any, ...]]]) -> AsyncIterator[None]:
+    """Async `_profiled`."""
+    if not profile:
+        yield
+        return
+    async with conn.transaction():
+        await conn.execute(*profile)
+        yield
+
+
+def batch_search_args() -> Tuple[Optional[str], int, int]:
+    """(storage, first_pass_dims, rerank_factor) for `batch_match_rag_pages`."""
+    storage = sql_storage()
+    return storage, 0 if storage else FIRST_PASS_DIMS, RERANK_FACTOR
+
+
+def _batch_query(
+    query_embeddings: Sequence[List[float]],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+) -> Tuple[str, Tuple[Any, ...]]:
+    import numpy as np
+    from psycopg.types.json import Jsonb
+
+    sql = (
+        f"SELECT {', '.join(BATCH_COLUMNS)} "
+        "FROM batch_match_rag_pages(%s::vector[], %s, %s, %s, %s, %s)"
+    )
+    vectors = [np.asarray(e, dtype=np.float32) for e in query_embeddings]
+    return sql, (vectors, int(match_count), Jsonb(filter or {})) + batch_search_args()
+
+
+def _group(rows: Sequence[Sequence[Any]], n: int) -> List[List[Dict[str, Any]]]:
+    out: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+    for row in rows:
+        out[row[0]].append(dict(zip(RESULT_COLUMNS, row[1:])))
+    return out
+
+
+def _match_query(
+    query_embedding: List[float],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    query_text: Optional[str] = None,
+) -> Tuple[str, Tuple[Any, ...], Tuple[str, ...]]:
+    import numpy as np
+    from psycopg.types.json import Jsonb
+
+    params: Tuple[Any, ...] = (
+        np.asarray(query_embedding, dtype=np.float32),
+        int(match_count),
+        Jsonb(filter or {}),
+    )
+    if query_text:
+        sql = (
+            f"SELECT {', '.join(HYBRID_COLUMNS)} "
+            "FROM hybrid_match_rag_pages(%s, %s, %s, %s, %s)"
+        )
+        candidates = max(4 * int(match_count), 20)
+        return sql, (query_text,) + params + (candidates,), HYBRID_COLUMNS
+    storage = sql_storage()
+    if storage:
+        sql = (
+            f"SELECT {', '.join(RESULT_COLUMNS)} "
+            "FROM quantized_match_rag_pages(%s, %s, %s, %s, %s)"
+        )
+        return sql, params + (storage, RERANK_FACTOR), RESULT_COLUMNS
+    if FIRST_PASS_DIMS:
+        sql = (
+            f"SELECT {', '.join(RESULT_COLUMNS)} "
+            "FROM adaptive_match_rag_pages(%s, %s, %s, %s, %s)"
+        )
+        return sql, params + (FIRST_PASS_DIMS, RERANK_FACTOR), RESULT_COLUMNS
+    sql = (
+        f"SELECT {', '.join(RESULT_COLUMNS)} "
+        "FROM match_rag_pages(%s, %s, %s)"
+    )
+    return sql, params, RESULT_COLUMNS
@@ -0,0 +1,497 @@
+from __future__ import annotations
+import contextvars
+import hashlib
+import queue
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..tracing import span
+from .chunking import simple_chunk_bounds, stream_chunk_spans
+from .ingest_commit import IngestCheckpoint, UpsertBatcher
+from .pdf_text import extract_text_from_pdf, iter_pdf_pages
+
+
+__all__ = [
+    "IngestPipeline",
+    "IngestProgress",
+    "IngestCancelled",
+    "IngestCheckpoint",
+    "UpsertBatcher",
+    "load_text_from_file",
+    "iter_text_from_file",
+    "iter_file_segments",
+    "CHUNKERS",
+    "content_hash",
+    "chunk_hash",
+    "file_fingerprint",
+]
+
+
+_DONE = object()
+
+# "structure" breaks at paragraphs/sentences/words; "simple" at fixed offsets.
+CHUNKERS = ("structure", "simple")
+
+Segment = Tuple[Optional[int], str]
+
+
+def load_text_from_file(path: Path) -> str:
+    """Return extracted text for TXT or PDF."""
+    if path.suffix.lower() == ".pdf":
+        return extract_text_from_pdf(str(path))
+    return path.read_text(encoding="utf-8", errors="ignore")
+
+
+def iter_text_from_file(path: Path, block_chars: int = 1 << 20) -> Iterator[str]:
+    """Read a TXT file in blocks of `block_chars` characters instead of whole."""
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for block in iter(lambda: f.read(block_chars), ""):
+            yield block
+
+
+def iter_file_segments(path: Path) -> Iterator[Segment]:
+    """
+    Yield a file's text as (page_number, text) segments.
+
+    PDF pages are yielded one by one, each followed by a newline (the same
+    text as `extract_text_from_pdf` plus a trailing newline); TXT files are
+    streamed in blocks with page None.
+    """
+    if path.suffix.lower() == ".pdf":
+        for page in iter_pdf_pages(str(path)):
+            yield page.number, page.text + "\n"
+        return
+    for block in iter_text_from_file(path):
+        yield None, block
+
+
+def content_hash(text: str) -> str:
+    """sha256 of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_hash(text: str, source: str, page: Optional[int] = None) -> str:
+    """
+    sha256 stored as a row's `chunk_hash`: its text plus the other fields
+    the row is written with (source label, page).
+
+    Incremental runs skip a chunk only when this matches, so a relabelled
+    file or text that moved to another page is rewritten, not left with
+    stale `source` / `metadata.page` values.
+    """
+    return content_hash(f"{source}\0{'' if page is None else page}\0{text}")
+
+
+def file_fingerprint(
+    path: Path, source: str, max_chars: int, overlap: int, chunker: str = "structure"
+) -> str:
+    """
+    sha256 over the file bytes plus everything that shapes its rows.
+
+    A changed source label or chunking setting yields a new fingerprint, so
+    the file is re-chunked even if its bytes did not change.
+    """
+    h = hashlib.sha256(f"{source}\0{max_chars}\0{overlap}\0{chunker}\0".encode("utf-8"))
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@dataclass
+class IngestProgress:
+    """Counters reported to the progress callback as the pipeline runs."""
+
+    files_total: int = 0
+    files_done: int = 0
+    files_skipped: int = 0
+    chunks_embedded: int = 0
+    rows_committed: int = 0
+    batches_committed: int = 0
+    current_file: Optional[str] = None
+    # Path -> "done" | "skipped" | "missing" for files that have settled.
+    file_status: Dict[str, str] = field(default_factory=dict)
+
+
+class IngestCancelled(RuntimeError):
+    """Raised by `IngestPipeline.run` when its cancel event is set mid-run."""
+
+
+@dataclass
+class _FileWork:
+    """
+    One planned file: where it came from and what is already stored for it.
+
+    Attributes:
+        path: File on disk.
+        url: Stable `file://` URL the rows are keyed by.
+        label: Source label stored in metadata.
+        file_hash: Content fingerprint (see `file_fingerprint`).
+        existing: Stored {chunk_number: hashes} when ingesting incrementally.
+        segments: (page, text) pieces, filled in by the extract stage.
+    """
+
+    path: Path
+    url: str
+    label: str
+    file_hash: str
+    existing: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    segments: Optional[Iterable[Segment]] = None
+
+
+@dataclass
+class _Unit:
+    """A slice of one file's rows travelling through the embed/upsert stages."""
+
+    work: _FileWork
+    rows: List[Dict[str, Any]]
+    last: bool
+    stale_from: Optional[int] = None
+    # Chunk 0, which records the file hash; upserted after the rest of the
+    # file's rows and its tail delete.
+    marker: Optional[Dict[str, Any]] = None
+
+    @property
+    def all_rows(self) -> List[Dict[str, Any]]:
+        """Rows to embed and upsert, marker last."""
+        return self.rows + [self.marker] if self.marker else self.rows
+
+
+class IngestPipeline:
+    """
+    extract -> chunk -> embed -> upsert, connected by bounded queues.
+
+    Each stage runs in its own thread, so extracting and chunking one file
+    overlaps with embedding and upserting the rows before it. Files travel
+    as lazy page / block streams, read as they are chunked, and queue sizes
+    bound how many rows and embeddings are in flight, keeping peak memory
+    flat regardless of file or corpus size. Units from consecutive files are
+    handed to the embed stage together, up to `embed_batch_rows` rows, so a
+    folder of small files costs a few embedding calls rather than one per
+    file. A file counts as committed once
+    all of its rows have been flushed; committed files are recorded in the
+    checkpoint so a rerun resumes after them. Chunk 0 carries the
+    `file_hash` incremental runs skip on, so it is upserted last, after the
+    file's stale tail is deleted: a run that dies mid-file is redone in full
+    on the next one.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        upsert_fn: Callable[[List[Dict[str, Any]]], None],
+        fetch_hashes_fn: Optional[Callable[[str], Dict[int, Dict[str, Any]]]] = None,
+        delete_tail_fn: Optional[Callable[[str, int], None]] = None,
+        source: Optional[str] = None,
+        max_chars: int = 1200,
+        overlap: int = 150,
+        chunker: str = "structure",
+        incremental: bool = False,
+        embed_batch_rows: int = 256,
+        max_batch_rows: int = 500,
+        max_batch_bytes: int = 8 * 1024 * 1024,
+        queue_size: int = 4,
+        checkpoint_path: Optional[str] = None,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.fetch_hashes_fn = fetch_hashes_fn
+        self.delete_tail_fn = delete_tail_fn
+        self.source = source
+        self.max_chars = max_chars
+        self.overlap = overlap
+        if chunker not in CHUNKERS:
+            raise ValueError(f"Unknown chunker: {chunker!r} (expected one of {CHUNKERS})")
+        self.chunker = chunker
+        self.incremental = incremental
+        self.embed_batch_rows = max(1, embed_batch_rows)
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_bytes = max_batch_bytes
+        self.queue_size = max(1, queue_size)
+        self.checkpoint = IngestCheckpoint(checkpoint_path)
+        self.on_progress = on_progress
+        self.progress = IngestProgress()
+        self.cancel_event = cancel_event or threading.Event()
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    # -- stage helpers -------------------------------------------------
+
+    def _halted(self) -> bool:
+        return self._stop.is_set() or self.cancel_event.is_set()
+
+    def _put(self, q: "queue.Queue[Any]", item: Any) -> bool:
+        while not self._halted():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue[Any]") -> Any:
+        while not self._halted():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(self, fn: Callable[[], None], out: "queue.Queue[Any]") -> threading.Thread:
+        def run() -> None:
+            try:
+                fn()
+            except BaseException as e:  # surfaced in run()
+                self._errors.append(e)
+                self._stop.set()
+            finally:
+                try:
+                    out.put_nowait(_DONE)
+                except queue.Full:
+                    self._put(out, _DONE)
+
+        # Reason: stages run in the caller's context so their spans join its trace.
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+        thread.start()
+        return thread
+
+    def _report(self) -> None:
+        if self.on_progress:
+            self.on_progress(self.progress)
+
+    # -- stages --------------------------------------------------------
+
+    def _plan(self, paths: Sequence[str]) -> Iterator[_FileWork]:
+        for p in paths:
+            path = Path(p)
+            if not path.exists() or not path.is_file():
+                self.progress.file_status[str(path)] = "missing"
+                continue
+            label = self.source or path.name
+            # Use file:// URL format for uniqueness per file
+            url = f"file://{path.resolve()}"
+            fingerprint = file_fingerprint(path, label, self.max_chars, self.overlap, self.chunker)
+            work = _FileWork(path, url, label, fingerprint)
+            if f"{url}#{work.file_hash}" in self.checkpoint:
+                self.progress.files_skipped += 1
+                self.progress.file_status[str(path)] = "skipped"
+                continue
+            if self.incremental and self.fetch_hashes_fn is not None:
+                work.existing = self.fetch_hashes_fn(url)
+                if work.existing.get(0, {}).get("file_hash") == work.file_hash:
+                    self.progress.files_skipped += 1
+                    self.progress.file_status[str(path)] = "skipped"
+                    continue
+            yield work
+
+    def _extract(self, paths: Sequence[str], out: "queue.Queue[Any]") -> None:
+        for work in self._plan(paths):
+            # Reason: a lazy stream for PDFs too, so queued files hold no text;
+            # `iter_pdf_pages` already extracts a few pages ahead in its pool,
+            # which keeps parsing overlapped with chunking and embedding.
+            work.segments = iter_file_segments(work.path)
+            if not self._put(out, work):
+                return
+
+    def _iter_chunks(self, work: _FileWork) -> Iterator[Tuple[int, str, Optional[int]]]:
+        """Yield (chunk_number, text, page) for one file using the configured chunker."""
+        segments = work.segments or ()
+        work.segments = None
+        if self.chunker == "structure":
+            for span, chunk in stream_chunk_spans(segments, self.max_chars, self.overlap):
+                yield span.chunk_number, chunk, span.page
+            return
+        parts: List[str] = []
+        page_starts: List[int] = []
+        offset = 0
+        for page, piece in segments:
+            if page is not None:
+                page_starts.append(offset)
+            parts.append(piece)
+            offset += len(piece)
+        text = "".join(parts)
+        for i, (start, end) in enumerate(simple_chunk_bounds(text, self.max_chars, self.overlap)):
+            page = bisect_right(page_starts, start) if page_starts else None
+            yield i, text[start:end], page
+
+    def _chunk(self, inp: "queue.Queue[Any]", out: "queue.Queue[Any]") -> None:
+        # Units (possibly of several files) waiting to go to the embed stage.
+        batch: List[_Unit] = []
+        batch_rows = 0
+
+        def emit(unit: _Unit) -> bool:
+            nonlocal batch_rows
+            batch.append(unit)
+            batch_rows += len(unit.all_rows)
+            return batch_rows < self.embed_batch_rows or flush()
+
+        def flush() -> bool:
+            nonlocal batch, batch_rows
+            if not batch:
+                return True
+            units, batch, batch_rows = batch, [], 0
+            return self._put(out, units)
+
+        while True:
+            # Reason: hand on what is batched as soon as the embed stage has
+            # nothing queued, so merging never keeps it idle; while it is busy,
+            # files keep accumulating into the next call.
+            if batch and out.empty() and not flush():
+                return
+            try:
+                work = inp.get(timeout=0.01 if batch else 0.1)
+            except queue.Empty:
+                if self._halted():
+                    return
+                continue
+            if work is _DONE:
+                flush()
+                return
+            rows: List[Dict[str, Any]] = []
+            marker: Optional[Dict[str, Any]] = None
+            n_chunks = 0
+            for i, chunk, page in self._iter_chunks(work):
+                n_chunks = i + 1
+                row_hash = chunk_hash(chunk, work.label, page)
+                if i and self.incremental and work.existing.get(i, {}).get("chunk_hash") == row_hash:
+                    # Reason: unchanged chunks keep their row and embedding. Chunk 0
+                    # is always rewritten so it records the new file hash.
+                    continue
+                metadata = {
+                    "source": work.label,
+                    "chunk_hash": row_hash,
+                    "file_hash": work.file_hash,
+                }
+                if page is not None:
+                    metadata["page"] = page
+                row = {
+                    "url": work.url,
+                    "source": work.label,
+                    "chunk_number": i,
+                    "content": chunk,
+                    "metadata": metadata,
+                }
+                if i == 0:
+                    marker = row
+                    continue
+                rows.append(row)
+                if batch_rows + len(rows) >= self.embed_batch_rows:
+                    # Reason: hand full batches on while the file is still being
+                    # chunked, so a large file never sits in memory as rows.
+                    if not emit(_Unit(work, rows, last=False)):
+                        return
+                    rows = []
+            stale_from = None
+            if not self.incremental or len(work.existing) > n_chunks:
+                stale_from = n_chunks
+            if not emit(_Unit(work, rows, last=True, stale_from=stale_from, marker=marker)):
+                return
+
+    def _embed(self, inp: "queue.Queue[Any]", out: "queue.Queue[Any]") -> None:
+        while True:
+            units = self._get(inp)
+            if units is _DONE:
+                return
+            rows = [row for unit in units for row in unit.all_rows]
+            if rows:
+                # One call for every unit in the batch; rows are filled in
+                # place, so each unit keeps its own vectors.
+                embs = self.embed_fn([r["content"] for r in rows])
+                for row, emb in zip(rows, embs):
+                    row["embedding"] = emb
+                self.progress.chunks_embedded += len(rows)
+            if not self._put(out, units):
+                return
+
+    # -- driver --------------------------------------------------------
+
+    def run(self, paths: Sequence[str]) -> int:
+        """
+        Ingest `paths` and return the number of rows upserted.
+
+        Setting `cancel_event` stops every stage; rows of files that were not
+        fully committed are not flushed, so a rerun with the same checkpoint
+        resumes after the last committed file.
+
+        Raises:
+            IngestCancelled: If `cancel_event` was set.
+            The first exception raised by any stage.
+        """
+        with span("ingest", files=len(paths)) as s:
+            rows = self._run(paths)
+            s.add("rows", rows)
+        return rows
+
+    def _run(self, paths: Sequence[str]) -> int:
+        self.progress = IngestProgress(files_total=len(paths))
+        self._stop = threading.Event()
+        self._errors = []
+        texts: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        units: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        embedded: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            self._stage(lambda: self._extract(paths, texts), texts),
+            self._stage(lambda: self._chunk(texts, units), units),
+            self._stage(lambda: self._embed(units, embedded), embedded),
+        ]
+
+        batcher = UpsertBatcher(self.upsert_fn, self.max_batch_rows, self.max_batch_bytes)
+        # Files whose last rows are buffered but not yet flushed.
+        pending: List[_Unit] = []
+
+        def commit_pending() -> None:
+            keys = []
+            for unit in pending:
+                keys.append(f"{unit.work.url}#{unit.work.file_hash}")
+                self.progress.files_done += 1
+                self.progress.file_status[str(unit.work.path)] = "done"
+            pending.clear()
+            self.checkpoint.mark(keys)
+            self.progress.rows_committed = batcher.rows_committed
+            self.progress.batches_committed = batcher.batches_committed
+            self._report()
+
+        try:
+            while True:
+                units = self._get(embedded)
+                if units is _DONE:
+                    break
+                for unit in units:
+                    self.progress.current_file = str(unit.work.path)
+                    if unit.last and unit.stale_from is not None and self.delete_tail_fn is not None:
+                        # Reason: the tail lies past the file's new end, so it can go
+                        # before the file's rows; it must go before its marker.
+                        self.delete_tail_fn(unit.work.url, unit.stale_from)
+                    # Reason: flushes run in order and each is one upsert, so the
+                    # marker (last in `all_rows`) commits after the file's other rows.
+                    flushed = batcher.add(unit.all_rows)
+                    if flushed:
+                        # A flush sends every buffered row, so all files that
+                        # finished before this unit are now committed.
+                        commit_pending()
+                    if unit.last:
+                        pending.append(unit)
+                        if flushed and not batcher.pending_rows:
+                            commit_pending()
+            if not self._errors and not self.cancel_event.is_set():
+                batcher.flush()
+                commit_pending()
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join(timeout=5)
+        if self._errors:
+            raise self._errors[0]
+        if self.cancel_event.is_set():
+            raise IngestCancelled(
+                f"cancelled after {self.progress.files_done} of {self.progress.files_total} files"
+            )
+        return batcher.rows_committed
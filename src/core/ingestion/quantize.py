@@ -0,0 +1,205 @@
+from __future__ import annotations
+import os
+import tempfile
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+__all__ = [
+    "STORAGE_MODES",
+    "VECTOR_STORAGE",
+    "RERANK_FACTOR",
+    "FIRST_PASS_DIMS",
+    "QuantizedMatrix",
+    "sql_storage",
+]
+
+
+# float32: full precision; halfvec: float16 (2x smaller); int8: per-row scaled
+# int8 (4x); binary: sign bits (32x), searched by Hamming distance and rescored
+# exactly against float32 vectors kept in a memory-mapped temp file.
+STORAGE_MODES = ("float32", "halfvec", "int8", "binary")
+VECTOR_STORAGE = os.getenv("RAG_VECTOR_STORAGE", "float32").lower()
+# Candidates per result taken from the quantized ranking before the rescore.
+RERANK_FACTOR = int(os.getenv("RAG_RERANK_FACTOR", "10"))
+# Two-stage (Matryoshka) search: rank by the first N dims, rerank with all of
+# them. 0 disables. Only meaningful for models trained for truncation, such
+# as text-embedding-3-*.
+FIRST_PASS_DIMS = int(os.getenv("RAG_FIRST_PASS_DIMS", "0"))
+
+# Rows widened to float32 per block; small enough that the buffer stays in cache.
+_WIDEN_ROWS = 256
+# Rows per block of Hamming distances.
+_BLOCK_ROWS = 16384
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def sql_storage(storage: Optional[str] = None) -> Optional[str]:
+    """
+    Quantized layout `quantized_match_rag_pages` should search, or None for float32.
+
+    pgvector has no int8 type, so int8 uses the halfvec index in Postgres.
+    """
+    storage = _check(storage)
+    if storage == "float32":
+        return None
+    return "binary" if storage == "binary" else "halfvec"
+
+
+def _check(storage: Optional[str]) -> str:
+    storage = (storage or VECTOR_STORAGE).lower()
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown vector storage {storage!r}; expected one of {STORAGE_MODES}")
+    return storage
+
+
+def _popcount_rows(x: np.ndarray) -> np.ndarray:
+    count = getattr(np, "bitwise_count", None)
+    bits = count(x) if count is not None else _POPCOUNT[x]
+    return bits.sum(axis=-1, dtype=np.int32)
+
+
+class QuantizedMatrix:
+    """
+    Growable matrix of L2-normalized vectors in one of STORAGE_MODES.
+
+    Scores are cosine similarities against float32 queries. int8 and halfvec
+    codes are widened block by block, so memory stays at the code size.
+    Binary codes are ranked by Hamming distance (`scores` returns the
+    implied cosine, 1 - 2 * hamming / dim); `rescore` then computes the
+    exact cosine against the full float32 vectors, like the SQL rerank.
+    Those live in a memory-mapped temp file (under TMPDIR), so only the
+    candidate rows are paged in and resident memory stays near the code
+    size; `full_nbytes` reports the file's size.
+    """
+
+    def __init__(self, storage: Optional[str] = None):
+        self.storage = _check(storage)
+        self.dim = 0
+        self._codes = np.empty((0, 0), dtype=self._dtype)
+        # Per-row dequantization scale (int8 only).
+        self._scales = np.empty(0, dtype=np.float32)
+        # Full-precision rows for the exact rescore (binary only), memory-mapped.
+        self._full = np.empty((0, 0), dtype=np.float32)
+
+    @property
+    def _dtype(self):
+        return {"float32": np.float32, "halfvec": np.float16, "int8": np.int8, "binary": np.uint8}[self.storage]
+
+    @property
+    def needs_rescore(self) -> bool:
+        return self.storage == "binary"
+
+    @property
+    def capacity(self) -> int:
+        return self._codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory by the codes (and int8 scales)."""
+        return self._codes.nbytes + self._scales.nbytes
+
+    @property
+    def full_nbytes(self) -> int:
+        """Bytes of the memory-mapped float32 copy binary storage rescores against."""
+        return self._full.nbytes
+
+    def bytes_per_vector(self, dim: Optional[int] = None) -> int:
+        dim = dim or self.dim
+        return {
+            "float32": 4 * dim,
+            "halfvec": 2 * dim,
+            "int8": dim + 4,
+            "binary": (dim + 7) // 8,
+        }[self.storage]
+
+    def _width(self, dim: int) -> int:
+        return (dim + 7) // 8 if self.storage == "binary" else dim
+
+    def resize(self, capacity: int, dim: int, keep: int) -> None:
+        """Reallocate to `capacity` rows of `dim`, keeping the first `keep` rows."""
+        codes = np.zeros((capacity, self._width(dim)), dtype=self._dtype)
+        scales = np.zeros(capacity if self.storage == "int8" else 0, dtype=np.float32)
+        full = self._full
+        if self.storage == "binary" and capacity and dim:
+            # Reason: the file is unlinked at creation; the mapping keeps it alive
+            # until the array is dropped.
+            with tempfile.TemporaryFile(prefix="rag-rescore-") as f:
+                full = np.memmap(f, dtype=np.float32, mode="w+", shape=(capacity, dim))
+        if keep:
+            codes[:keep] = self._codes[:keep]
+            scales[:keep] = self._scales[:keep]
+            if full is not self._full:
+                full[:keep] = self._full[:keep]
+        self._codes, self._scales, self._full, self.dim = codes, scales, full, dim
+
+    def assign(self, positions: np.ndarray, vectors: np.ndarray) -> None:
+        """Store normalized `vectors` at `positions` (later duplicates win)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if positions.size > 1:
+            _, last = np.unique(positions[::-1], return_index=True)
+            keep = positions.size - 1 - last
+            positions, vectors = positions[keep], vectors[keep]
+        if self.storage == "int8":
+            scale = np.abs(vectors).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            self._codes[positions] = np.round(vectors / scale[:, None]).astype(np.int8)
+            self._scales[positions] = scale
+        elif self.storage == "binary":
+            self._codes[positions] = np.packbits(vectors > 0, axis=1)
+            self._full[positions] = vectors
+        else:
+            self._codes[positions] = vectors
+
+    def decode(self, n: int) -> np.ndarray:
+        """Float32 reconstruction of the first `n` rows (exact for float32 and binary)."""
+        return self._widen(0, n)
+
+    def _widen(self, start: int, stop: int, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self._codes[positions] if positions is not None else self._codes[start:stop]
+        if self.storage == "int8":
+            scales = self._scales[positions] if positions is not None else self._scales[start:stop]
+            return codes.astype(np.float32) * scales[:, None]
+        if self.storage == "binary":
+            full = self._full[positions] if positions is not None else self._full[start:stop]
+            return np.asarray(full, dtype=np.float32)
+        return codes.astype(np.float32, copy=False)
+
+    def scores(self, queries: np.ndarray, n: int) -> np.ndarray:
+        """
+        Similarity of each normalized query to the first `n` rows, (m x n) float32.
+        """
+        queries = np.atleast_2d(queries)
+        if self.storage == "float32":
+            return queries @ self._codes[:n].T
+        if self.storage == "binary":
+            packed = np.packbits(queries > 0, axis=1)
+            out = np.empty((queries.shape[0], n), dtype=np.float32)
+            for qi in range(queries.shape[0]):
+                for start in range(0, n, _BLOCK_ROWS):
+                    stop = min(n, start + _BLOCK_ROWS)
+                    dist = _popcount_rows(self._codes[start:stop] ^ packed[qi])
+                    out[qi, start:stop] = 1.0 - 2.0 * dist / self.dim
+            return out
+        out = np.empty((queries.shape[0], n), dtype=np.float32)
+        buf = np.empty((_WIDEN_ROWS, self.dim), dtype=np.float32)
+        for start in range(0, n, _WIDEN_ROWS):
+            stop = min(n, start + _WIDEN_ROWS)
+            block = buf[: stop - start]
+            np.copyto(block, self._codes[start:stop], casting="unsafe")
+            out[:, start:stop] = queries @ block.T
+        if self.storage == "int8":
+            # Reason: scaling the scores is cheaper than dequantizing the codes.
+            out *= self._scales[:n]
+        return out
+
+    def rescore(self, query: np.ndarray, positions: Sequence[int]) -> np.ndarray:
+        """
+        Scores of one normalized query against candidate `positions`: exact
+        cosine for float32 and binary, the dequantized codes otherwise.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if not positions.size:
+            return np.empty(0, dtype=np.float32)
+        return self._widen(0, 0, positions) @ query
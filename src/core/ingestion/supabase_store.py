@@ -1,12 +1,58 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
+import asyncio
+import logging
 import os
-from supabase import create_client, Client
+from supabase import Client
 from ... import env as _env  # Load environment variables  # noqa: F401
+from ..clients import get_supabase_client
+from ..tracing import span
+from .corpus import bump_corpus_version
+from .filters import validate_filter
+from .lexical import HYBRID_SEARCH
+from .local_index_search import (  # noqa: F401  (re-exported for existing callers)
+    get_local_index,
+    local_search,
+    local_search_batch,
+    similarity_search_rag_pages,
+)
+from .quantize import FIRST_PASS_DIMS, RERANK_FACTOR, sql_storage
+from .pgvector_search import (
+    HYBRID_COLUMNS,
+    RESULT_COLUMNS,
+    batch_search_args,
+    get_database_url,
+    pg_similarity_search,
+    pg_similarity_search_async,
+    pg_similarity_search_batch,
+    pg_similarity_search_batch_async,
+)
 
 
-__all__ = ["SupabaseConfig", "get_client", "upsert_chunks", "similarity_search", "similarity_search_rag_pages"]
+__all__ = [
+    "SupabaseConfig",
+    "get_client",
+    "upsert_chunks",
+    "fetch_chunk_hashes",
+    "delete_chunks_from",
+    "count_chunks",
+    "similarity_search",
+    "similarity_search_async",
+    "similarity_search_batch",
+    "similarity_search_batch_async",
+    "similarity_search_rag_pages",
+    "get_local_index",
+]
+
+
+# The Python-side full table scan is only used when explicitly requested.
+ALLOW_FULL_SCAN = os.getenv("RAG_ALLOW_FULL_SCAN", "").lower() in ("1", "true", "yes")
+# Serve searches from the resident in-process index (`local_index_search`)
+# before going to Postgres.
+USE_LOCAL_INDEX = os.getenv("RAG_LOCAL_INDEX", "").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -16,6 +62,7 @@ class SupabaseConfig:
 
 
 def get_client(url: Optional[str] = None, key: Optional[str] = None) -> Client:
+    """Return the shared, connection-pooled Supabase client for these credentials."""
     url = url or os.getenv("SUPABASE_URL")
     # Prefer service role for write operations; fall back to anon. Also allow legacy SUPABASE_KEY.
     key = (
@@ -28,7 +75,7 @@ def get_client(url: Optional[str] = None, key: Optional[str] = None) -> Client:
         raise RuntimeError(
             "Missing Supabase credentials. Set SUPABASE_URL and either SUPABASE_SERVICE_ROLE_KEY (for writes) or SUPABASE_ANON_KEY."
         )
-    return create_client(url, key)
+    return get_supabase_client(url, key)
 
 
 def upsert_chunks(
@@ -37,7 +84,7 @@ def upsert_chunks(
     conflict_target: str = "url,chunk_number",
 ) -> None:
     """
-    Bulk upsert chunk rows into Supabase.
+    Bulk upsert chunk rows into Supabase and bump the corpus version.
 
     Each row should include: url, chunk_number, content, metadata, embedding
     """
@@ -46,110 +93,345 @@ def upsert_chunks(
     sb = get_client()
     # Supabase Python client upsert requires specifying 'on_conflict'
     try:
-        sb.table(table).upsert(rows, on_conflict=conflict_target).execute()
+        with span("supabase.upsert", table=table, rows=len(rows)):
+            sb.table(table).upsert(rows, on_conflict=conflict_target).execute()
     except Exception as e:
         # Common cause: using anon key for write while RLS forbids it
         raise RuntimeError(
             "Failed to upsert chunks. Ensure SUPABASE_SERVICE_ROLE_KEY is set in your .env (writes require service role)."
         ) from e
+    bump_corpus_version(r["url"] for r in rows)
 
 
-def similarity_search_rag_pages(
+def fetch_chunk_hashes(url: str, table: str = "rag_pages") -> Dict[int, Dict[str, Any]]:
+    """
+    Return the stored hashes for every chunk of one document.
+
+    Args:
+        url: Document URL.
+        table: Table name.
+
+    Returns:
+        {chunk_number: {"chunk_hash": ..., "file_hash": ...}} (values may be None for legacy rows).
+    """
+    sb = get_client()
+    resp = sb.table(table).select("chunk_number,metadata").eq("url", url).execute()
+    out: Dict[int, Dict[str, Any]] = {}
+    for r in resp.data or []:
+        meta = r.get("metadata") or {}
+        out[int(r["chunk_number"])] = {
+            "chunk_hash": meta.get("chunk_hash"),
+            "file_hash": meta.get("file_hash"),
+        }
+    return out
+
+
+def delete_chunks_from(url: str, first_stale: int, table: str = "rag_pages") -> None:
+    """
+    Delete every chunk of `url` with chunk_number >= first_stale in one statement
+    and bump the corpus version.
+
+    Args:
+        url: Document URL.
+        first_stale: First chunk_number to remove (the new chunk count).
+        table: Table name.
+    """
+    sb = get_client()
+    try:
+        sb.table(table).delete().eq("url", url).gte("chunk_number", first_stale).execute()
+    except Exception as e:
+        raise RuntimeError(
+            "Failed to delete stale chunks. Ensure SUPABASE_SERVICE_ROLE_KEY is set in your .env (writes require service role)."
+        ) from e
+    bump_corpus_version([url])
+
+
+def count_chunks(table: str = "rag_pages") -> int:
+    """Number of rows in `table` (exact count, no rows transferred)."""
+    resp = get_client().table(table).select("id", count="exact").limit(1).execute()
+    return int(resp.count or 0)
+
+
+def _rpc_similarity_search(
     query_embedding: List[float],
     match_count: int = 5,
     filter: Optional[Dict[str, Any]] = None,
+    query_text: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Search for similar chunks directly in the rag_pages table.
+    Call `match_rag_pages` through the Supabase REST API; `hybrid_match_rag_pages`
+    when `query_text` is given, `quantized_match_rag_pages` under a quantized
+    RAG_VECTOR_STORAGE, `adaptive_match_rag_pages` with RAG_FIRST_PASS_DIMS.
     """
     sb = get_client()
-    
-    try:
-        # Get all documents from rag_pages and compute similarity in Python
-        # This is less efficient but works around the RPC/direct query issues
-        query = sb.table("rag_pages").select("*")
-        
-        # Apply filter if provided
-        if filter:
-            for key, value in filter.items():
-                query = query.eq(key, value)
-        
-        result = query.execute()
-        
-        if not result.data:
-            return []
-        
-        # Compute cosine similarity in Python
-        import numpy as np
-        
-        results_with_similarity = []
-        query_emb = np.array(query_embedding)
-        query_norm = np.linalg.norm(query_emb)
-        
-        for row in result.data:
-            if row.get('embedding'):
-                # Handle different embedding formats
-                embedding = row['embedding']
-                if isinstance(embedding, str):
-                    # Parse string representation of array
-                    try:
-                        # Remove 'np.str_(' prefix and ')' suffix if present
-                        if embedding.startswith("np.str_('") and embedding.endswith("')"):
-                            embedding = embedding[9:-2]  # Remove np.str_(' and ')
-                        elif embedding.startswith('[') and embedding.endswith(']'):
-                            # It's already a string representation of a list
-                            pass
-                        else:
-                            # Add brackets if missing
-                            embedding = f"[{embedding}]"
-                        
-                        # Parse as JSON array
-                        import json
-                        try:
-                            embedding_list = json.loads(embedding)
-                        except json.JSONDecodeError:
-                            # Try alternative parsing for malformed JSON
-                            embedding = embedding.replace('np.str_(', '').replace(')', '')
-                            if not embedding.startswith('['):
-                                embedding = f'[{embedding}]'
-                            embedding_list = json.loads(embedding)
-                        doc_emb = np.array(embedding_list, dtype=float)
-                    except (json.JSONDecodeError, ValueError) as e:
-                        print(f"Failed to parse embedding: {e}")
-                        continue
-                else:
-                    doc_emb = np.array(embedding, dtype=float)
-                
-                doc_norm = np.linalg.norm(doc_emb)
-                
-                if doc_norm > 0 and query_norm > 0:
-                    # Cosine similarity
-                    similarity = np.dot(query_emb, doc_emb) / (query_norm * doc_norm)
-                    row['similarity'] = float(similarity)
-                    results_with_similarity.append(row)
-        
-        # Sort by similarity (highest first) and limit results
-        results_with_similarity.sort(key=lambda x: x['similarity'], reverse=True)
-        return results_with_similarity[:match_count]
-        
-    except Exception as e:
-        print(f"rag_pages search failed: {e}")
-        return []
+    payload = {
+        "query_embedding": query_embedding,
+        "match_count": match_count,
+        "filter": filter or {},
+    }
+    fn, columns = "match_rag_pages", RESULT_COLUMNS
+    storage = None if query_text else sql_storage()
+    if query_text:
+        payload["query_text"] = query_text
+        fn, columns = "hybrid_match_rag_pages", HYBRID_COLUMNS
+    elif storage:
+        payload.update(storage=storage, rerank_factor=RERANK_FACTOR)
+        fn = "quantized_match_rag_pages"
+    elif FIRST_PASS_DIMS:
+        payload.update(first_pass_dims=FIRST_PASS_DIMS, rerank_factor=RERANK_FACTOR)
+        fn = "adaptive_match_rag_pages"
+    with span("search.rpc", function=fn) as s:
+        resp = sb.rpc(fn, payload).execute()
+        s.add("rows", len(resp.data or []))
+    return [{c: r.get(c) for c in columns} for r in resp.data or []]
 
 
 def similarity_search(
     query_embedding: List[float],
     match_count: int = 5,
     filter: Optional[Dict[str, Any]] = None,
+    allow_full_scan: Optional[bool] = None,
+    hybrid: Optional[bool] = None,
+    query_text: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Search for similar chunks. First tries rag_pages table, then falls back to RPC functions.
+    Search for similar chunks in rag_pages, ranked and filtered in Postgres.
+
+    Strategies, in order:
+        0. Resident in-process index, when RAG_LOCAL_INDEX is enabled.
+        1. `match_rag_pages` over a pooled psycopg connection (when SUPABASE_DB_URL is set).
+        2. `match_rag_pages` through the Supabase RPC endpoint.
+        3. Python-side search over the whole table, only if `allow_full_scan` (or RAG_ALLOW_FULL_SCAN) is enabled.
+        4. Legacy RPC functions for other tables (vector-only).
+
+    Hybrid searches use the same order with `hybrid_match_rag_pages` / the
+    index's BM25 ranking, fusing full-text and vector candidates so exact
+    terms (error codes, identifiers) are not lost to embedding similarity.
+
+    Args:
+        query_embedding: Query vector.
+        match_count: Number of rows to return.
+        filter: Optional filter applied in SQL before the limit (keys:
+            source, url, url_prefix, created_after, created_before, metadata;
+            see `validate_filter`).
+        allow_full_scan: Opt in to the full-scan fallback. Defaults to RAG_ALLOW_FULL_SCAN.
+        hybrid: Fuse lexical and vector rankings. Defaults to RAG_HYBRID_SEARCH.
+        query_text: Raw query text; required for hybrid search.
+
+    Returns:
+        List of {id, url, chunk_number, content, metadata, similarity} dicts
+        (plus the fused `score` for hybrid searches).
+
+    Raises:
+        ValueError: If `filter` is malformed, or hybrid search lacks `query_text`.
     """
-    # Try rag_pages first (for uploaded documents)
-    results = similarity_search_rag_pages(query_embedding, match_count, filter)
-    if results:
-        return results
-    
+    if allow_full_scan is None:
+        allow_full_scan = ALLOW_FULL_SCAN
+    filter = validate_filter(filter)
+    query_text = _hybrid_query(hybrid, query_text)
+
+    with span("search", k=match_count, hybrid=bool(query_text)):
+        if USE_LOCAL_INDEX:
+            # Reason: an empty result from a loaded index is the answer (e.g. a
+            # filter matching nothing); only an unavailable index falls through.
+            results = local_search(query_embedding, match_count, filter, query_text=query_text)
+            if results is not None:
+                return results
+
+        if get_database_url():
+            try:
+                return pg_similarity_search(query_embedding, match_count, filter, query_text)
+            except Exception as e:
+                logger.warning("pgvector search failed: %s", e)
+
+        return _rest_similarity_search(query_embedding, match_count, filter, allow_full_scan, query_text)
+
+
+async def similarity_search_async(
+    query_embedding: List[float],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    allow_full_scan: Optional[bool] = None,
+    hybrid: Optional[bool] = None,
+    query_text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Async `similarity_search` with the same strategy order.
+
+    The psycopg path awaits the loop's `AsyncConnectionPool`; the resident
+    index and the Supabase REST fallbacks run in a worker thread, so
+    concurrent searches never block the event loop.
+
+    Returns:
+        List of {id, url, chunk_number, content, metadata, similarity} dicts.
+    """
+    if allow_full_scan is None:
+        allow_full_scan = ALLOW_FULL_SCAN
+    filter = validate_filter(filter)
+    query_text = _hybrid_query(hybrid, query_text)
+
+    with span("search", k=match_count, hybrid=bool(query_text)):
+        if USE_LOCAL_INDEX:
+            results = await asyncio.to_thread(local_search, query_embedding, match_count, filter, None, query_text)
+            if results is not None:
+                return results
+
+        if get_database_url():
+            try:
+                return await pg_similarity_search_async(query_embedding, match_count, filter, query_text)
+            except Exception as e:
+                logger.warning("pgvector search failed: %s", e)
+
+        return await asyncio.to_thread(
+            _rest_similarity_search, query_embedding, match_count, filter, allow_full_scan, query_text
+        )
+
+
+def similarity_search_batch(
+    query_embeddings: List[List[float]],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    allow_full_scan: Optional[bool] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Vector search for many queries at once, sharing one filter and `match_count`.
+
+    Same strategy order as `similarity_search`, but each strategy handles
+    the whole batch: the resident index scores one (queries x rows) matrix
+    product, psycopg and the RPC endpoint call `batch_match_rag_pages` in one
+    round trip. Only the full-scan / legacy fallbacks run query by query.
+
+    Args:
+        query_embeddings: Query vectors.
+        match_count: Rows per query.
+        filter: Optional filter (see `similarity_search`).
+        allow_full_scan: Opt in to the full-scan fallback. Defaults to RAG_ALLOW_FULL_SCAN.
+
+    Returns:
+        One result list per query, in input order.
+
+    Raises:
+        ValueError: If `filter` is malformed.
+    """
+    if allow_full_scan is None:
+        allow_full_scan = ALLOW_FULL_SCAN
+    filter = validate_filter(filter)
+    if not query_embeddings:
+        return []
+
+    with span("search_batch", k=match_count, queries=len(query_embeddings)):
+        if USE_LOCAL_INDEX:
+            results = local_search_batch(query_embeddings, match_count, filter)
+            if results is not None:
+                return results
+
+        if get_database_url():
+            try:
+                return pg_similarity_search_batch(query_embeddings, match_count, filter)
+            except Exception as e:
+                logger.warning("pgvector batch search failed: %s", e)
+
+        return _rest_similarity_search_batch(query_embeddings, match_count, filter, allow_full_scan)
+
+
+async def similarity_search_batch_async(
+    query_embeddings: List[List[float]],
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    allow_full_scan: Optional[bool] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Async `similarity_search_batch`; blocking strategies run in a worker thread.
+
+    Returns:
+        One result list per query, in input order.
+    """
+    if allow_full_scan is None:
+        allow_full_scan = ALLOW_FULL_SCAN
+    filter = validate_filter(filter)
+    if not query_embeddings:
+        return []
+
+    with span("search_batch", k=match_count, queries=len(query_embeddings)):
+        if USE_LOCAL_INDEX:
+            results = await asyncio.to_thread(local_search_batch, query_embeddings, match_count, filter)
+            if results is not None:
+                return results
+
+        if get_database_url():
+            try:
+                return await pg_similarity_search_batch_async(query_embeddings, match_count, filter)
+            except Exception as e:
+                logger.warning("pgvector batch search failed: %s", e)
+
+        return await asyncio.to_thread(
+            _rest_similarity_search_batch, query_embeddings, match_count, filter, allow_full_scan
+        )
+
+
+def _rest_similarity_search_batch(
+    query_embeddings: List[List[float]],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    allow_full_scan: bool,
+) -> List[List[Dict[str, Any]]]:
+    """`batch_match_rag_pages` over the Supabase RPC endpoint, else query by query."""
+    storage, first_pass_dims, rerank_factor = batch_search_args()
+    payload = {
+        "query_embeddings": query_embeddings,
+        "match_count": match_count,
+        "filter": filter or {},
+        "storage": storage,
+        "first_pass_dims": first_pass_dims,
+        "rerank_factor": rerank_factor,
+    }
+    try:
+        with span("search.rpc_batch", queries=len(query_embeddings)) as s:
+            resp = get_client().rpc("batch_match_rag_pages", payload).execute()
+            s.add("rows", len(resp.data or []))
+        out: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        for r in resp.data or []:
+            out[int(r["query_index"])].append({c: r.get(c) for c in RESULT_COLUMNS})
+        return out
+    except Exception as e:
+        logger.warning("batch_match_rag_pages RPC failed: %s", e)
+    return [
+        _rest_similarity_search(emb, match_count, filter, allow_full_scan)
+        for emb in query_embeddings
+    ]
+
+
+def _hybrid_query(hybrid: Optional[bool], query_text: Optional[str]) -> Optional[str]:
+    """Return the text to run a hybrid search with, or None for vector-only."""
+    if hybrid is None:
+        hybrid = HYBRID_SEARCH and bool(query_text)
+    if not hybrid:
+        return None
+    if not query_text or not query_text.strip():
+        raise ValueError("hybrid search requires query_text")
+    return query_text
+
+
+def _rest_similarity_search(
+    query_embedding: List[float],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    allow_full_scan: bool,
+    query_text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Strategies 2-4 of `similarity_search`, all over the Supabase REST API."""
+    try:
+        results = _rpc_similarity_search(query_embedding, match_count, filter, query_text)
+        if results:
+            return results
+    except Exception as e:
+        logger.warning("match_rag_pages RPC failed: %s", e)
+
+    if allow_full_scan:
+        results = similarity_search_rag_pages(query_embedding, match_count, filter, query_text=query_text)
+        if results:
+            return results
+
     # Fall back to RPC functions for other data
     sb = get_client()
     payload = {
@@ -157,14 +439,16 @@ def similarity_search(
         "match_count": match_count,
         "filter": filter or {},
     }
-    
+
     rpc_candidates = ["match_all_chunks", "match_crawled_pages", "match_code_examples"]
-    
+
     for fn in rpc_candidates:
         try:
-            resp = sb.rpc(fn, payload).execute()
+            with span("search.legacy_rpc", function=fn) as s:
+                resp = sb.rpc(fn, payload).execute()
+                s.add("rows", len(resp.data or []))
             return resp.data or []
         except Exception:
             continue
-    
+
     return []
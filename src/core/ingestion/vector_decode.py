@@ -0,0 +1,144 @@
+from __future__ import annotations
+import struct
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+__all__ = ["DecodeResult", "decode_embeddings", "decode_pgvector_binary"]
+
+
+_NP_STR_PREFIX = "np.str_("
+# pgvector binary wire format: uint16 dim, uint16 unused, then dim big-endian float32.
+_BINARY_HEADER = struct.Struct(">HH")
+
+
+@dataclass
+class DecodeResult:
+    """
+    Output of `decode_embeddings`.
+
+    Attributes:
+        matrix: (len(ok_rows) x dim) float32 matrix of successfully decoded rows.
+        ok_rows: Input positions that decoded cleanly, aligned with `matrix`.
+        bad_rows: (input position, reason) for every row that was skipped.
+    """
+
+    matrix: np.ndarray
+    ok_rows: np.ndarray
+    bad_rows: List[Tuple[int, str]] = field(default_factory=list)
+
+
+def decode_pgvector_binary(buf: bytes | bytearray | memoryview) -> np.ndarray:
+    """
+    Decode one value in pgvector's binary (COPY/recv) format.
+
+    Args:
+        buf: Raw bytes as sent by Postgres for a `vector` column.
+
+    Returns:
+        float32 array of length dim.
+    """
+    dim, _ = _BINARY_HEADER.unpack_from(buf, 0)
+    data = np.frombuffer(buf, dtype=">f4", count=dim, offset=_BINARY_HEADER.size)
+    return data.astype(np.float32)
+
+
+def _text_body(value: str) -> str:
+    """Strip wrapping artifacts so only the comma-separated floats remain."""
+    value = value.strip()
+    if value.startswith(_NP_STR_PREFIX):
+        value = value[len(_NP_STR_PREFIX) :].rstrip(")").strip("'\"")
+    return value.strip().lstrip("[").rstrip("]")
+
+
+def _parse_text(body: str) -> np.ndarray:
+    with warnings.catch_warnings():
+        # Reason: numpy only warns (not raises) when text stops parsing early.
+        warnings.simplefilter("error", DeprecationWarning)
+        return np.fromstring(body, dtype=np.float32, sep=",")
+
+
+def _decode_one(value: Any) -> np.ndarray:
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False).ravel()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode_pgvector_binary(value)
+    if isinstance(value, str):
+        return _parse_text(_text_body(value))
+    return np.asarray(value, dtype=np.float32).ravel()
+
+
+def decode_embeddings(
+    values: Sequence[Any],
+    dim: Optional[int] = None,
+) -> DecodeResult:
+    """
+    Decode a batch of embedding values into one preallocated float32 matrix.
+
+    Accepts pgvector text ('[0.1,0.2,...]', including `np.str_(...)` wrapped
+    strings), pgvector binary values (e.g. `vector_send(embedding)`), lists and
+    numpy arrays. Uniform batches take a bulk path: binary rows become one
+    `np.frombuffer` view, text rows one `np.fromstring` call.
+
+    Args:
+        values: One embedding value per row; None marks a missing embedding.
+        dim: Expected dimension. Inferred from the first decodable row if omitted.
+
+    Returns:
+        DecodeResult with the dense matrix and the rows that were rejected.
+    """
+    n = len(values)
+    bad: List[Tuple[int, str]] = []
+
+    if n and all(isinstance(v, (bytes, bytearray, memoryview)) for v in values):
+        if dim is None:
+            dim, _ = _BINARY_HEADER.unpack_from(values[0], 0)
+        row_bytes = _BINARY_HEADER.size + 4 * dim
+        if dim and all(len(v) == row_bytes for v in values):
+            # Reason: the 4-byte header is exactly one float32 slot, so the
+            # joined buffer is an (n x dim+1) big-endian matrix.
+            flat = np.frombuffer(b"".join(values), dtype=">f4").reshape(n, dim + 1)
+            return DecodeResult(flat[:, 1:].astype(np.float32), np.arange(n), bad)
+
+    if n and all(isinstance(v, str) for v in values):
+        bodies = [_text_body(v) for v in values]
+        if dim is None:
+            dim = bodies[0].count(",") + 1 if bodies[0] else None
+        # Reason: per-row comma counts guard against rows whose length errors
+        # cancel out in the joined buffer.
+        if dim and all(b.count(",") == dim - 1 for b in bodies):
+            try:
+                flat = _parse_text(",".join(bodies))
+            except (ValueError, DeprecationWarning):
+                flat = None
+            if flat is not None and flat.size == n * dim:
+                return DecodeResult(flat.reshape(n, dim), np.arange(n), bad)
+        # Fall through to the per-row path to find which rows are malformed.
+
+    matrix: Optional[np.ndarray] = None
+    ok: List[int] = []
+    for i, value in enumerate(values):
+        if value is None:
+            bad.append((i, "missing embedding"))
+            continue
+        try:
+            vec = _decode_one(value)
+        except (ValueError, TypeError, struct.error, DeprecationWarning) as e:
+            bad.append((i, f"unparseable: {e}"))
+            continue
+        if dim is None:
+            dim = vec.size
+        if vec.size != dim or dim == 0:
+            bad.append((i, f"expected {dim} dims, got {vec.size}"))
+            continue
+        if matrix is None:
+            matrix = np.empty((n, dim), dtype=np.float32)
+        matrix[len(ok)] = vec
+        ok.append(i)
+
+    if matrix is None:
+        matrix = np.empty((0, dim or 0), dtype=np.float32)
+    return DecodeResult(matrix[: len(ok)], np.asarray(ok, dtype=np.int64), bad)
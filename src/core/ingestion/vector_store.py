@@ -0,0 +1,165 @@
+from __future__ import annotations
+import os
+import threading
+from typing import Any, Dict, List, Optional, Protocol, Sequence, runtime_checkable
+
+from ... import env as _env  # Load environment variables  # noqa: F401
+
+
+__all__ = ["VectorStore", "SupabaseVectorStore", "get_vector_store", "VECTOR_STORES"]
+
+
+# "supabase": rag_pages in Supabase / Postgres; "local": LocalFileVectorStore.
+VECTOR_STORES = ("supabase", "local")
+RAG_VECTOR_STORE = os.getenv("RAG_VECTOR_STORE", "supabase")
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """
+    Where chunk rows and their embeddings live.
+
+    Rows are rag_pages-shaped dicts (url, chunk_number, content, metadata,
+    embedding, optionally source), keyed by (url, chunk_number). Search
+    results are {id, url, chunk_number, content, metadata, similarity}
+    dicts, best first; filters follow `validate_filter`.
+    """
+
+    def upsert(self, rows: List[Dict[str, Any]]) -> None: ...
+
+    def delete(self, url: str, first_stale: int = 0) -> None: ...
+
+    def fetch_chunk_hashes(self, url: str) -> Dict[int, Dict[str, Any]]: ...
+
+    def count(self) -> int: ...
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]: ...
+
+    async def search_async(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    async def search_batch_async(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]: ...
+
+
+class SupabaseVectorStore:
+    """
+    rag_pages in Supabase / Postgres, through the `supabase_store` functions
+    (pooled psycopg, RPC and resident-index strategies included).
+    """
+
+    def upsert(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert or replace rows keyed by (url, chunk_number) (`upsert_chunks`)."""
+        _supabase().upsert_chunks(rows)
+
+    def delete(self, url: str, first_stale: int = 0) -> None:
+        """Delete a document's chunks numbered `first_stale` and up (`delete_chunks_from`)."""
+        _supabase().delete_chunks_from(url, first_stale)
+
+    def fetch_chunk_hashes(self, url: str) -> Dict[int, Dict[str, Any]]:
+        """{chunk_number: {"chunk_hash", "file_hash"}} for one document."""
+        return _supabase().fetch_chunk_hashes(url)
+
+    def count(self) -> int:
+        """Rows in rag_pages."""
+        return _supabase().count_chunks()
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k rows for one query, hybrid when asked (`similarity_search`)."""
+        return _supabase().similarity_search(
+            query_embedding, match_count=match_count, filter=filter, hybrid=hybrid, query_text=query_text
+        )
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Top-k rows per query (`similarity_search_batch`)."""
+        return _supabase().similarity_search_batch(query_embeddings, match_count=match_count, filter=filter)
+
+    async def search_async(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[bool] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """`search` without blocking the event loop (`similarity_search_async`)."""
+        return await _supabase().similarity_search_async(
+            query_embedding, match_count=match_count, filter=filter, hybrid=hybrid, query_text=query_text
+        )
+
+    async def search_batch_async(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_count: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """`search_batch` without blocking the event loop (`similarity_search_batch_async`)."""
+        return await _supabase().similarity_search_batch_async(
+            query_embeddings, match_count=match_count, filter=filter
+        )
+
+
+def _supabase():
+    # Reason: imported lazily so the local store runs without the Supabase
+    # client, and looked up per call so the module's functions can be patched.
+    from . import supabase_store
+
+    return supabase_store
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide vector store chosen by RAG_VECTOR_STORE."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if RAG_VECTOR_STORE == "supabase":
+                _store = SupabaseVectorStore()
+            elif RAG_VECTOR_STORE == "local":
+                from .local_store import LocalFileVectorStore
+
+                _store = LocalFileVectorStore()
+            else:
+                raise ValueError(
+                    f"Unknown vector store: {RAG_VECTOR_STORE!r} (expected one of {VECTOR_STORES})"
+                )
+        return _store
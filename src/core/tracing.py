@@ -0,0 +1,427 @@
+from __future__ import annotations
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence
+from ..env import cache_path
+
+
+__all__ = [
+    "TRACE_EXPORT",
+    "Span",
+    "span",
+    "start_span",
+    "traced",
+    "count",
+    "current_span",
+    "enabled",
+    "configure",
+    "recent_traces",
+    "summarize",
+    "flush",
+    "JsonlExporter",
+    "OtlpExporter",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# Comma-separated trace sinks: "memory" (recent traces for the debug panel
+# only), "jsonl" (append spans to RAG_TRACE_PATH), "otlp" (OTLP/HTTP JSON to
+# RAG_TRACE_OTLP_ENDPOINT). Empty disables tracing; every span is then a
+# shared no-op object.
+TRACE_EXPORT = os.getenv("RAG_TRACE", "")
+TRACE_PATH = os.getenv("RAG_TRACE_PATH") or cache_path("traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("RAG_TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE = os.getenv("RAG_TRACE_SERVICE", "streamrag")
+# Finished traces kept in memory for `recent_traces` / the Streamlit panel.
+TRACE_KEEP = int(os.getenv("RAG_TRACE_KEEP", "200"))
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("rag_span", default=None)
+_enabled = False
+_exporters: List[Any] = []
+_recent: Deque[List[Dict[str, Any]]] = deque(maxlen=TRACE_KEEP)
+_recent_lock = threading.Lock()
+
+
+class Span:
+    """
+    One timed operation. Use as a context manager (it becomes the current
+    span, so nested spans and `count` attach to it) or via `start_span` /
+    `end` when the work spans generator yields.
+
+    Finished spans are collected on their root; when the root ends the whole
+    trace is kept in memory and handed to the exporters.
+    """
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "attrs", "counters", "error",
+        "start", "start_ns", "duration", "_t0", "_root", "_finished", "_token",
+    )
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None, parent: Optional["Span"] = None):
+        self.name = name
+        self.attrs: Dict[str, Any] = dict(attrs or {})
+        self.counters: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.span_id = os.urandom(8).hex()
+        if parent is None:
+            self.trace_id = os.urandom(16).hex()
+            self.parent_id: Optional[str] = None
+            self._root = self
+            self._finished: Optional[List[Dict[str, Any]]] = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self._root = parent._root
+            self._finished = None
+        self.start = time.time()
+        self.start_ns = time.time_ns()
+        self.duration: Optional[float] = None
+        self._t0 = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, **attrs: Any) -> None:
+        """Set attributes (e.g. row counts known only after the work)."""
+        self.attrs.update(attrs)
+
+    def add(self, counter: str, n: float = 1) -> None:
+        """Increment a counter such as rows_scanned, bytes or cache_hits."""
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def mark(self, event: str) -> None:
+        """Record `<event>_ms` since the span started (e.g. time to first token)."""
+        self.attrs[f"{event}_ms"] = round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._t0
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self._root._finished.append(self.as_dict())
+        if self._root is self:
+            _finish_trace(self._finished)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "start_ns": self.start_ns,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "counters": self.counters,
+            "error": self.error,
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Reason: an async generator may be closed from another context
+            # (e.g. garbage collected), where the token is not valid.
+            pass
+        # A consumer closing a generator early is not a failure.
+        self.end(None if exc_type is GeneratorExit else exc)
+        return False
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled; every method does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def add(self, counter: str, n: float = 1) -> None:
+        pass
+
+    def mark(self, event: str) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def current_span() -> Optional[Span]:
+    """The active span in this context, or None."""
+    return _current.get() if _enabled else None
+
+
+def span(name: str, **attrs: Any):
+    """
+    Context manager timing `name` as a child of the current span (or a new
+    trace). Returns a shared no-op span when tracing is disabled.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs, _current.get())
+
+
+def start_span(name: str, **attrs: Any):
+    """
+    Start a span without making it current; call `.end()` when done.
+
+    For work that yields (generators), where a context-managed span would
+    leak into the consumer between items.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs, _current.get())
+
+
+def count(counter: str, n: float = 1) -> None:
+    """Increment `counter` on the current span (no-op without one)."""
+    if _enabled:
+        current = _current.get()
+        if current is not None:
+            current.add(counter, n)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator wrapping each call of a sync or async function in a span."""
+
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                with Span(label, None, _current.get()):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(label, None, _current.get()):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _finish_trace(spans: List[Dict[str, Any]]) -> None:
+    with _recent_lock:
+        _recent.append(spans)
+    for exporter in _exporters:
+        try:
+            exporter.export(spans)
+        except Exception as e:
+            logger.warning("trace export failed: %s", e)
+
+
+def recent_traces() -> List[List[Dict[str, Any]]]:
+    """Finished traces kept in memory (oldest first), each a list of span dicts."""
+    with _recent_lock:
+        return list(_recent)
+
+
+def _quantile(sorted_values: Sequence[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def summarize(traces: Optional[Iterable[List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+    """
+    Per-span-name latency summary over `traces` (default: `recent_traces()`).
+
+    Returns:
+        One dict per span name, slowest total first: name, count, errors,
+        p50_ms, p95_ms, max_ms, total_ms and summed counters.
+    """
+    if traces is None:
+        traces = recent_traces()
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        for s in trace:
+            entry = by_name.setdefault(s["name"], {"durations": [], "errors": 0, "counters": {}})
+            if s.get("duration_ms") is not None:
+                entry["durations"].append(s["duration_ms"])
+            entry["errors"] += 1 if s.get("error") else 0
+            for key, value in (s.get("counters") or {}).items():
+                entry["counters"][key] = entry["counters"].get(key, 0) + value
+    out = []
+    for name, entry in by_name.items():
+        durations = sorted(entry["durations"])
+        if not durations:
+            continue
+        out.append(
+            {
+                "name": name,
+                "count": len(durations),
+                "errors": entry["errors"],
+                "p50_ms": round(_quantile(durations, 0.5), 3),
+                "p95_ms": round(_quantile(durations, 0.95), 3),
+                "max_ms": round(durations[-1], 3),
+                "total_ms": round(sum(durations), 3),
+                **entry["counters"],
+            }
+        )
+    return sorted(out, key=lambda row: row["total_ms"], reverse=True)
+
+
+class JsonlExporter:
+    """Append each finished span as one JSON line."""
+
+    def __init__(self, path: str = TRACE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(s, default=str) + "\n" for s in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def flush(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Dict[str, Any]], service: str = TRACE_SERVICE) -> Dict[str, Any]:
+    """OTLP/HTTP JSON `ExportTraceServiceRequest` body for finished span dicts."""
+    out = []
+    for s in spans:
+        attrs = dict(s["attrs"])
+        attrs.update({f"count.{k}": v for k, v in s["counters"].items()})
+        item = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["start_ns"] + int((s["duration_ms"] or 0) * 1e6)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attrs.items()],
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        }
+        if s["parent_id"]:
+            item["parentSpanId"] = s["parent_id"]
+        out.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+                "scopeSpans": [{"scope": {"name": "streamrag"}, "spans": out}],
+            }
+        ]
+    }
+
+
+class OtlpExporter:
+    """
+    Send traces to an OTLP/HTTP collector (JSON encoding) from a background
+    thread, so a slow or missing collector never delays a request.
+    """
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, service: str = TRACE_SERVICE, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service = service
+        self.timeout = timeout
+        # Bounded: traces are dropped rather than queued without limit.
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("OTLP export queue full; dropping trace")
+
+    def _run(self) -> None:
+        from .clients import get_http_client
+
+        while True:
+            spans = self._queue.get()
+            try:
+                get_http_client().post(
+                    self.endpoint, json=otlp_payload(spans, self.service), timeout=self.timeout
+                ).raise_for_status()
+            except Exception as e:
+                logger.warning("OTLP export to %s failed: %s", self.endpoint, e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued trace has been sent (or failed)."""
+        self._queue.join()
+
+
+def configure(export: Optional[str] = None, path: Optional[str] = None, endpoint: Optional[str] = None) -> None:
+    """
+    (Re)configure tracing. `export` takes the RAG_TRACE syntax ("" disables;
+    "memory", "jsonl", "otlp", comma-separated).
+
+    Raises:
+        ValueError: On an unknown sink name.
+    """
+    global _enabled, _exporters
+    sinks = [s.strip().lower() for s in (TRACE_EXPORT if export is None else export).split(",") if s.strip()]
+    sinks = [s for s in sinks if s not in ("0", "false", "no", "off")]
+    unknown = set(sinks) - {"memory", "jsonl", "otlp", "1", "true", "yes", "on"}
+    if unknown:
+        raise ValueError(f"Unknown RAG_TRACE sink(s): {sorted(unknown)}")
+    exporters: List[Any] = []
+    if "jsonl" in sinks:
+        exporters.append(JsonlExporter(path or TRACE_PATH))
+    if "otlp" in sinks:
+        exporters.append(OtlpExporter(endpoint or TRACE_OTLP_ENDPOINT))
+    _exporters = exporters
+    _enabled = bool(sinks)
+
+
+def flush() -> None:
+    """Wait for exporters with background delivery (OTLP) to drain."""
+    for exporter in _exporters:
+        exporter.flush()
+
+
+configure()
@@ -1,5 +1,25 @@
 from __future__ import annotations
+import os
+
 from dotenv import load_dotenv
 
 # Load environment variables from a .env file if present
 load_dotenv()
+
+
+def cache_path(*parts: str) -> str:
+    """
+    Default location for state shared by every process on the host.
+
+    Resolves under `$XDG_CACHE_HOME/rag-vs` (`~/.cache/rag-vs` when unset)
+    rather than the working directory, so the app, API and job workers agree
+    on it wherever they are started from.
+
+    Args:
+        *parts: Path components below the cache directory.
+
+    Returns:
+        str: Absolute path (not created).
+    """
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rag-vs", *parts)
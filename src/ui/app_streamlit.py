@@ -2,19 +2,12 @@ from __future__ import annotations
 import asyncio
 import os
 import sys
-import tempfile
 import time
 from datetime import datetime
+from typing import Any, Dict, List
 
 import streamlit as st
-from pydantic_ai import Agent
-from pydantic_ai.messages import (
-    ModelRequest,
-    ModelResponse,
-    PartDeltaEvent,
-    PartStartEvent,
-    TextPartDelta,
-)
+from pydantic_ai.messages import ModelRequest, ModelResponse
 
 # Ensure project root is on sys.path when running this file directly (e.g., streamlit run src/ui/app_streamlit.py)
 _CURR = os.path.dirname(os.path.abspath(__file__))  # src/ui/
@@ -25,28 +18,25 @@ if _ROOT not in sys.path:
 
 # Load environment variables from .env early
 from src import env as _env  # noqa: F401, E402
-from src.core.agent.agent import agent  # noqa: E402
-from src.core.ingestion.embeddings import embed_texts  # noqa: E402
-from src.core.ingestion.ingest import ingest_paths  # noqa: E402
-from src.core.ingestion.supabase_store import similarity_search  # noqa: E402
-
-
-async def run_agent_with_streaming(user_input: str):
-    async with agent.iter(user_input) as run:
-        async for node in run:
-            if Agent.is_model_request_node(node):
-                async with node.stream(run.ctx) as request_stream:
-                    async for event in request_stream:
-                        if (
-                            isinstance(event, PartStartEvent)
-                            and event.part.part_kind == "text"
-                        ):
-                            yield event.part.content or ""
-                        elif isinstance(event, PartDeltaEvent) and isinstance(
-                            event.delta, TextPartDelta
-                        ):
-                            yield event.delta.content_delta or ""
-    yield ""
+from src.core.agent.streaming import (  # noqa: E402
+    AGENT_MODE,
+    AGENT_MODES,
+    StreamStats,
+    run_agent_with_streaming,
+)
+from src.core.ingestion.job_workers import get_worker_pool  # noqa: E402
+from src.core.ingestion.jobs import get_job_store  # noqa: E402
+from src.core import tracing  # noqa: E402
+
+
+def _source_label(row: Dict[str, Any]) -> str:
+    meta = row.get("metadata") or {}
+    url = row.get("url") or ""
+    # Prefer filename if available, else basename of file:// url, else metadata.source/url
+    label = meta.get("filename") or meta.get("file_name")
+    if not label and url.startswith("file://"):
+        label = os.path.basename(url.replace("file://", ""))
+    return label or meta.get("source") or url or "(unknown)"
 
 
 def display_message_part(part):
@@ -64,30 +54,30 @@ def main():
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
+    mode = st.sidebar.radio(
+        "Answer mode",
+        AGENT_MODES,
+        index=AGENT_MODES.index(AGENT_MODE) if AGENT_MODE in AGENT_MODES else 0,
+        format_func=lambda m: {
+            "tool": "Tool call (model searches)",
+            "single_shot": "Single-shot (retrieve first)",
+        }[m],
+    )
+
     with st.expander("Upload documents (TXT/PDF) to ingest"):
         uploads = st.file_uploader(
             "Upload files", type=["txt", "pdf"], accept_multiple_files=True
         )
         if uploads and st.button("Ingest"):
-            temp_paths = []
-            for f in uploads:
-                tmp = st.session_state.get("tmp_dir", None)
-
-                if not tmp:
-                    tmp = tempfile.mkdtemp(prefix="rag_uploads_")
-                    st.session_state["tmp_dir"] = tmp
-                p = os.path.join(tmp, f.name)
-                with open(p, "wb") as out:
-                    out.write(f.getbuffer())
-                temp_paths.append(p)
-            # Track uploaded files for downstream source filtering
-            up_urls = [f"file://{os.path.abspath(p)}" for p in temp_paths]
-            st.session_state["uploaded_urls"] = up_urls
-            st.session_state["uploaded_names"] = [
-                os.path.basename(p) for p in temp_paths
-            ]
-            count = ingest_paths(temp_paths, source="upload")
-            st.success(f"Ingested {count} chunks")
+            # Reason: ingestion runs in the background worker pool; this run only
+            # stages the files and queues a job, so the session stays responsive.
+            store = get_job_store()
+            paths = store.stage_uploads([(f.name, f) for f in uploads])
+            pool = get_worker_pool()
+            job_id = (pool or store).submit(paths, source="upload")
+            st.session_state.setdefault("ingest_jobs", []).append(job_id)
+        if st.session_state.get("ingest_jobs"):
+            _ingest_jobs_panel()
 
     for msg in st.session_state.messages:
         if isinstance(msg, (ModelRequest, ModelResponse)):
@@ -99,12 +89,16 @@ def main():
         with st.chat_message("user"):
             st.markdown(user_input)
 
+        sources: List[Dict[str, Any]] = []
+        stats = StreamStats(mode=mode, started=time.perf_counter())
         with st.chat_message("assistant"):
             placeholder = st.empty()
             full = ""
 
             async def consume():
-                async for chunk in run_agent_with_streaming(user_input):
+                async for chunk in run_agent_with_streaming(
+                    user_input, sources, mode=mode, stats=stats
+                ):
                     nonlocal full
                     if not chunk:
                         continue
@@ -115,66 +109,65 @@ def main():
             # Run the async consumer
 
             asyncio.run(consume())
-        # Show sources based on vector search for the same query
-        with st.expander("Sources"):
-            try:
-                # Use the underlying functions directly instead of the Tool
-                emb = embed_texts([user_input])[0]
-                # Prefer sources ingested via the upload flow
-                rows = similarity_search(
-                    emb, match_count=5, filter={"source": "upload"}
+            if stats.ttft is not None:
+                cached = " (cached answer)" if stats.cached else ""
+                st.caption(
+                    f"{mode}{cached}: first token {stats.ttft:.2f}s, total {stats.total:.2f}s"
                 )
-                contexts = []
-                uploaded_names = st.session_state.get("uploaded_names", [])
-
-                def _is_uploaded_row(row: dict) -> bool:
-                    url = (row.get("url") or "").lower()
-                    meta = row.get("metadata") or {}
-                    src_name = (meta.get("source") or "").lower()
-                    fname_meta = (
-                        meta.get("filename") or meta.get("file_name") or ""
-                    ).lower()
-                    # Heuristics to keep only uploaded-doc chunks
-                    if url.startswith("file://"):
-                        return True
-                    if src_name == "upload":
-                        return True
-                    if fname_meta and any(
-                        fname_meta == n.lower() for n in uploaded_names
-                    ):
-                        return True
-                    if uploaded_names and any(n.lower() in url for n in uploaded_names):
-                        return True
-                    return False
-
-                for r in rows:
-                    if not _is_uploaded_row(r):
-                        continue
-                    contexts.append(
-                        {
-                            "id": r.get("id"),
-                            "url": r.get("url"),
-                            "chunk_number": r.get("chunk_number"),
-                            "content": r.get("content"),
-                            "similarity": r.get("similarity"),
-                            "metadata": r.get("metadata", {}),
-                        }
-                    )
-                if contexts:
-                    for c in contexts:
-                        meta = c.get("metadata", {}) or {}
-                        url = c.get("url") or ""
-                        # Prefer filename if available, else basename of file:// url, else metadata.source/url
-                        label = meta.get("filename") or meta.get("file_name")
-                        if not label and url.startswith("file://"):
-                            label = os.path.basename(url.replace("file://", ""))
-                        if not label:
-                            label = meta.get("source") or url or "(unknown)"
-                        st.markdown(f"- {label} (score: {c.get('similarity'):.3f})")
-                else:
-                    st.write("No sources found.")
-            except Exception as e:
-                st.warning(f"Could not fetch sources: {e}")
+        # Show the chunks kb_search actually returned to the model this turn
+        with st.expander("Sources"):
+            if sources:
+                for c in sources:
+                    score = c.get("similarity")
+                    score_txt = f" (score: {score:.3f})" if isinstance(score, (int, float)) else ""
+                    st.markdown(f"- {_source_label(c)}{score_txt}")
+            else:
+                st.write("No sources found.")
+
+    if tracing.enabled():
+        _trace_panel()
+
+
+@st.fragment(run_every=2)
+def _ingest_jobs_panel() -> None:
+    """This session's ingestion jobs; re-polled every 2s without rerunning the page."""
+    store = get_job_store()
+    pool = get_worker_pool()
+    for job in store.list_jobs(job_ids=st.session_state["ingest_jobs"]):
+        p = job.progress
+        label = f"{job.status}: {p.get('files_done', 0)}/{len(job.files)} files, {p.get('rows_committed', 0)} chunks"
+        st.progress(job.fraction, text=label)
+        if job.error:
+            st.caption(f"Error: {job.error}")
+        cols = st.columns(2)
+        if not job.is_finished and cols[0].button("Cancel", key=f"cancel_{job.id}"):
+            (pool or store).cancel(job.id)
+        if job.status in ("failed", "cancelled") and cols[1].button("Retry", key=f"retry_{job.id}"):
+            (pool or store).retry(job.id)
+        with st.popover("Files"):
+            st.dataframe(
+                [{"file": f["name"], "status": f["status"]} for f in job.files],
+                use_container_width=True,
+            )
+
+
+def _trace_panel() -> None:
+    """Sidebar summary of recent traces (RAG_TRACE set): time per stage and counters."""
+    with st.sidebar.expander("Debug: latency by stage"):
+        traces = tracing.recent_traces()
+        if not traces:
+            st.caption("No traces yet.")
+            return
+        st.dataframe(tracing.summarize(traces), use_container_width=True)
+        last = traces[-1]
+        st.caption(f"Last trace ({len(last)} spans)")
+        st.dataframe(
+            [
+                {"span": s["name"], "ms": s["duration_ms"], **s["attrs"], **s["counters"]}
+                for s in sorted(last, key=lambda s: s["start_ns"])
+            ],
+            use_container_width=True,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import pytest
+
+from src.core.ingestion import corpus, embeddings
+
+
+@pytest.fixture(autouse=True)
+def _caches_in_tmp(tmp_path, monkeypatch):
+    # Keep the process-wide embedding cache out of the checkout and the user's cache dir.
+    monkeypatch.setenv("EMBED_CACHE_PATH", str(tmp_path / "embeddings.sqlite"))
+    monkeypatch.setattr(embeddings, "_cache", None)
+    monkeypatch.setattr(embeddings, "_cache_loaded", False)
+    # Likewise the corpus version every upsert / delete bumps.
+    monkeypatch.setattr(corpus, "CORPUS_VERSION_PATH", str(tmp_path / "corpus_version"))
+    yield
+    if embeddings._cache is not None:
+        embeddings._cache.close()
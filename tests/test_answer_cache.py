@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from src.core.agent import kb, streaming
+from src.core.agent.answer_cache import AnswerCache
+from src.core.agent.streaming import StreamStats, run_agent_with_streaming
+from src.core.ingestion import corpus, supabase_store
+
+
+def test_lookup_by_similarity_mode_ttl_and_lru():
+    versions = ["v1"]
+    cache = AnswerCache(threshold=0.9, ttl=60, max_entries=2, version_fn=lambda: versions[0])
+    assert cache.store("capital of France?", [1.0, 0.0, 0.0], "Paris.", [{"id": 1}], "tool")
+    hit = cache.lookup([0.98, 0.1, 0.0], "tool")
+    assert hit.answer == "Paris." and hit.sources == [{"id": 1}] and hit.similarity > 0.9
+    hit.sources.append({"id": 2})  # copies, so callers cannot corrupt the entry
+    assert cache.lookup([1.0, 0.0, 0.0], "tool").sources == [{"id": 1}]
+    assert cache.lookup([0.0, 1.0, 0.0], "tool") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "single_shot") is None
+
+    cache.store("b", [0.0, 1.0, 0.0], "B", [], "tool")
+    cache.lookup([1.0, 0.0, 0.0], "tool")  # touch the first entry
+    cache.store("c", [0.0, 0.0, 1.0], "C", [], "tool")
+    assert cache.lookup([0.0, 1.0, 0.0], "tool") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "tool") is not None
+    assert cache.stats.evictions == 1
+
+    versions[0] = "v2"
+    assert cache.lookup([1.0, 0.0, 0.0], "tool") is None and len(cache) == 0
+    assert not cache.store("late", [1.0, 0.0, 0.0], "stale", [], "tool", version="v1")
+    assert cache.stats.invalidations == 1
+
+    expired = AnswerCache(threshold=0.9, ttl=0.0, version_fn=lambda: "v")
+    expired.store("q", [1.0, 0.0], "A", [], "tool")
+    assert expired.lookup([1.0, 0.0], "tool") is None and expired.stats.expired == 1
+
+
+@pytest.fixture
+def offline_rag(monkeypatch, tmp_path):
+    searches = []
+
+    async def fake_embed(texts):
+        return [[1.0, 0.05 * len(t)] for t in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, **kwargs):
+        searches.append(match_count)
+        return [{"id": 7, "url": "file:///a.txt", "chunk_number": 0, "content": "Paris.", "similarity": 0.9}]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    monkeypatch.setattr(streaming, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(corpus, "CORPUS_VERSION_PATH", str(tmp_path / "corpus_version"))
+    return searches
+
+
+def _ask(question, cache, agent):
+    sources = []
+    stats = StreamStats(mode="tool", started=0.0)
+
+    async def consume():
+        return "".join([c async for c in run_agent_with_streaming(question, sources, mode="tool", stats=stats, agent=agent, cache=cache)])
+
+    return asyncio.run(consume()), sources, stats
+
+
+def test_repeat_question_streams_from_cache_until_corpus_changes(offline_rag, monkeypatch):
+    cache = AnswerCache(threshold=0.99)
+    agent = Agent(TestModel(), tools=[kb.kb_search])
+    first, sources, stats = _ask("capital of France?", cache, agent)
+    assert not stats.cached and offline_rag == [5] and len(cache) == 1
+
+    again, again_sources, stats = _ask("capital of France ?", cache, agent)
+    assert stats.cached and stats.ttft is not None and stats.total is not None
+    assert again == first and [s["id"] for s in again_sources] == [s["id"] for s in sources] == [7]
+    assert offline_rag == [5]  # no retrieval, no model call
+
+    monkeypatch.setattr(supabase_store, "get_client", lambda: _FakeClient())
+    supabase_store.upsert_chunks([{"url": "file:///b.txt", "chunk_number": 0}])
+    _, _, stats = _ask("capital of France?", cache, agent)
+    assert not stats.cached and offline_rag == [5, 5]
+
+
+class _FakeClient:
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        return self
+
+    def execute(self):
+        return None
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from src.api.app import create_app
+from src.api.batching import MicroBatcher, Overloaded
+from src.core.agent import kb
+from src.core.ingestion import local_index_search, supabase_store
+from src.core.ingestion.local_index import LocalVectorIndex
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_concurrent_searches_share_one_batch_call():
+    calls = []
+
+    async def search_batch(queries, k, filter, hybrid):
+        calls.append((list(queries), k, filter))
+        return [[{"id": i, "content": q}] for i, q in enumerate(queries)]
+
+    app = create_app(search_batch=search_batch, batch_window_ms=20)
+
+    async def main():
+        async with _client(app) as client:
+            plain = [client.post("/search", json={"query": f"q{i}", "k": 3}) for i in range(12)]
+            filtered = client.post("/search", json={"query": "f", "k": 3, "filter": {"source": "upload"}})
+            responses = await asyncio.gather(*plain, filtered)
+            stats = (await client.get("/stats")).json()
+        return responses, stats
+
+    responses, stats = asyncio.run(main())
+    assert all(r.status_code == 200 for r in responses)
+    assert [r.json()["results"][0]["content"] for r in responses[:12]] == [f"q{i}" for i in range(12)]
+    # One batch for the 12 unfiltered queries, one for the filtered query.
+    assert sorted(len(q) for q, _, _ in calls) == [1, 12]
+    assert {json.dumps(f) for _, _, f in calls} == {"{}", '{"source": "upload"}'}
+    assert stats["search"]["batches"] == 2 and stats["search"]["pending"] == 0
+
+
+def test_bad_filter_and_overload_are_rejected():
+    async def slow(queries, **kwargs):
+        await asyncio.sleep(0.05)
+        return [[] for _ in queries]
+
+    app = create_app(search_batch=slow, batch_window_ms=1, max_pending=2)
+
+    async def main():
+        async with _client(app) as client:
+            bad = await client.post("/search", json={"query": "x", "filter": {"created_after": "soon"}})
+            burst = await asyncio.gather(*(client.post("/search", json={"query": str(i)}) for i in range(5)))
+        return bad, burst
+
+    bad, burst = asyncio.run(main())
+    assert bad.status_code == 400
+    codes = sorted(r.status_code for r in burst)
+    assert codes.count(200) == 2 and codes.count(503) == 3
+    assert all(r.headers.get("retry-after") == "1" for r in burst if r.status_code == 503)
+
+
+def test_batcher_splits_large_groups_and_propagates_errors():
+    sizes = []
+
+    async def handler(key, items):
+        sizes.append(len(items))
+        if key == "boom":
+            raise RuntimeError("db down")
+        return [i * 2 for i in items]
+
+    async def main():
+        batcher = MicroBatcher(handler, max_batch=4, max_wait=0.01)
+        doubled = await asyncio.gather(*(batcher.submit("ok", i) for i in range(10)))
+        failed = await asyncio.gather(batcher.submit("boom", 1), return_exceptions=True)
+        return doubled, failed
+
+    doubled, failed = asyncio.run(main())
+    assert doubled == [i * 2 for i in range(10)]
+    assert sorted(sizes[:3]) == [2, 4, 4]
+    assert isinstance(failed[0], RuntimeError) and not isinstance(failed[0], Overloaded)
+
+
+def test_kb_search_batch_embeds_once_and_searches_once(monkeypatch):
+    embeds, searches = [], []
+
+    async def fake_embed(texts):
+        embeds.append(list(texts))
+        return [[1.0, float(i)] for i in range(len(texts))]
+
+    async def fake_batch(embeddings, match_count=5, filter=None):
+        searches.append(len(embeddings))
+        return [[{"id": i, "content": "c", "similarity": 0.5}] for i in range(len(embeddings))]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_batch_async", fake_batch)
+    monkeypatch.setattr(kb, "CONTEXT_PACKING", False)
+    out = asyncio.run(kb.kb_search_batch(["a", "b", "c"], k=2, hybrid=False))
+    assert embeds == [["a", "b", "c"]] and searches == [3]
+    assert [rows[0]["id"] for rows in out] == [0, 1, 2]
+
+
+def test_similarity_search_batch_uses_resident_index(monkeypatch):
+    index = LocalVectorIndex()
+    vectors = np.eye(4, dtype=np.float32)
+    index.add([{"id": i + 1, "url": f"u{i}"} for i in range(4)], embeddings=vectors)
+    index.last_sync = time.time()
+    monkeypatch.setattr(supabase_store, "USE_LOCAL_INDEX", True)
+    monkeypatch.setattr(local_index_search, "_local_index", index)
+    out = supabase_store.similarity_search_batch([[0, 1, 0, 0], [0, 0, 0, 1]], match_count=1)
+    assert [[r["id"] for r in rows] for rows in out] == [[2], [4]]
+
+
+def test_chat_streams_server_sent_events(monkeypatch):
+    async def fake_embed(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, **kwargs):
+        return [{"id": 7, "url": "file:///a.txt", "chunk_number": 0, "content": "Paris.", "similarity": 0.9}]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    app = create_app(agent=Agent(TestModel(), tools=[kb.kb_search]))
+
+    async def main():
+        async with _client(app) as client:
+            resp = await client.post("/chat", json={"message": "capital?", "mode": "tool"})
+            stats = (await client.get("/stats")).json()
+        return resp, stats
+
+    resp, stats = asyncio.run(main())
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in resp.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names[0] == "delta" and names[-1] == "done"
+    done = json.loads(events[-1][1].removeprefix("data: "))
+    assert [s["id"] for s in done["sources"]] == [7]
+    assert stats["chat"]["active"] == 0
+
+
+def test_chat_slot_is_released_when_the_response_never_starts():
+    app = create_app(agent=Agent(TestModel()), max_streams=1)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "path": "/chat",
+        "raw_path": b"/chat",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+    async def send(message):
+        # The client is gone before the first byte goes out.
+        raise OSError("connection reset")
+
+    async def main():
+        for _ in range(3):
+            body = [{"type": "http.request", "body": json.dumps({"message": "hi"}).encode()}]
+
+            async def receive():
+                return body.pop() if body else {"type": "http.disconnect"}
+
+            try:
+                await app(scope, receive, send)
+            except OSError:
+                pass
+        async with _client(app) as client:
+            return (await client.get("/stats")).json()
+
+    stats = asyncio.run(main())
+    assert stats["chat"] == {"active": 0, "rejected": 0}
@@ -0,0 +1,68 @@
+import asyncio
+import inspect
+import time
+
+from src.core.agent import kb
+from src.core.ingestion import embeddings, supabase_store
+from src.core.ingestion.embedding_backends import BatchingEmbedder, FakeEmbeddingBackend
+from src.core.ingestion.embedding_cache import EmbeddingCache
+
+
+def test_async_batches_overlap_and_match_sync():
+    backend = FakeEmbeddingBackend(dim=8, latency=0.05)
+    embedder = BatchingEmbedder(backend, max_items=2, max_concurrency=4)
+    texts = [f"text {i}" for i in range(8)]
+    t0 = time.perf_counter()
+    out = asyncio.run(embedder.aembed(texts))
+    assert time.perf_counter() - t0 < 4 * 0.05
+    assert out == embedder.embed(texts)
+
+
+def test_embed_texts_async_uses_cache(monkeypatch):
+    sent = []
+
+    async def fake_embed(texts, dimensions=None):
+        sent.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    cache = EmbeddingCache(path=None)
+    monkeypatch.setattr(embeddings, "_aembed_uncached", fake_embed)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+
+    first = asyncio.run(embeddings.embed_texts_async(["aa", "b", "aa"]))
+    second = asyncio.run(embeddings.embed_texts_async(["ccc", "b"]))
+    assert sent == [["aa", "b"], ["ccc"]]
+    assert first == [[2.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+    assert second == [[3.0, 1.0], [1.0, 1.0]]
+
+
+def test_similarity_search_async_prefers_pg(monkeypatch):
+    async def fake_pg(emb, k, filter, query_text=None):
+        return [{"id": 1, "similarity": 0.9}]
+
+    monkeypatch.setattr(supabase_store, "USE_LOCAL_INDEX", False)
+    monkeypatch.setattr(supabase_store, "get_database_url", lambda: "postgresql://x")
+    monkeypatch.setattr(supabase_store, "pg_similarity_search_async", fake_pg)
+    assert asyncio.run(supabase_store.similarity_search_async([0.1], 1)) == [{"id": 1, "similarity": 0.9}]
+
+
+def test_kb_search_calls_run_concurrently(monkeypatch):
+    async def fake_embed(texts):
+        await asyncio.sleep(0.05)
+        return [[1.0, 0.0] for _ in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, **kwargs):
+        await asyncio.sleep(0.05)
+        return [{"id": 1, "url": "file:///a.txt", "content": "hello", "similarity": 0.8}]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    assert inspect.iscoroutinefunction(kb.kb_search.function)
+
+    async def three_queries():
+        return await asyncio.gather(*(kb.kb_search.function(f"q{i}", k=1) for i in range(3)))
+
+    t0 = time.perf_counter()
+    results = asyncio.run(three_queries())
+    assert time.perf_counter() - t0 < 3 * 0.1
+    assert all(r[0]["content"] == "hello" for r in results)
@@ -0,0 +1,56 @@
+from benchmarks import compare, run_suite
+from benchmarks.synthetic import MemoryChunkStore, synthetic_vector_blocks
+from src.core.ingestion.pipeline import IngestPipeline
+
+
+def test_memory_store_supports_incremental_ingest(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("".join(f"para {i:03d} " + "z" * 200 + "\n\n" for i in range(12)))
+    store = MemoryChunkStore()
+
+    def pipeline():
+        return IngestPipeline(
+            embed_fn=lambda texts: [[1.0, 0.0] for _ in texts],
+            upsert_fn=store.upsert,
+            fetch_hashes_fn=store.fetch_chunk_hashes,
+            delete_tail_fn=store.delete,
+            max_chars=500,
+            overlap=50,
+            incremental=True,
+        )
+
+    first = pipeline().run([str(path)])
+    assert first == len(store.rows) > 1
+    assert pipeline().run([str(path)]) == 0
+
+    path.write_text("para 000 " + "z" * 200)
+    pipeline().run([str(path)])
+    assert len(store.rows) == 1
+
+
+def test_vector_blocks_regenerate_identically():
+    a = dict(synthetic_vector_blocks(250, 16, block=100))
+    b = dict(synthetic_vector_blocks(250, 16, block=100))
+    assert sorted(a) == [0, 100, 200] and a[200].shape == (50, 16)
+    assert all((a[s] == b[s]).all() for s in a)
+    extra = next(synthetic_vector_blocks(10, 16, block=100, offset=250))[1]
+    assert not (extra == a[0][:10]).any()
+
+
+def test_search_section_reports_recall_and_compare_flags_regressions(monkeypatch, tmp_path):
+    for key in ("EMBED_BACKEND", "EMBED_FAKE_DIM", "EMBED_FAKE_LATENCY", "EMBED_CACHE"):
+        monkeypatch.setenv(key, "")
+    out = tmp_path / "base.json"
+    report = run_suite.main(
+        ["--sections", "search", "--sizes", "2000", "--dim", "32", "--queries", "5",
+         "--layouts", "float32,prefix8", "--out", str(out)]
+    )
+    rows = report["results"]["search"]
+    assert [r["layout"] for r in rows] == ["float32", "prefix8"]
+    assert rows[0]["recall_at_k"] == 1.0
+    assert {"p50_ms", "p95_ms", "p99_ms", "qps"} <= set(rows[0])
+
+    worse = {"results": {"search": [dict(rows[0], p99_ms=rows[0]["p99_ms"] * 2, recall_at_k=0.9)]}}
+    flagged = {(r["metric"], r["regressed"]) for r in compare.compare_reports(report, worse)}
+    assert ("p99_ms", True) in flagged and ("recall_at_k", True) in flagged
+    assert ("p50_ms", False) in flagged
@@ -1,4 +1,4 @@
-from src.ingestion.chunking import simple_chunk_text
+from src.core.ingestion.chunking import simple_chunk_text
 
 
 def test_overlap_effect():
@@ -0,0 +1,99 @@
+import random
+
+from src.core.ingestion.chunking import (
+    ChunkSpan,
+    stream_chunk_spans,
+    structure_chunk_spans,
+)
+
+
+def _prose(n_paragraphs=40, seed=0):
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "vector", "index", "query", "chunk"]
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        sentences = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(4, 18))).capitalize() + "."
+            for _ in range(rng.randint(2, 8))
+        ]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def _covered(text, spans):
+    covered = bytearray(len(text))
+    for span in spans:
+        covered[span.start : span.end] = b"\x01" * (span.end - span.start)
+    return all(covered[i] or text[i].isspace() for i in range(len(text)))
+
+
+def test_spans_respect_size_overlap_and_coverage():
+    text = _prose()
+    spans = structure_chunk_spans(text, max_chars=500, overlap=100)
+    assert len(spans) >= 3
+    assert all(0 < len(s) <= 500 for s in spans)
+    assert [s.chunk_number for s in spans] == list(range(len(spans)))
+    for prev, nxt in zip(spans, list(spans)[1:]):
+        assert prev.start < nxt.start
+        assert prev.end - nxt.start <= 100
+    assert _covered(text, spans)
+
+
+def test_overlap_effect():
+    text = _prose()
+    no_overlap = structure_chunk_spans(text, max_chars=500, overlap=0)
+    with_overlap = structure_chunk_spans(text, max_chars=500, overlap=100)
+    assert len(with_overlap) > len(no_overlap)
+    assert all(a.end <= b.start for a, b in zip(no_overlap, list(no_overlap)[1:]))
+
+
+def test_breaks_at_sentence_and_word_boundaries():
+    text = _prose()
+    spans = structure_chunk_spans(text, max_chars=400, overlap=60)
+    for i, span in enumerate(spans):
+        chunk = spans.text(i)
+        assert chunk == chunk.strip()
+        if span.end < len(text.rstrip()):
+            assert chunk.endswith(".")
+        assert span.start == 0 or text[span.start - 1].isspace()
+
+
+def test_unbroken_text_hard_cuts():
+    text = "A" * 3000
+    spans = structure_chunk_spans(text, max_chars=1000, overlap=100)
+    assert len(spans) >= 3
+    assert all(len(s) <= 1000 for s in spans)
+    assert _covered(text, spans)
+
+
+def test_empty_and_whitespace():
+    assert len(structure_chunk_spans("", 1000, 100)) == 0
+    assert len(structure_chunk_spans(" \n\n \t", 1000, 100)) == 0
+    assert list(stream_chunk_spans(["", "  \n"], 1000, 100)) == []
+
+
+def test_stream_matches_full_text_for_any_segmentation():
+    text = _prose(seed=3)
+    spans = structure_chunk_spans(text, 600, 120)
+    expected = [(s.start, s.end, spans.text(s.chunk_number)) for s in spans]
+    rng = random.Random(1)
+    for _ in range(5):
+        cuts = sorted(rng.sample(range(1, len(text)), 30))
+        pieces = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        got = [(s.start, s.end, chunk) for s, chunk in stream_chunk_spans(iter(pieces), 600, 120)]
+        assert got == expected
+
+
+def test_stream_tags_pages():
+    pages = [(1, "First page. " * 50 + "\n"), (2, "Second page. " * 50 + "\n")]
+    spans = [s for s, _ in stream_chunk_spans(pages, max_chars=300, overlap=0)]
+    assert isinstance(spans[0], ChunkSpan)
+    assert spans[0].page == 1 and spans[-1].page == 2
+    boundary = len(pages[0][1])
+    assert all(s.page == (1 if s.start < boundary else 2) for s in spans)
+
+
+def test_full_text_pages_from_offsets():
+    text = "One. " * 100 + "Two. " * 100
+    spans = structure_chunk_spans(text, max_chars=200, overlap=0, page_starts=[0, 500])
+    assert all(s.page == (1 if s.start < 500 else 2) for s in spans)
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+from src.core import clients
+
+
+def test_sync_clients_are_shared_and_refreshable(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    clients.close_clients()
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(clients.get_openai_client())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(c) for c in seen}) == 1
+    assert clients.get_http_client() is clients.get_http_client()
+
+    first = clients.get_openai_client()
+    clients.refresh_clients()
+    assert clients.get_openai_client() is not first
+    clients.close_clients()
+
+
+def test_supabase_clients_do_not_share_http_state():
+    clients.close_clients()
+    a = clients.get_supabase_client("https://aaa.supabase.co", "key-a")
+    assert clients.get_supabase_client("https://aaa.supabase.co", "key-a") is a
+    b = clients.get_supabase_client("https://bbb.supabase.co", "key-b")
+    assert a.options.httpx_client is not b.options.httpx_client
+    session = a.postgrest.session
+    b.postgrest.session  # builds b's REST session after a's
+    assert str(session.base_url) == "https://aaa.supabase.co/rest/v1/"
+    assert session.headers["apikey"] == "key-a"
+    clients.close_clients()
+    assert session.is_closed
+
+
+def test_async_client_is_per_event_loop(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    async def grab():
+        return clients.get_async_openai_client(), clients.get_async_openai_client()
+
+    a1, a2 = asyncio.run(grab())
+    b1, _ = asyncio.run(grab())
+    assert a1 is a2
+    assert a1 is not b1
+
+    async def close():
+        clients.get_async_openai_client()
+        await clients.aclose_clients()
+
+    asyncio.run(close())
@@ -0,0 +1,50 @@
+from src.core.agent.context import merge_adjacent, merge_overlap, mmr_order, pack_context
+from src.core.ingestion.chunking import simple_chunk_text
+
+
+def _rows(text, url="file:///doc.txt", max_chars=300, overlap=60):
+    chunks = simple_chunk_text(text, max_chars=max_chars, overlap=overlap)
+    return [
+        {"id": i + 1, "url": url, "chunk_number": i, "content": c, "similarity": 0.9 - i / 100, "metadata": {}}
+        for i, c in enumerate(chunks)
+    ]
+
+
+TEXT = " ".join(f"sentence number {i} talks about topic {i % 7}." for i in range(60))
+
+
+def test_merge_overlap_removes_repeated_text():
+    assert merge_overlap("the quick brown fox jumps high", "brown fox jumps high over the dog", max_overlap=100) == (
+        "the quick brown fox jumps high over the dog"
+    )
+    assert merge_overlap("abc", "xyz") == "abc\nxyz"
+
+
+def test_adjacent_chunks_rebuild_the_source_span():
+    rows = _rows(TEXT)
+    blocks = merge_adjacent(rows[1:4] + rows[6:7] + rows[2:3])
+    assert [b["chunk_numbers"] for b in blocks] == [[1, 2, 3], [6]]
+    first = blocks[0]
+    assert first["content"] in TEXT
+    assert first["similarity"] == rows[1]["similarity"]
+    assert first["ids"] == [2, 3, 4]
+    total_raw = sum(len(r["content"]) for r in rows[1:4])
+    assert len(first["content"]) < total_raw
+
+
+def test_pack_respects_budget_and_keeps_top_block():
+    rows = _rows(TEXT) + _rows(TEXT, url="file:///other.txt")
+    packed = pack_context(rows, token_budget=200, mmr_lambda=1.0)
+    assert packed[0]["url"] == "file:///doc.txt"
+    assert sum(b["tokens"] for b in packed) <= 200 or len(packed) == 1
+    assert pack_context(rows[:1], token_budget=1)[0]["id"] == 1
+
+
+def test_mmr_prefers_novel_blocks():
+    blocks = [
+        {"content": "red green blue", "similarity": 0.9},
+        {"content": "red green blue", "similarity": 0.89},
+        {"content": "cats and dogs", "similarity": 0.8},
+    ]
+    assert [b["content"] for b in mmr_order(blocks, 0.5)][:2] == ["red green blue", "cats and dogs"]
+    assert mmr_order(blocks, 1.0) == blocks
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from src.core.ingestion.embedding_backends import (
+    BatchingEmbedder,
+    FakeEmbeddingBackend,
+    OpenAIEmbeddingBackend,
+    plan_batches,
+)
+
+
+def test_plan_batches_preserves_order_and_limits():
+    texts = ["word " * 50] * 7
+    batches = plan_batches(texts, max_tokens=120, max_items=10)
+    assert [i for b in batches for i in b] == list(range(7))
+    assert all(len(b) <= 2 for b in batches)
+    assert plan_batches(["x"] * 5, max_items=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_batching_embedder_is_deterministic_and_concurrent():
+    backend = FakeEmbeddingBackend(dim=8, latency=0.05)
+    embedder = BatchingEmbedder(backend, max_items=2, max_concurrency=4)
+    texts = [f"text {i}" for i in range(8)]
+    t0 = time.perf_counter()
+    out = embedder.embed(texts)
+    elapsed = time.perf_counter() - t0
+    assert backend.calls == 4
+    assert elapsed < 4 * 0.05  # batches overlapped
+    assert out == [backend.vector(t).tolist() for t in texts]
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+def test_openai_backend_retries_rate_limits(monkeypatch):
+    calls = []
+
+    class _Embeddings:
+        def create(self, model, input):
+            calls.append(input)
+            if len(calls) < 3:
+                raise _RateLimited()
+            data = [type("D", (), {"index": i, "embedding": [float(i)]})() for i in range(len(input))]
+            return type("R", (), {"data": data[::-1]})()
+
+    backend = OpenAIEmbeddingBackend("m", api_key="k", backoff_base=0.001)
+    monkeypatch.setattr(backend, "_client", lambda: type("C", (), {"embeddings": _Embeddings()})())
+    assert backend.embed(["a", "b"]) == [[0.0], [1.0]]
+    assert len(calls) == 3
+
+
+def test_openai_backend_gives_up_on_other_errors(monkeypatch):
+    class _Embeddings:
+        def create(self, model, input):
+            raise ValueError("bad request")
+
+    backend = OpenAIEmbeddingBackend("m", api_key="k")
+    monkeypatch.setattr(backend, "_client", lambda: type("C", (), {"embeddings": _Embeddings()})())
+    with pytest.raises(ValueError):
+        backend.embed(["a"])
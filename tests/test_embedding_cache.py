@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.core.ingestion import embeddings
+from src.core.ingestion.embedding_cache import EmbeddingCache, cache_from_env
+
+
+def test_memory_lru_and_stats():
+    cache = EmbeddingCache(path=None, max_memory_items=2)
+    cache.put_many("m", ["a", "b", "c"], np.eye(3))
+    got = cache.get_many("m", ["a", "c"])
+    assert got[0] is None
+    np.testing.assert_array_equal(got[1], [0, 0, 1])
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    cache = EmbeddingCache(path=path)
+    cache.put_many("m", ["hello"], [[0.5, 0.25]])
+    cache.close()
+
+    reopened = EmbeddingCache(path=path)
+    assert reopened.get_many("other-model", ["hello"]) == [None]
+    np.testing.assert_array_equal(reopened.get_many("m", ["hello"])[0], [0.5, 0.25])
+    assert reopened.stats["disk_hits"] == 1
+
+
+def test_disk_size_eviction(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite"), max_memory_items=1, max_disk_bytes=64)
+    texts = [f"t{i}" for i in range(10)]
+    cache.put_many("m", texts, np.ones((10, 4)))  # 16 bytes each
+    assert cache.stats["evictions"] > 0
+    assert cache._disk_bytes <= 64
+
+
+def test_embed_texts_only_sends_misses(monkeypatch):
+    sent = []
+
+    def fake_embed(texts, dimensions=None):
+        sent.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    monkeypatch.setattr(embeddings, "_embed_uncached", fake_embed)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+    cache = EmbeddingCache(path=None)
+
+    first = embeddings.embed_texts(["aa", "b", "aa"])
+    second = embeddings.embed_texts(["ccc", "b"])
+    assert sent == [["aa", "b"], ["ccc"]]
+    assert first == [[2.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+    assert second == [[3.0, 1.0], [1.0, 1.0]]
+
+
+def test_default_disk_path_is_per_user_not_cwd(tmp_path, monkeypatch):
+    monkeypatch.delenv("EMBED_CACHE_PATH")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    monkeypatch.chdir(tmp_path)
+    cache = cache_from_env()
+    cache.close()
+    assert cache.path == str(tmp_path / "xdg" / "rag-vs" / "embeddings.sqlite")
+    assert not (tmp_path / ".cache").exists()
+
+    monkeypatch.setenv("EMBED_CACHE_PATH", "")
+    assert cache_from_env().path is None
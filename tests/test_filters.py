@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from pydantic_ai import ModelRetry
+
+from src.core.agent import kb
+from src.core.ingestion import supabase_store
+from src.core.ingestion.filters import matches_filter, validate_filter
+from src.core.ingestion.local_index import LocalVectorIndex
+
+ROW = {
+    "id": 1,
+    "url": "file:///docs/guide.pdf",
+    "source": "upload",
+    "metadata": {"source": "upload", "page": 3, "tags": ["a", "b"], "author": {"name": "Ann"}},
+    "created_at": "2024-05-01 12:00:00+00",
+}
+
+
+@pytest.mark.parametrize(
+    "filter,expected",
+    [
+        ({}, True),
+        ({"source": "upload"}, True),
+        ({"source": ["web", "upload"]}, True),
+        ({"source": "web"}, False),
+        ({"url": "file:///docs/guide.pdf"}, True),
+        ({"url_prefix": "file:///docs/"}, True),
+        ({"url_prefix": "file:///other/"}, False),
+        ({"created_after": "2024-05-01T12:00:00Z"}, True),
+        ({"created_after": "2024-06-01"}, False),
+        ({"created_before": "2024-05-01T12:00:00+00:00"}, False),
+        ({"created_before": "2025-01-01"}, True),
+        ({"metadata": {"tags": ["b"], "author": {"name": "Ann"}}}, True),
+        ({"metadata": {"tags": ["c"]}}, False),
+        ({"page": 3}, True),
+        ({"page": 4}, False),
+    ],
+)
+def test_matches_filter_mirrors_sql(filter, expected):
+    assert matches_filter(ROW, validate_filter(filter)) is expected
+
+
+def test_validate_filter_rejects_bad_values():
+    for bad in ({"created_after": "yesterday"}, {"source": 3}, {"metadata": "x"}, {"url_prefix": 1}):
+        with pytest.raises(ValueError):
+            validate_filter(bad)
+
+
+def test_local_index_filters_before_top_k():
+    index = LocalVectorIndex()
+    rows = [
+        {**ROW, "id": i, "url": f"file:///{'docs' if i % 10 == 0 else 'misc'}/{i}.txt", "embedding": [1.0, i / 100]}
+        for i in range(1, 101)
+    ]
+    index.add(rows)
+    res = index.search([1.0, 0.0], k=5, filter={"url_prefix": "file:///docs/"})
+    assert [r["id"] for r in res] == [10, 20, 30, 40, 50]
+
+
+def test_kb_search_passes_filter_to_the_store(monkeypatch):
+    seen = []
+
+    async def fake_embed(texts):
+        return [[1.0] for _ in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, **kwargs):
+        seen.append((match_count, filter))
+        return []
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    asyncio.run(kb.kb_search.function("q", k=3, filter={"source": "upload"}))
+    assert seen == [(3, {"source": "upload"})]
+    with pytest.raises(ModelRetry):
+        asyncio.run(kb.kb_search.function("q", filter={"created_after": "soon"}))
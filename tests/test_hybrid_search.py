@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from src.core.agent import kb
+from src.core.ingestion import supabase_store
+from src.core.ingestion.lexical import BM25Index, rrf_fuse, tokenize
+from src.core.ingestion.local_index import LocalVectorIndex
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert tokenize("Error E1234 in get_client()") == ["error", "e1234", "in", "get_client"]
+
+
+def test_bm25_prefers_rare_terms_and_tracks_upserts():
+    index = BM25Index()
+    index.add(0, "the pump failed with error code E1234")
+    index.add(1, "the pump failed again")
+    index.add(2, "the valve is fine")
+    scores = index.scores("pump E1234", 3)
+    assert scores[0] > scores[1] > 0 and scores[2] == 0
+    index.add(0, "rewritten without the code")
+    assert index.scores("E1234", 3).tolist() == [0.0, 0.0, 0.0]
+
+
+def test_rrf_fuse_rewards_agreement():
+    fused = rrf_fuse([["a", "b", "c"], ["c", "a"]], k=60)
+    assert [doc for doc, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert len(rrf_fuse([["a", "b"]], limit=1)) == 1
+
+
+def test_local_hybrid_surfaces_exact_term_match():
+    index = LocalVectorIndex()
+    rows = [
+        {"id": i, "url": f"file:///{i}.txt", "chunk_number": 0, "content": f"general maintenance notes {i}", "embedding": [1.0, i / 100]}
+        for i in range(1, 50)
+    ]
+    rows.append({"id": 99, "url": "file:///codes.txt", "chunk_number": 0, "content": "Part number XK-7731 is discontinued", "embedding": [0.0, 1.0]})
+    index.add(rows)
+    assert 99 not in [r["id"] for r in index.search([1.0, 0.0], k=5)]
+    hybrid = index.search_hybrid("XK-7731 replacement", [1.0, 0.0], k=5)
+    assert 99 in [r["id"] for r in hybrid]
+    assert all("score" in r and "similarity" in r for r in hybrid)
+    filtered = index.search_hybrid("XK-7731", [1.0, 0.0], k=5, filter={"url_prefix": "file:///1"})
+    assert filtered and 99 not in [r["id"] for r in filtered]
+
+
+def test_store_routes_hybrid_queries_and_requires_text(monkeypatch):
+    calls = []
+    monkeypatch.setattr(supabase_store, "get_database_url", lambda: "postgresql://x")
+    monkeypatch.setattr(
+        supabase_store,
+        "pg_similarity_search",
+        lambda emb, k, f, q=None: calls.append(q) or [{"id": 1, "similarity": 0.5, "score": 0.03}],
+    )
+    supabase_store.similarity_search([0.1], hybrid=True, query_text="E1234")
+    supabase_store.similarity_search([0.1], query_text="E1234")
+    assert calls == ["E1234", None]
+    with pytest.raises(ValueError):
+        supabase_store.similarity_search([0.1], hybrid=True)
+
+
+def test_kb_search_forwards_hybrid_and_keeps_fused_order(monkeypatch):
+    seen = []
+
+    async def fake_embed(texts):
+        return [[1.0] for _ in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, hybrid=None, query_text=None):
+        seen.append((hybrid, query_text))
+        return [
+            {"id": 1, "url": "a", "chunk_number": 0, "content": "x", "similarity": 0.9, "score": 0.016},
+            {"id": 2, "url": "b", "chunk_number": 0, "content": "y", "similarity": 0.4, "score": 0.032},
+        ]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    out = asyncio.run(kb.kb_search.function("E1234", hybrid=True))
+    assert seen == [(True, "E1234")]
+    assert [r["id"] for r in out] == [2, 1]
@@ -0,0 +1,129 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+
+import pytest
+
+from src.core.ingestion import index_admin
+
+
+class _Cursor:
+    def __init__(self, row):
+        self._row = row
+
+    def fetchone(self):
+        return self._row
+
+    def fetchall(self):
+        return []
+
+
+class _Conn:
+    """Records statements; answers the catalog queries `index_status` issues."""
+
+    def __init__(self, reltuples=250_000):
+        self.sql = []
+        self.reltuples = reltuples
+
+    def execute(self, sql, params=None):
+        self.sql.append(sql)
+        if "reltuples" in sql:
+            return _Cursor((self.reltuples,))
+        if "pg_get_indexdef" in sql:
+            return _Cursor(("ivfflat", "CREATE INDEX ...", 8192, ["lists=250"], True))
+        return _Cursor(None)
+
+
+def test_ivfflat_lists_follow_pgvector_guidance():
+    assert index_admin.ivfflat_lists(0) == 1
+    assert index_admin.ivfflat_lists(250_000) == 250
+    assert index_admin.ivfflat_lists(4_000_000) == 2000
+
+
+def test_profile_query_raises_ef_search_to_match_count():
+    assert index_admin.profile_query("") is None
+    sql, params = index_admin.profile_query("accurate", match_count=200)
+    assert "hnsw.ef_search" in sql and "ivfflat.probes" in sql
+    assert params[0] == "200" and params[1] == index_admin.SEARCH_PROFILES["accurate"].probe_fraction
+    with pytest.raises(ValueError):
+        index_admin.profile_query("warp")
+
+
+def test_build_index_swaps_in_a_concurrent_build():
+    conn = _TxConn()
+    report = index_admin.build_index(method="ivfflat", conn=conn)
+    creates = [s for s in conn.sql if s.startswith("CREATE INDEX")]
+    assert creates == [
+        "CREATE INDEX CONCURRENTLY rag_pages_embedding_idx_new ON rag_pages "
+        "USING ivfflat (embedding vector_cosine_ops) WITH (lists = 250)"
+    ]
+    order = [s for s in conn.sql if s.startswith(("DROP", "ALTER", "CREATE", "BEGIN", "COMMIT"))]
+    assert order == [
+        "DROP INDEX CONCURRENTLY IF EXISTS rag_pages_embedding_idx_new",
+        "DROP INDEX CONCURRENTLY IF EXISTS rag_pages_embedding_idx_old",
+        creates[0],
+        # Both renames in one transaction: the canonical name always resolves.
+        "BEGIN",
+        "ALTER INDEX IF EXISTS rag_pages_embedding_idx RENAME TO rag_pages_embedding_idx_old",
+        "ALTER INDEX rag_pages_embedding_idx_new RENAME TO rag_pages_embedding_idx",
+        "COMMIT",
+        "DROP INDEX CONCURRENTLY IF EXISTS rag_pages_embedding_idx_old",
+    ]
+    assert report.method == "ivfflat" and report.options == {"lists": "250"}
+    assert report.size_bytes == 8192 and report.build_seconds is not None
+    with pytest.raises(ValueError):
+        index_admin.build_index(method="flat", conn=conn)
+
+
+class _TxConn(_Conn):
+    """`_Conn` that records transaction boundaries, sync and async."""
+
+    @contextmanager
+    def transaction(self):
+        self.sql.append("BEGIN")
+        yield
+        self.sql.append("COMMIT")
+
+
+class _AsyncCursor(_Cursor):
+    async def fetchall(self):
+        return []
+
+
+class _AsyncTxConn(_TxConn):
+    async def execute(self, sql, params=None):
+        _TxConn.execute(self, sql, params)
+        return _AsyncCursor(None)
+
+    @asynccontextmanager
+    async def transaction(self):
+        with _TxConn.transaction(self):
+            yield
+
+
+def test_pg_search_applies_profile_in_the_search_transaction(monkeypatch):
+    from src.core.ingestion import pgvector_search
+
+    conn = _TxConn()
+    pool = type("Pool", (), {"connection": lambda self: nullcontext(conn)})()
+    monkeypatch.setattr(pgvector_search, "get_pool", lambda: pool)
+    monkeypatch.setattr(index_admin, "SEARCH_PROFILE", "fast")
+    pgvector_search.pg_similarity_search([0.1, 0.2], match_count=5)
+    # Pool connections are autocommit: set_config(..., true) only reaches
+    # the search if both run inside one explicit transaction.
+    assert conn.sql[0] == "BEGIN" and conn.sql[-1] == "COMMIT"
+    assert "hnsw.ef_search" in conn.sql[1] and "match_rag_pages" in conn.sql[2]
+
+    aconn = _AsyncTxConn()
+
+    async def get_async_pool():
+        return type("Pool", (), {"connection": lambda self: nullcontext(aconn)})()
+
+    monkeypatch.setattr(pgvector_search, "get_async_pg_pool", get_async_pool)
+    asyncio.run(pgvector_search.pg_similarity_search_batch_async([[0.1, 0.2]], match_count=5))
+    assert aconn.sql[0] == "BEGIN" and aconn.sql[-1] == "COMMIT"
+    assert "hnsw.ef_search" in aconn.sql[1] and "batch_match_rag_pages" in aconn.sql[2]
+
+    monkeypatch.setattr(index_admin, "SEARCH_PROFILE", "")
+    conn.sql.clear()
+    pgvector_search.pg_similarity_search([0.1, 0.2], match_count=5)
+    assert len(conn.sql) == 1 and "match_rag_pages" in conn.sql[0]
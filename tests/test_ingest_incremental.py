@@ -0,0 +1,116 @@
+import pytest
+
+from src.core.ingestion import ingest, supabase_store
+
+
+@pytest.fixture
+def fake_store(monkeypatch):
+    table = {}
+    calls = {"embedded": [], "deleted": []}
+
+    def upsert(rows):
+        for r in rows:
+            table[(r["url"], r["chunk_number"])] = r
+
+    def fetch(url):
+        return {
+            n: {"chunk_hash": r["metadata"]["chunk_hash"], "file_hash": r["metadata"]["file_hash"]}
+            for (u, n), r in table.items()
+            if u == url
+        }
+
+    def delete_from(url, first):
+        calls["deleted"].append((url, first))
+        for key in [k for k in table if k[0] == url and k[1] >= first]:
+            del table[key]
+
+    def embed(texts):
+        calls["embedded"].extend(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+    monkeypatch.setattr(supabase_store, "upsert_chunks", upsert)
+    monkeypatch.setattr(supabase_store, "fetch_chunk_hashes", fetch)
+    monkeypatch.setattr(supabase_store, "delete_chunks_from", delete_from)
+    monkeypatch.setattr(ingest, "embed_texts", embed)
+    return table, calls
+
+
+def _paragraphs(n):
+    return "".join(f"paragraph {i:03d} " + "x" * 280 + "\n" for i in range(n))
+
+
+def test_unchanged_file_is_skipped(tmp_path, fake_store):
+    table, calls = fake_store
+    doc = tmp_path / "doc.txt"
+    doc.write_text(_paragraphs(10))
+    first = ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True)
+    assert first == len(table) > 1
+    calls["embedded"].clear()
+    assert ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True) == 0
+    assert calls["embedded"] == []
+
+
+def test_only_changed_chunks_are_embedded_and_tail_is_deleted(tmp_path, fake_store):
+    table, calls = fake_store
+    doc = tmp_path / "doc.txt"
+    doc.write_text(_paragraphs(10))
+    ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True)
+    before = len(table)
+
+    doc.write_text(_paragraphs(4))
+    calls["embedded"].clear()
+    ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True)
+    after = {n for (_, n) in table}
+    assert len(after) < before
+    assert after == set(range(len(after)))
+    # chunk 0 (file hash carrier) plus the changed last chunk at most
+    assert len(calls["embedded"]) <= 2
+
+
+def test_full_mode_always_trims_tail(tmp_path, fake_store):
+    table, calls = fake_store
+    doc = tmp_path / "doc.txt"
+    doc.write_text(_paragraphs(10))
+    ingest.ingest_paths([str(doc)], max_chars=600, overlap=50)
+    doc.write_text(_paragraphs(2))
+    count = ingest.ingest_paths([str(doc)], max_chars=600, overlap=50)
+    assert len(table) == count
+    assert calls["deleted"][-1][1] == count
+
+
+def test_rerun_after_failure_mid_file_leaves_no_stale_rows(tmp_path, fake_store, monkeypatch):
+    table, calls = fake_store
+    doc = tmp_path / "doc.txt"
+    doc.write_text(_paragraphs(20))
+    ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True)
+
+    doc.write_text(_paragraphs(20).replace("x", "y"))
+    upsert = supabase_store.upsert_chunks
+    batches = []
+
+    def failing_upsert(rows):
+        if batches:
+            raise RuntimeError("connection lost")
+        batches.append(rows)
+        upsert(rows)
+
+    monkeypatch.setattr(supabase_store, "upsert_chunks", failing_upsert)
+    with pytest.raises(RuntimeError):
+        ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True, max_batch_rows=3)
+    assert 0 < len(batches[0]) < len(table)
+
+    monkeypatch.setattr(supabase_store, "upsert_chunks", upsert)
+    ingest.ingest_paths([str(doc)], max_chars=600, overlap=50, incremental=True)
+    assert all("x" * 10 not in r["content"] for r in table.values())
+
+
+def test_new_source_label_rewrites_unchanged_chunks(tmp_path, fake_store):
+    table, calls = fake_store
+    doc = tmp_path / "doc.txt"
+    doc.write_text(_paragraphs(10))
+    count = ingest.ingest_paths([str(doc)], source="old", max_chars=600, overlap=50, incremental=True)
+    calls["embedded"].clear()
+
+    assert ingest.ingest_paths([str(doc)], source="new", max_chars=600, overlap=50, incremental=True) == count
+    assert {r["source"] for r in table.values()} == {"new"}
+    assert {r["metadata"]["source"] for r in table.values()} == {"new"}
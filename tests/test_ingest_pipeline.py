@@ -0,0 +1,95 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from src.core.ingestion import pipeline as pipeline_mod
+from src.core.ingestion.pdf_text import PdfPage
+from src.core.ingestion.pipeline import IngestPipeline
+
+
+def _write_docs(tmp_path, n_files=3, paragraphs=12):
+    paths = []
+    for f in range(n_files):
+        p = tmp_path / f"doc{f}.txt"
+        p.write_text("".join(f"file {f} para {i:03d} " + "y" * 200 + "\n" for i in range(paragraphs)))
+        paths.append(str(p))
+    return paths
+
+
+def _pipeline(batches, **kwargs):
+    return IngestPipeline(
+        embed_fn=lambda texts: [[0.0, 1.0] for _ in texts],
+        upsert_fn=lambda rows: batches.append(list(rows)),
+        max_chars=500,
+        overlap=50,
+        **kwargs,
+    )
+
+
+def test_batches_are_bounded_and_progress_reported(tmp_path):
+    batches, seen = [], []
+    pipeline = _pipeline(batches, max_batch_rows=4, embed_batch_rows=3, on_progress=lambda p: seen.append(p.files_done))
+    total = pipeline.run(_write_docs(tmp_path))
+    assert total == sum(len(b) for b in batches)
+    assert all(len(b) <= 4 for b in batches)
+    assert all("embedding" in r for b in batches for r in b)
+    assert seen[-1] == 3 and seen == sorted(seen)
+
+
+def test_checkpoint_resumes_after_committed_files(tmp_path):
+    paths = _write_docs(tmp_path)
+    checkpoint = str(tmp_path / "ckpt.json")
+    first = []
+    _pipeline(first, checkpoint_path=checkpoint).run(paths[:2])
+    second = []
+    _pipeline(second, checkpoint_path=checkpoint).run(paths)
+    assert {r["url"] for b in second for r in b} == {f"file://{tmp_path.resolve() / 'doc2.txt'}"}
+
+
+def test_stage_errors_propagate(tmp_path):
+    def boom(texts):
+        raise RuntimeError("embedding failed")
+
+    pipeline = IngestPipeline(embed_fn=boom, upsert_fn=lambda rows: None)
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        pipeline.run(_write_docs(tmp_path, n_files=5))
+
+
+def test_small_files_share_embedding_calls(tmp_path):
+    calls, batches = [], []
+
+    def embed(texts):
+        calls.append(len(texts))
+        time.sleep(0.05)
+        return [[0.0, 1.0] for _ in texts]
+
+    paths = _write_docs(tmp_path, n_files=20, paragraphs=1)
+    total = IngestPipeline(embed_fn=embed, upsert_fn=lambda rows: batches.append(list(rows))).run(paths)
+    assert total == sum(calls) == 20
+    assert len(calls) <= 5
+    assert {r["url"] for b in batches for r in b if "embedding" in r} == {f"file://{Path(p).resolve()}" for p in paths}
+
+
+def test_pdf_pages_stream_into_the_chunker(tmp_path, monkeypatch):
+    pulled = []
+
+    def fake_pages(path):
+        for n in range(1, 201):
+            pulled.append(n)
+            yield PdfPage(n, f"page {n} " + "z" * 400, None)
+
+    monkeypatch.setattr(pipeline_mod, "iter_pdf_pages", fake_pages)
+    pdf = tmp_path / "big.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    pulled_at_embed = []
+
+    def embed(texts):
+        pulled_at_embed.append(len(pulled))
+        return [[0.0, 1.0] for _ in texts]
+
+    batches = []
+    pipeline = IngestPipeline(embed_fn=embed, upsert_fn=batches.append, max_chars=500, overlap=50, embed_batch_rows=8)
+    assert pipeline.run([str(pdf)]) == 200
+    # Pages are read as they are chunked, not all before the first embedding call.
+    assert pulled_at_embed[0] < 50
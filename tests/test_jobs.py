@@ -0,0 +1,197 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from src.core.ingestion.job_workers import JobWorkerPool
+from src.core.ingestion.jobs import JobStore
+from src.core.ingestion.pipeline import IngestCancelled, IngestPipeline, IngestProgress
+
+
+def _store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"), str(tmp_path / "jobs"))
+
+
+def _wait(store, job_id, statuses=("done", "failed", "cancelled"), timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} stuck in {store.get(job_id).status}")
+
+
+def _pipeline_ingest(batches, embed_fn=None, max_batch_rows=2):
+    def ingest(paths, **kwargs):
+        pipeline = IngestPipeline(
+            embed_fn=embed_fn or (lambda texts: [[0.0, 1.0] for _ in texts]),
+            upsert_fn=lambda rows: batches.append(list(rows)),
+            max_chars=300,
+            overlap=30,
+            max_batch_rows=max_batch_rows,
+            embed_batch_rows=max_batch_rows,
+            **kwargs,
+        )
+        return pipeline.run(paths)
+
+    return ingest
+
+
+def test_job_runs_in_background_with_per_file_progress(tmp_path):
+    store = _store(tmp_path)
+    paths = store.stage_uploads(
+        [(f"../doc{i}.txt", io.BytesIO(("para " + "x" * 200 + "\n").encode() * 5)) for i in range(3)]
+    )
+    assert all(p.startswith(str((tmp_path / "jobs").resolve())) for p in paths)
+    batches = []
+    pool = JobWorkerPool(store, workers=1, ingest_fn=_pipeline_ingest(batches), poll_interval=0.05).start()
+    try:
+        job_id = pool.submit(paths + [str(tmp_path / "gone.txt")], source="upload")
+        job = _wait(store, job_id)
+    finally:
+        pool.stop()
+    assert job.status == "done" and job.attempts == 1
+    assert job.rows == sum(len(b) for b in batches) > 0
+    assert [f["status"] for f in job.files] == ["done", "done", "done", "missing"]
+    assert job.progress["files_done"] == 3 and job.fraction == 1.0
+    assert {r["source"] for b in batches for r in b} == {"upload"}
+
+
+def test_cancel_then_retry_resumes_from_checkpoint(tmp_path):
+    store = _store(tmp_path)
+    docs = []
+    for i in range(3):
+        p = tmp_path / f"doc{i}.txt"
+        p.write_text(f"doc {i} " + "y" * 100)
+        docs.append(str(p))
+    embedded, gate = [], threading.Event()
+
+    def embed(texts):
+        embedded.append(texts[0][:5])
+        if len(embedded) == 2:
+            gate.wait(5)
+        return [[1.0] for _ in texts]
+
+    batches = []
+    pool = JobWorkerPool(store, workers=1, ingest_fn=_pipeline_ingest(batches, embed, max_batch_rows=1), poll_interval=0.05).start()
+    try:
+        job_id = pool.submit(docs)
+        deadline = time.time() + 5
+        while len(embedded) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert pool.cancel(job_id)
+        gate.set()
+        job = _wait(store, job_id)
+        assert job.status == "cancelled"
+        assert [f["status"] for f in job.files] == ["done", "pending", "pending"]
+
+        assert pool.retry(job_id)
+        job = _wait(store, job_id)
+    finally:
+        pool.stop()
+    assert job.status == "done" and job.attempts == 2
+    assert embedded == ["doc 0", "doc 1", "doc 1", "doc 2"]
+    assert not pool.retry(job_id)
+
+
+def test_failed_job_records_error_and_queue_survives_restart(tmp_path):
+    store = _store(tmp_path)
+
+    def boom(paths, **kwargs):
+        raise RuntimeError("embedding failed")
+
+    pool = JobWorkerPool(store, ingest_fn=boom, poll_interval=0.05).start()
+    try:
+        job = _wait(store, pool.submit(["a.txt"]))
+    finally:
+        pool.stop()
+    assert job.status == "failed" and job.error == "RuntimeError: embedding failed"
+
+    # A job left running by a dead process is queued again once its lease expires.
+    orphan = store.submit(["b.txt"])
+    assert store.claim("dead-worker").id == orphan
+    queued = store.submit(["c.txt"])
+    assert store.cancel(queued) and store.get(queued).status == "cancelled"
+    reopened = _store(tmp_path)
+    assert reopened.requeue_running() == 0
+    assert reopened.requeue_running(lease=0) == 1
+    job = reopened.get(orphan)
+    assert job.status == "queued" and job.worker_id is None
+    assert [j.id for j in reopened.list_jobs(limit=2)] == [queued, orphan]
+
+
+def test_staged_uploads_are_removed_when_done_or_expired(tmp_path):
+    store = _store(tmp_path)
+
+    def upload(name):
+        return store.stage_uploads([(name, io.BytesIO(b"text"))])
+
+    done, failed, queued, orphan = (upload(f"{n}.txt") for n in ("done", "failed", "queued", "orphan"))
+    outside = tmp_path / "outside.txt"
+    outside.write_text("kept")
+    done_id = store.submit(done + [str(outside)])
+    open(store.checkpoint_path(done_id), "w").write("{}")
+    store.claim("w")
+    store.finish(done_id, "done", worker_id="w")
+    assert not os.path.exists(os.path.dirname(done[0])) and outside.exists()
+    assert not os.path.exists(store.checkpoint_path(done_id))
+
+    failed_id = store.submit(failed)
+    store.claim("w")
+    store.finish(failed_id, "failed", error="boom", worker_id="w")
+    store.submit(queued)
+    # Within retention a failed job keeps its files for a retry.
+    assert store.prune() == 0 and os.path.exists(failed[0])
+    assert store.prune(retention=0) == 2
+    assert not os.path.exists(failed[0]) and not os.path.exists(orphan[0])
+    assert os.path.exists(queued[0])
+
+
+def test_live_jobs_are_not_stolen_and_shutdown_requeues(tmp_path):
+    store = _store(tmp_path)
+    p = tmp_path / "doc.txt"
+    p.write_text("doc " + "y" * 100)
+    started, gate = threading.Event(), threading.Event()
+
+    def embed(texts):
+        started.set()
+        gate.wait(5)
+        return [[1.0] for _ in texts]
+
+    first = JobWorkerPool(store, workers=1, ingest_fn=_pipeline_ingest([], embed), poll_interval=0.05).start()
+    try:
+        job_id = first.submit([str(p)])
+        assert started.wait(5)
+        # Another process starting its own pool leaves the leased job alone.
+        second = JobWorkerPool(_store(tmp_path), workers=1, poll_interval=0.05).start()
+        second.stop()
+        job = store.get(job_id)
+        assert job.status == "running" and job.worker_id == first.worker_id and job.attempts == 1
+        # A worker that does not hold the lease is told to stop.
+        assert store.report(job_id, IngestProgress(), worker_id=second.worker_id)
+    finally:
+        first.stop(timeout=0.5)
+        gate.set()
+    # A clean shutdown is not a cancel: the job waits for the next worker.
+    job = _wait(store, job_id, statuses=("queued",))
+    assert not job.cancel_requested and job.worker_id is None and job.finished is None
+
+
+def test_pipeline_cancel_event_stops_without_flushing(tmp_path):
+    p = tmp_path / "doc.txt"
+    p.write_text("".join(f"para {i} " + "z" * 200 + "\n" for i in range(20)))
+    cancel, batches = threading.Event(), []
+
+    def embed(texts):
+        cancel.set()
+        return [[0.0] for _ in texts]
+
+    pipeline = IngestPipeline(
+        embed_fn=embed, upsert_fn=batches.append, max_chars=300, overlap=30, cancel_event=cancel
+    )
+    with pytest.raises(IngestCancelled):
+        pipeline.run([str(p)])
+    assert batches == [] and pipeline.progress.files_done == 0
@@ -0,0 +1,52 @@
+import asyncio
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, ToolReturnPart
+from pydantic_ai.models.test import TestModel
+
+from src.core.agent import kb
+from src.core.ingestion import supabase_store
+
+
+def _row(i, url="file:///a.txt"):
+    return {"id": i, "url": url, "chunk_number": i, "content": f"c{i}", "similarity": 0.9 - i / 10}
+
+
+def test_collects_kb_results_in_order_without_duplicates():
+    messages = [
+        ModelRequest(parts=[ToolReturnPart("kb_search", [_row(1), _row(2)], tool_call_id="a")]),
+        ModelResponse(parts=[TextPart("thinking")]),
+        ModelRequest(
+            parts=[
+                ToolReturnPart("kb_search", [_row(2), _row(3)], tool_call_id="b"),
+                ToolReturnPart("other_tool", [_row(9)], tool_call_id="c"),
+            ]
+        ),
+    ]
+    assert [r["id"] for r in kb.kb_results_from_messages(messages)] == [1, 2, 3]
+
+
+def test_sources_match_what_the_agent_run_returned(monkeypatch):
+    calls = []
+
+    async def fake_embed(texts):
+        calls.append("embed")
+        return [[1.0, 0.0] for _ in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, **kwargs):
+        calls.append("search")
+        return [_row(7), _row(8, url="file:///b.txt")]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    agent = Agent(TestModel(), tools=[kb.kb_search])
+
+    async def run():
+        async with agent.iter("question") as agent_run:
+            async for _ in agent_run:
+                pass
+        return kb.kb_results_from_messages(agent_run.result.new_messages())
+
+    sources = asyncio.run(run())
+    assert [r["id"] for r in sources] == [7, 8]
+    assert calls == ["embed", "search"]
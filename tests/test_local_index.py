@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+
+from src.core.ingestion.local_index import LocalVectorIndex
+
+
+def _rows(vectors, start_id=1, source="upload"):
+    return [
+        {
+            "id": start_id + i,
+            "url": f"file:///doc{start_id + i}.txt",
+            "source": source,
+            "chunk_number": 0,
+            "content": f"chunk {start_id + i}",
+            "metadata": {"source": source},
+            "embedding": list(map(float, v)),
+        }
+        for i, v in enumerate(vectors)
+    ]
+
+
+class _FakeQuery:
+    def __init__(self, rows, log):
+        self._rows = rows
+        self._log = log
+        self._gt = 0
+        self._limit = None
+        self._urls = None
+        self._lte = None
+
+    def select(self, *_):
+        return self
+
+    def gt(self, col, value):
+        self._gt = value
+        return self
+
+    def in_(self, col, values):
+        self._urls = set(values)
+        return self
+
+    def lte(self, col, value):
+        self._lte = value
+        return self
+
+    def order(self, *_):
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        data = [
+            r
+            for r in self._rows
+            if r["id"] > self._gt
+            and (self._urls is None or r["url"] in self._urls)
+            and (self._lte is None or r["id"] <= self._lte)
+        ][: self._limit]
+        self._log.append((self._gt, self._urls, len(data)))
+        return type("Resp", (), {"data": data})()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        # (id cursor, url filter, rows returned) per request.
+        self.requests = []
+
+    def table(self, _):
+        return _FakeQuery(self.rows, self.requests)
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(200, 16))
+    index = LocalVectorIndex()
+    index.add(_rows(vecs))
+    q = rng.normal(size=16)
+    expected = np.argsort(-(vecs @ q / np.linalg.norm(vecs, axis=1)))[:5] + 1
+    got = [r["id"] for r in index.search(q, k=5)]
+    assert got == list(expected)
+    assert "embedding" not in index.search(q, k=1)[0]
+
+
+def test_search_batch_equals_single_queries():
+    rng = np.random.default_rng(1)
+    index = LocalVectorIndex()
+    index.add(_rows(rng.normal(size=(50, 8))))
+    queries = rng.normal(size=(3, 8))
+    batch = index.search_batch(queries, k=4)
+    for q, res in zip(queries, batch):
+        assert [r["id"] for r in res] == [r["id"] for r in index.search(q, k=4)]
+
+
+def test_filter_and_small_index():
+    index = LocalVectorIndex()
+    index.add(_rows([[1, 0], [0, 1]], source="upload") + _rows([[1, 0.1]], start_id=3, source="web"))
+    res = index.search([1, 0], k=10, filter={"source": "web"})
+    assert [r["id"] for r in res] == [3]
+    assert LocalVectorIndex().search([1, 0], k=3) == []
+
+
+def test_incremental_sync_uses_high_water_mark():
+    rows = _rows(np.eye(4))
+    client = _FakeClient(rows)
+    index = LocalVectorIndex(page_size=3)
+    assert index.sync(client) == 4
+    assert index.sync(client) == 0
+    client.rows = rows + _rows([[1, 1, 0, 0]], start_id=5)
+    assert index.sync(client) == 1
+    assert len(index) == 5 and index.high_water_id == 5
+
+
+def test_dim_mismatch_rejected():
+    index = LocalVectorIndex()
+    index.add(_rows([[1, 0]]))
+    assert index.add(_rows([[1, 0, 0]], start_id=9)) == 0
+    assert index.decode_errors and index.decode_errors[0][0] == 9
+    with pytest.raises(ValueError):
+        index.add(_rows([[1, 0, 0]], start_id=9), embeddings=np.ones((1, 3)))
+
+
+def test_sync_reloads_after_in_place_updates_and_deletes(tmp_path, monkeypatch):
+    from src.core.ingestion import corpus
+
+    monkeypatch.setattr(corpus, "CORPUS_VERSION_PATH", str(tmp_path / "corpus_version"))
+    rows = _rows(np.eye(3))
+    client = _FakeClient(rows)
+    index = LocalVectorIndex()
+    index.sync(client)
+    assert index.is_current()
+
+    # Row 1 rewritten in place (same id), row 3 deleted.
+    updated = dict(rows[0], content="rewritten", embedding=[0.0, 1.0, 0.0])
+    client.rows = [updated, rows[1]]
+    index.sync(client)
+    assert index.search([1, 0, 0], k=1)[0]["content"] == "chunk 1"
+
+    corpus.bump_corpus_version()
+    assert not index.is_current()
+    assert index.sync(client) == 2
+    assert len(index) == 2 and index.is_current()
+    assert {r["id"] for r in index.search([0, 0, 1], k=5)} == {1, 2}
+    assert index.search([0, 1, 0], k=1)[0]["content"] in ("rewritten", "chunk 2")
+    assert "chunk 1" not in {r["content"] for r in index.search([1, 0, 0], k=5)}
+
+
+def test_sync_refetches_only_changed_urls(tmp_path, monkeypatch):
+    from src.core.ingestion import corpus
+
+    monkeypatch.setattr(corpus, "CORPUS_VERSION_PATH", str(tmp_path / "corpus_version"))
+    corpus.bump_corpus_version()
+    rows = _rows(np.eye(4))
+    client = _FakeClient(rows)
+    index = LocalVectorIndex()
+    index.sync(client)
+
+    # doc1 rewritten in place (same id), doc3 deleted, doc5 added.
+    updated = dict(rows[0], content="rewritten", embedding=[0.0, 1.0, 0.0, 0.0])
+    client.rows = [updated, rows[1], rows[3]] + _rows([[0, 0, 1, 1]], start_id=5)
+    corpus.bump_corpus_version([rows[0]["url"], rows[2]["url"]])
+    corpus.bump_corpus_version([client.rows[-1]["url"]])
+    client.requests.clear()
+    assert not index.is_current()
+    assert index.sync(client) == 2
+    assert index.is_current() and len(index) == 4
+    # Only the named urls were fetched, plus the high-water pass; no full reload.
+    assert all(urls is not None or after == 4 for after, urls, _ in client.requests)
+    assert {r["id"] for r in index.search([0, 0, 1, 0], k=10)} == {1, 2, 4, 5}
+    assert index.search([1, 0, 0, 0], k=1)[0]["id"] != 1
+    assert index.search([0, 1, 0, 0], k=1)[0]["content"] in ("rewritten", "chunk 2")
+    assert index.search([1, 0, 0, 0], k=10, filter={"url": rows[2]["url"]}) == []
+
+    # A write the log cannot attribute falls back to a full reload.
+    corpus.bump_corpus_version()
+    client.requests.clear()
+    index.sync(client)
+    assert client.requests[0][:2] == (0, None) and len(index) == 4
@@ -0,0 +1,115 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.core.agent import kb
+from src.core.ingestion import corpus, ingest, vector_store
+from src.core.ingestion.local_store import LocalFileVectorStore
+from src.core.ingestion.vector_store import SupabaseVectorStore, VectorStore
+
+
+@pytest.fixture(autouse=True)
+def _corpus_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus, "CORPUS_VERSION_PATH", str(tmp_path / "corpus_version"))
+
+
+def _row(url, n, emb, content="", **metadata):
+    return {"url": url, "chunk_number": n, "content": content, "embedding": emb, "metadata": metadata}
+
+
+def test_upsert_replace_delete_and_compact(tmp_path):
+    store = LocalFileVectorStore(str(tmp_path / "store"), block_rows=2)
+    assert isinstance(store, VectorStore) and isinstance(SupabaseVectorStore(), VectorStore)
+    before = corpus.corpus_version()
+    store.upsert([_row("a", 0, [1, 0, 0]), _row("a", 1, [0, 1, 0]), _row("b", 0, [0, 0, 1])])
+    assert corpus.corpus_version() != before
+    first_id = store.search([1, 0, 0], match_count=1)[0]["id"]
+
+    # Replacing a row keeps its id and retires the old slot.
+    store.upsert([_row("a", 0, [0, 0.6, 0.8], content="moved")])
+    assert (store.count(), store.slots) == (3, 4)
+    top = store.search([0, 0.6, 0.8], match_count=2)
+    assert top[0]["id"] == first_id and top[0]["content"] == "moved"
+    assert top[0]["similarity"] == pytest.approx(1.0)
+
+    store.delete("a", first_stale=1)
+    assert store.fetch_chunk_hashes("a").keys() == {0}
+    assert [r["url"] for r in store.search([0, 1, 0], match_count=5)] == ["a", "b"]
+
+    assert store.compact() == 2
+    assert (store.count(), store.slots) == (2, 2)
+    store.close()
+
+    reopened = LocalFileVectorStore(str(tmp_path / "store"))
+    assert [(r["url"], r["id"]) for r in reopened.search([0, 0.6, 0.8], match_count=1)] == [("a", first_id)]
+    assert len(list((tmp_path / "store").glob("vectors.*.f32"))) == 1
+
+
+def test_filters_and_hybrid_search(tmp_path):
+    store = LocalFileVectorStore(str(tmp_path / "store"))
+    rows = [
+        _row("file:///a.txt", 0, [1, 0], content="error code E1234 in the parser", lang="en"),
+        _row("file:///b.txt", 0, [0.9, 0.1], content="nothing relevant here", lang="de"),
+        _row("file:///c.txt", 0, [0, 1], content="unrelated", lang="en"),
+    ]
+    rows[1]["source"] = "upload"
+    store.upsert(rows)
+
+    assert [r["url"] for r in store.search([1, 0], 5, filter={"source": "upload"})] == ["file:///b.txt"]
+    assert [r["url"] for r in store.search([1, 0], 5, filter={"lang": "en"})] == ["file:///a.txt", "file:///c.txt"]
+    batch = store.search_batch([[1, 0], [0, 1]], match_count=1)
+    assert [b[0]["url"] for b in batch] == ["file:///a.txt", "file:///c.txt"]
+
+    # The keyword match lifts c.txt's vector-only rank.
+    store.upsert([_row("file:///c.txt", 0, [0, 1], content="see E1234", lang="en")])
+    fused = asyncio.run(store.search_async([1, 0], match_count=3, hybrid=True, query_text="E1234"))
+    assert [r["url"] for r in fused][:2] == ["file:///a.txt", "file:///c.txt"]
+    assert all("score" in r for r in fused)
+    # Without FTS5 the fused ranking is the vector ranking, still scored.
+    store._fts = False
+    fallback = store.search([1, 0], match_count=3, hybrid=True, query_text="E1234")
+    assert [r["url"] for r in fallback] == [r["url"] for r in store.search([1, 0], match_count=3)]
+    assert [r["score"] for r in fallback] == sorted((r["score"] for r in fallback), reverse=True)
+    with pytest.raises(ValueError):
+        store.search([1, 0], hybrid=True)
+    with pytest.raises(ValueError):
+        store.upsert([_row("x", 0, [1, 0, 0])])
+
+
+def test_interrupted_write_is_repaired_on_open(tmp_path):
+    store = LocalFileVectorStore(str(tmp_path / "store"))
+    store.upsert([_row("a", 0, [1, 0]), _row("b", 0, [0, 1])])
+    # Simulate dying after the commit, before the flag files were updated.
+    with store._transaction():
+        store._db.execute("UPDATE chunks SET live = 0 WHERE url = 'a'")
+        store._set_meta(dirty=1)
+    store.close()
+
+    reopened = LocalFileVectorStore(str(tmp_path / "store"))
+    assert [r["url"] for r in reopened.search([1, 0], match_count=5)] == ["b"]
+    assert reopened._meta()["dirty"] == 0
+
+
+def test_ingest_and_kb_search_through_local_store(tmp_path, monkeypatch):
+    store = LocalFileVectorStore(str(tmp_path / "store"))
+    monkeypatch.setattr(vector_store, "_store", store)
+
+    def embed(texts):
+        return [[1.0, float("alpha" in t)] for t in texts]
+
+    async def embed_async(texts):
+        return embed(texts)
+
+    monkeypatch.setattr(ingest, "embed_texts", embed)
+    monkeypatch.setattr(kb, "embed_texts_async", embed_async)
+    (tmp_path / "a.txt").write_text("alpha " * 50)
+    (tmp_path / "b.txt").write_text("beta " * 50)
+
+    paths = [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+    assert ingest.ingest_paths(paths, source="upload") == 2
+    assert store.count() == 2
+    assert ingest.ingest_paths(paths, source="upload", incremental=True) == 0
+
+    hits = asyncio.run(kb.kb_search.function("alpha", k=1))
+    assert "alpha" in hits[0]["content"] and np.isclose(hits[0]["similarity"], 1.0)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from src.core.ingestion import embeddings, index_admin, pgvector_search
+from src.core.ingestion.embedding_backends import FakeEmbeddingBackend, OpenAIEmbeddingBackend
+from src.core.ingestion.embedding_cache import EmbeddingCache
+from src.core.ingestion.local_index import LocalVectorIndex
+
+
+def test_backends_shorten_embeddings():
+    full = np.asarray(FakeEmbeddingBackend(dim=64).embed(["x"])[0])
+    short = np.asarray(FakeEmbeddingBackend(dim=64, dimensions=16).embed(["x"])[0])
+    np.testing.assert_allclose(short, full[:16] / np.linalg.norm(full[:16]), rtol=1e-5)
+    assert "dimensions" not in OpenAIEmbeddingBackend("m")._params(["x"])
+    assert OpenAIEmbeddingBackend("m", dimensions=256)._params(["x"])["dimensions"] == 256
+
+
+def test_cache_namespace_includes_dimensions(monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBED_DIMENSIONS", None)
+    monkeypatch.setenv("EMBED_BACKEND", "fake")
+    monkeypatch.setattr(embeddings, "_embedders", {})
+    cache = EmbeddingCache(path=None)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+    assert embeddings._cache_model(None) == "fake-embedding"
+    assert embeddings._cache_model(256) == "fake-embedding@256"
+    assert len(embeddings.embed_texts(["a", "b"], dimensions=32)[0]) == 32
+    assert cache.get_many("fake-embedding@32", ["a"])[0] is not None
+
+
+def test_two_stage_local_search_matches_exact():
+    rng = np.random.default_rng(0)
+    dim = 512
+    proj = rng.normal(size=(16, dim)).astype(np.float32) * np.exp(-np.arange(dim) / (dim / 4))
+    data = rng.normal(size=(3000, 16)).astype(np.float32) @ proj
+    queries = data[:10] + 0.01 * rng.normal(size=(10, dim)).astype(np.float32)
+    rows = [{"id": i + 1} for i in range(len(data))]
+    exact = LocalVectorIndex(storage="float32", first_pass_dims=0)
+    exact.add(rows, embeddings=data)
+    staged = LocalVectorIndex(storage="float32", first_pass_dims=64, rerank_factor=10)
+    staged.add(rows, embeddings=data)
+    assert staged.two_stage and not exact.two_stage
+    for q in queries:
+        want = exact.search(q, k=5)
+        got = staged.search(q, k=5)
+        assert [r["id"] for r in got] == [r["id"] for r in want]
+        # Reported similarity is the full-vector cosine, not the prefix score.
+        np.testing.assert_allclose([r["similarity"] for r in got], [r["similarity"] for r in want], rtol=1e-5)
+
+
+def test_sql_routing_and_schema_dims(monkeypatch):
+    monkeypatch.setattr(pgvector_search, "FIRST_PASS_DIMS", 256)
+    sql, params, _ = pgvector_search._match_query([0.1], 5, None)
+    assert "adaptive_match_rag_pages" in sql and params[-2] == 256
+    schema = index_admin.render_schema(512)
+    assert "VECTOR(1536)" not in schema and "query_embedding VECTOR(512)" in schema
+    assert "subvector(embedding, 1, 128)::vector(128)" in index_admin._index_sql("x", "hnsw", {}, True, "prefix", 128)
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.synthetic import write_text_pdf
+from src.core.ingestion import pdf_text
+from src.core.ingestion.pipeline import IngestPipeline
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "doc.pdf"
+    write_text_pdf(str(path), pages=6, lines_per_page=5)
+    return str(path)
+
+
+def test_pages_in_order_serial(pdf_path):
+    pages = list(pdf_text.iter_pdf_pages(pdf_path, workers=1))
+    assert [p.number for p in pages] == [1, 2, 3, 4, 5, 6]
+    assert all(p.text.startswith(f"Page {p.number}") for p in pages)
+    assert pdf_text.extract_text_from_pdf(pdf_path).count("Page ") == 6
+
+
+def test_pages_in_order_process_pool(pdf_path, monkeypatch):
+    monkeypatch.setattr(pdf_text, "PDF_PARALLEL_MIN_PAGES", 1)
+    try:
+        # A caller with a different worker count must not tear down this one's pool.
+        first = pdf_text.iter_pdf_pages(pdf_path, workers=2, pages_per_task=1)
+        pages = [next(first)]
+        other = list(pdf_text.iter_pdf_pages(pdf_path, workers=3, pages_per_task=2))
+        pages += list(first)
+    finally:
+        pdf_text.shutdown_pdf_pool()
+    assert [p.number for p in pages] == [p.number for p in other] == [1, 2, 3, 4, 5, 6]
+    assert all(p.error is None for p in pages)
+
+
+def test_slow_page_times_out():
+    class _SlowPage:
+        def extract_text(self):
+            time.sleep(2)
+            return "never"
+
+    with pytest.raises(pdf_text._PageTimeout):
+        pdf_text._extract_page(_SlowPage(), timeout=0.05)
+
+    # Off the main thread there is no SIGALRM; the deadline must still hold.
+    errors = []
+    worker = threading.Thread(target=lambda: errors.append(_raises_timeout(_SlowPage())))
+    t0 = time.perf_counter()
+    worker.start()
+    worker.join()
+    assert errors == [True] and time.perf_counter() - t0 < 1
+
+
+def _raises_timeout(page):
+    try:
+        pdf_text._extract_page(page, timeout=0.05)
+    except pdf_text._PageTimeout:
+        return True
+    return False
+
+
+def test_chunks_carry_page_metadata(tmp_path):
+    path = tmp_path / "long.pdf"
+    write_text_pdf(str(path), pages=5, lines_per_page=30)
+    batches = []
+    IngestPipeline(
+        embed_fn=lambda texts: [[1.0] for _ in texts],
+        upsert_fn=lambda rows: batches.append(rows),
+        max_chars=800,
+        overlap=100,
+    ).run([str(path)])
+    rows = sorted((r for b in batches for r in b), key=lambda r: r["chunk_number"])
+    pages = [r["metadata"]["page"] for r in rows]
+    assert pages == sorted(pages) and pages[0] == 1 and pages[-1] == 5
+    for r in rows:
+        if r["content"].startswith("Page "):
+            assert r["content"].split()[1] == str(r["metadata"]["page"])
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.core.ingestion import index_admin, pgvector_search, quantize
+from src.core.ingestion.local_index import LocalVectorIndex
+from src.core.ingestion.quantize import QuantizedMatrix, sql_storage
+
+
+def _corpus(n=2000, dim=256, seed=0):
+    rng = np.random.default_rng(seed)
+    proj = rng.normal(size=(16, dim)).astype(np.float32)
+    z = rng.normal(size=(n, 16)).astype(np.float32)
+    data = z @ proj + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    queries = (z[:20] + 0.3 * rng.normal(size=(20, 16)).astype(np.float32)) @ proj
+    return data, queries
+
+
+def _top_ids(index, queries, k=10):
+    return [[r["id"] for r in index.search(q, k=k)] for q in queries]
+
+
+@pytest.mark.parametrize("storage,min_recall", [("halfvec", 0.99), ("int8", 0.95), ("binary", 0.95)])
+def test_quantized_recall_against_float32(storage, min_recall):
+    data, queries = _corpus()
+    rows = [{"id": i + 1} for i in range(len(data))]
+    exact = LocalVectorIndex(storage="float32")
+    exact.add(rows, embeddings=data)
+    quant = LocalVectorIndex(storage=storage, rerank_factor=10)
+    quant.add(rows, embeddings=data)
+    truth, found = _top_ids(exact, queries), _top_ids(quant, queries)
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(truth, found)])
+    assert recall >= min_recall
+    assert quant.nbytes < exact.nbytes
+    res = quant.search(queries[0], k=3)
+    assert [r["similarity"] for r in res] == sorted((r["similarity"] for r in res), reverse=True)
+    if storage == "binary":
+        # The rescore is exact: same cosine as the float32 index.
+        best = exact.search(queries[0], k=1)[0]
+        assert res[0]["id"] == best["id"] and res[0]["similarity"] == pytest.approx(best["similarity"])
+
+
+def test_assign_keeps_the_last_duplicate_and_decodes():
+    m = QuantizedMatrix("int8")
+    m.resize(4, 2, 0)
+    vecs = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    m.assign(np.array([1, 1]), vecs)
+    np.testing.assert_allclose(m.decode(2)[1], [0.0, 1.0], atol=1e-2)
+    binary = QuantizedMatrix("binary")
+    binary.resize(2, 8, 0)
+    binary.assign(np.array([0]), np.array([[1, -1, 1, -1, 1, -1, 1, -1]], dtype=np.float32))
+    assert binary.bytes_per_vector() == 1
+    assert binary.scores(np.array([[1, -1, 1, -1, 1, -1, 1, -1]], dtype=np.float32), 1)[0, 0] == 1.0
+
+
+def test_sql_layout_follows_the_storage_setting(monkeypatch):
+    assert sql_storage("float32") is None
+    assert sql_storage("int8") == "halfvec" and sql_storage("binary") == "binary"
+    with pytest.raises(ValueError):
+        sql_storage("int4")
+    monkeypatch.setattr(quantize, "VECTOR_STORAGE", "binary")
+    sql, params, _ = pgvector_search._match_query([0.1, 0.2], 5, None)
+    assert "quantized_match_rag_pages" in sql and params[-2:] == ("binary", quantize.RERANK_FACTOR)
+    assert index_admin.index_name() == "rag_pages_embedding_bit_idx"
+    assert "binary_quantize(embedding)::bit(1536)) bit_hamming_ops" in index_admin._index_sql(
+        "x", "hnsw", {}, True, "binary"
+    )
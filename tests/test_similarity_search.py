@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from src.core.ingestion import local_index_search, supabase_store
+from src.core.ingestion.local_index import LocalVectorIndex
+
+
+def test_prefers_pgvector_when_db_url_set(monkeypatch):
+    calls = []
+    monkeypatch.setattr(supabase_store, "get_database_url", lambda: "postgresql://x")
+    monkeypatch.setattr(
+        supabase_store,
+        "pg_similarity_search",
+        lambda emb, k, f, q=None: calls.append((k, f)) or [{"id": 1, "similarity": 0.9}],
+    )
+    rows = supabase_store.similarity_search([0.1, 0.2], match_count=3, filter={"source": "upload"})
+    assert rows == [{"id": 1, "similarity": 0.9}]
+    assert calls == [(3, {"source": "upload"})]
+
+
+def test_full_scan_requires_opt_in(monkeypatch):
+    scanned = []
+    monkeypatch.setattr(supabase_store, "get_database_url", lambda: None)
+    monkeypatch.setattr(supabase_store, "_rpc_similarity_search", lambda *a: [])
+    monkeypatch.setattr(
+        supabase_store,
+        "similarity_search_rag_pages",
+        lambda *a, **kw: scanned.append(a) or [{"id": 2}],
+    )
+
+    class _NoRpc:
+        def rpc(self, *a):
+            raise RuntimeError("no rpc")
+
+    monkeypatch.setattr(supabase_store, "get_client", lambda: _NoRpc())
+
+    assert supabase_store.similarity_search([0.1], allow_full_scan=False) == []
+    assert scanned == []
+    assert supabase_store.similarity_search([0.1], allow_full_scan=True) == [{"id": 2}]
+
+
+def test_current_local_index_answers_even_when_empty(monkeypatch):
+    index = LocalVectorIndex()
+    index.add([{"id": 1, "url": "a", "source": "docs"}], embeddings=np.eye(1, 2, dtype=np.float32))
+    index.last_sync = time.time()
+    monkeypatch.setattr(supabase_store, "USE_LOCAL_INDEX", True)
+    monkeypatch.setattr(local_index_search, "_local_index", index)
+    monkeypatch.setattr(supabase_store, "get_database_url", lambda: "postgresql://x")
+    pg_calls = []
+    monkeypatch.setattr(supabase_store, "pg_similarity_search", lambda *a: pg_calls.append(a) or [{"id": 9}])
+
+    assert [r["id"] for r in supabase_store.similarity_search([1.0, 0.0])] == [1]
+    # A filter that matches nothing is an answer, not a reason to search Postgres again.
+    assert supabase_store.similarity_search([1.0, 0.0], filter={"source": "other"}) == []
+    assert pg_calls == []
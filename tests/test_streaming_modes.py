@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent, capture_run_messages
+from pydantic_ai.messages import ModelResponse
+from pydantic_ai.models.test import TestModel
+
+from src.core.agent import kb
+from src.core.ingestion import supabase_store
+from src.core.agent.response_templates import build_single_shot_prompt
+from src.core.agent.streaming import StreamStats, run_agent_with_streaming
+
+
+@pytest.fixture
+def fake_kb(monkeypatch):
+    searches = []
+
+    async def fake_embed(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def fake_search(emb, match_count=5, filter=None, **kwargs):
+        searches.append(match_count)
+        return [{"id": 1, "url": "file:///a.txt", "chunk_number": 0, "content": "Paris is the capital.", "similarity": 0.91}]
+
+    monkeypatch.setattr(kb, "embed_texts_async", fake_embed)
+    monkeypatch.setattr(supabase_store, "similarity_search_async", fake_search)
+    return searches
+
+
+def _run(agent, mode):
+    sources = []
+    stats = StreamStats(mode=mode, started=0.0)
+
+    async def consume():
+        with capture_run_messages() as messages:
+            text = "".join([c async for c in run_agent_with_streaming("capital?", sources, mode=mode, stats=stats, agent=agent)])
+        return text, messages
+
+    text, messages = asyncio.run(consume())
+    responses = [m for m in messages if isinstance(m, ModelResponse)]
+    return text, sources, stats, responses
+
+
+def test_single_shot_answers_in_one_model_call(fake_kb):
+    agent = Agent(TestModel(call_tools=[]), tools=[kb.kb_search])
+    text, sources, stats, responses = _run(agent, "single_shot")
+    assert text
+    assert len(responses) == 1
+    assert [s["id"] for s in sources] == [1]
+    assert stats.retrieved is not None and stats.ttft is not None and stats.total is not None
+
+
+def test_tool_mode_needs_a_tool_round_trip(fake_kb):
+    agent = Agent(TestModel(), tools=[kb.kb_search])
+    text, sources, stats, responses = _run(agent, "tool")
+    assert len(responses) == 2
+    assert [s["id"] for s in sources] == [1]
+    assert stats.retrieved is None and stats.ttft is not None
+
+
+def test_prompt_carries_context_and_rejects_unknown_mode():
+    prompt = build_single_shot_prompt("q?", [{"content": "abc", "url": "u", "chunk_number": 3, "similarity": 0.5}])
+    assert "abc" in prompt and "chunk 3" in prompt and prompt.endswith("q?")
+    with pytest.raises(ValueError):
+        asyncio.run(run_agent_with_streaming("q", mode="bogus").__anext__())
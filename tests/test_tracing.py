@@ -0,0 +1,101 @@
+import asyncio
+import json
+from collections import deque
+
+import pytest
+
+from src.core import tracing
+from src.core.ingestion.pipeline import IngestPipeline
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    monkeypatch.setattr(tracing, "_recent", deque(maxlen=50))
+    tracing.configure("memory")
+    yield tracing.recent_traces
+    tracing.configure("")
+
+
+def test_disabled_spans_are_shared_noops():
+    tracing.configure("")
+    s = tracing.span("anything", a=1)
+    assert s is tracing.span("other")
+    with s as inner:
+        inner.add("rows", 5)
+        tracing.count("rows")
+    assert tracing.current_span() is None
+
+
+def test_nested_spans_form_one_trace_with_counters(traces):
+    with tracing.span("search", k=5) as root:
+        with tracing.span("search.rpc"):
+            tracing.count("rows", 3)
+        with pytest.raises(RuntimeError):
+            with tracing.span("search.pgvector"):
+                raise RuntimeError("down")
+    (trace,) = traces()
+    by_name = {s["name"]: s for s in trace}
+    assert {s["trace_id"] for s in trace} == {root.trace_id}
+    assert by_name["search.rpc"]["parent_id"] == root.span_id
+    assert by_name["search.rpc"]["counters"] == {"rows": 3}
+    assert by_name["search.pgvector"]["error"] == "RuntimeError: down"
+    assert by_name["search"]["attrs"] == {"k": 5}
+
+    summary = {row["name"]: row for row in tracing.summarize()}
+    assert summary["search.pgvector"]["errors"] == 1
+    assert summary["search.rpc"]["rows"] == 3
+
+
+def test_async_spans_and_traced_decorator(traces):
+    @tracing.traced("work")
+    async def work(i):
+        await asyncio.sleep(0)
+        tracing.count("items")
+        return i
+
+    async def main():
+        with tracing.span("batch"):
+            return await asyncio.gather(work(1), work(2))
+
+    assert asyncio.run(main()) == [1, 2]
+    (trace,) = traces()
+    assert sorted(s["name"] for s in trace) == ["batch", "work", "work"]
+
+
+def test_pipeline_stage_spans_join_the_ingest_trace(traces, tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("".join(f"para {i} " + "x" * 200 + "\n\n" for i in range(10)))
+    IngestPipeline(
+        embed_fn=lambda texts: [[1.0, 0.0] for _ in texts],
+        upsert_fn=lambda rows: None,
+        max_chars=500,
+        overlap=50,
+    ).run([str(path)])
+    (trace,) = traces()
+    by_name = {s["name"]: s for s in trace}
+    assert by_name["upsert"]["parent_id"] == by_name["ingest"]["span_id"]
+    assert by_name["ingest"]["counters"]["rows"] == by_name["upsert"]["attrs"]["rows"]
+    assert by_name["upsert"]["counters"]["bytes"] > 0
+
+
+def test_jsonl_and_otlp_exports(traces, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure("jsonl", path=str(path))
+    with tracing.span("embed", texts=2) as s:
+        s.add("cache_hits", 1)
+        s.mark("first_token")
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["embed"]
+
+    payload = tracing.otlp_payload(lines)
+    (otlp,) = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otlp["traceId"] == lines[0]["trace_id"] and len(otlp["spanId"]) == 16
+    attrs = {a["key"]: a["value"] for a in otlp["attributes"]}
+    assert attrs["texts"] == {"intValue": "2"} and attrs["count.cache_hits"] == {"intValue": "1"}
+    assert "first_token_ms" in attrs
+
+
+def test_unknown_sink_is_rejected():
+    with pytest.raises(ValueError):
+        tracing.configure("zipkin")
+    tracing.configure("")
@@ -0,0 +1,35 @@
+import struct
+
+import numpy as np
+
+from src.core.ingestion.vector_decode import decode_embeddings, decode_pgvector_binary
+
+
+def test_bulk_text_decode():
+    values = ["[1,2,3]", "[4.5,-1e-3,0]", "np.str_('[7,8,9]')"]
+    res = decode_embeddings(values)
+    assert res.matrix.dtype == np.float32
+    assert res.matrix.shape == (3, 3)
+    np.testing.assert_allclose(res.matrix[1], [4.5, -1e-3, 0], rtol=1e-6)
+    assert res.bad_rows == []
+
+
+def test_bad_rows_reported_not_raised():
+    values = ["[1,2,3]", "[1,oops,3]", None, [1, 2], [3, 2, 1]]
+    res = decode_embeddings(values)
+    assert list(res.ok_rows) == [0, 4]
+    assert [i for i, _ in res.bad_rows] == [1, 2, 3]
+    np.testing.assert_array_equal(res.matrix[1], [3, 2, 1])
+
+
+def test_binary_format():
+    vec = np.array([0.25, -1.5, 3.0], dtype=">f4")
+    buf = struct.pack(">HH", 3, 0) + vec.tobytes()
+    np.testing.assert_array_equal(decode_pgvector_binary(buf), [0.25, -1.5, 3.0])
+    res = decode_embeddings([buf, buf])
+    assert res.matrix.shape == (2, 3)
+
+
+def test_empty_input():
+    res = decode_embeddings([])
+    assert res.matrix.shape[0] == 0 and res.bad_rows == []